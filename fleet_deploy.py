@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+info = """
+Headless deployment of ports.json and config.json to many processors over SFTP
+
+Run this on a workstation, not on the processor
+
+Inventory file (JSON):
+{
+    "defaults": {
+        "port": 22022,
+        "username": "admin",
+        "password_env": "EXTRON_ADMIN_PASSWORD",
+        "files": {"ports.json": "/ports.json", "config.json": "/config.json"}
+    },
+    "hosts": [
+        {"host": "room101-ctrl.yourorg.edu"},
+        {"host": "room102-ctrl.yourorg.edu", "files": {"room102/ports.json": "/ports.json"}}
+    ]
+}
+
+- files: local path (relative to the inventory file): remote path.
+  A host's "files" replace the defaults.
+- password_env: name of the environment variable holding the admin password.
+  "password" can also be set per host, but keep passwords out of source control.
+
+Files that already match on the processor (same SHA-256) are not uploaded.
+With the default 5 second config reload interval, processors pick up the new
+files without a restart.
+
+Example:
+python fleet_deploy.py inventory.json --workers 32 --retries 2
+python fleet_deploy.py inventory.json --dry-run
+python fleet_deploy.py inventory.json --local-root ./staging   (no SFTP, for testing)
+
+"""
+
+__version__ = "1.0.0"
+
+DEFAULT_SFTP_PORT = 22022
+DEFAULT_USERNAME = "admin"
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParamikoClient:
+    """One SFTP session per host, reused for every file"""
+
+    def __init__(self, host, port, username, password, timeout=10):
+        import paramiko
+
+        # Transport((host, port)) connects with no timeout, an offline host
+        # would hold a worker for the OS connect timeout
+        sock = socket.create_connection((host, port), timeout)
+        self.transport = None
+        try:
+            self.transport = paramiko.Transport(sock)
+            self.transport.banner_timeout = timeout
+            self.transport.auth_timeout = timeout
+            self.transport.connect(username=username, password=password)
+            self.sftp = paramiko.SFTPClient.from_transport(self.transport)
+            self.sftp.get_channel().settimeout(timeout)
+        except Exception:
+            # deploy_host only closes clients that were created
+            if self.transport is not None:
+                self.transport.close()
+            sock.close()
+            raise
+
+    def read(self, remote_path):
+        """Returns the file's bytes, or None if it doesn't exist"""
+        try:
+            with self.sftp.file(remote_path, "rb") as remote_file:
+                return remote_file.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, remote_path, data):
+        with self.sftp.file(remote_path, "wb") as remote_file:
+            remote_file.write(data)
+
+    def close(self):
+        self.transport.close()
+
+
+class LocalDirectoryClient:
+    """
+    Stand-in for a processor, stores each host's files under root/<host>/.
+    Used with --local-root to test inventories and hash skipping without SFTP.
+    """
+
+    def __init__(
+        self, root, host, port=None, username=None, password=None, timeout=None
+    ):
+        self.root = os.path.join(root, host)
+
+    def _local_path(self, remote_path):
+        return os.path.join(self.root, remote_path.lstrip("/"))
+
+    def read(self, remote_path):
+        try:
+            with open(self._local_path(remote_path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, remote_path, data):
+        local_path = self._local_path(remote_path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, "wb") as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+class HostResult:
+    def __init__(self, host):
+        self.host = host
+        self.status = "pending"  # updated, unchanged, would update, failed
+        self.uploaded = []
+        self.unchanged = []
+        self.attempts = 0
+        self.elapsed = 0.0
+        self.error = None
+
+    def summary_line(self):
+        line = "{:<40} {:<13} uploaded: {:<2} unchanged: {:<2} attempts: {} {:.1f}s".format(
+            self.host,
+            self.status,
+            len(self.uploaded),
+            len(self.unchanged),
+            self.attempts,
+            self.elapsed,
+        )
+        if self.error:
+            line += "  {}".format(self.error)
+        return line
+
+
+def load_inventory(inventory_path, password_env=None):
+    """Returns a list of host dicts with defaults applied and local files read"""
+    with open(inventory_path, "r") as f:
+        inventory = json.load(f)
+    base_directory = os.path.dirname(os.path.abspath(inventory_path))
+    defaults = inventory.get("defaults", {})
+    file_cache = {}  # Local files are read once, most hosts share them
+
+    hosts = []
+    for entry in inventory["hosts"]:
+        host = dict(defaults)
+        host.update(entry)
+        host.setdefault("port", DEFAULT_SFTP_PORT)
+        host.setdefault("username", DEFAULT_USERNAME)
+        env_name = host.get("password_env", None) or password_env
+        if "password" not in host and env_name:
+            host["password"] = os.environ.get(env_name, None)
+
+        files = []
+        for local_path, remote_path in host.get("files", {}).items():
+            local_path = os.path.join(base_directory, local_path)
+            if local_path not in file_cache:
+                with open(local_path, "rb") as f:
+                    data = f.read()
+                file_cache[local_path] = (data, sha256(data))
+            data, digest = file_cache[local_path]
+            files.append((remote_path, data, digest))
+        if not files:
+            raise ValueError("No files to deploy for host {}".format(host["host"]))
+        host["files"] = files
+        hosts.append(host)
+    return hosts
+
+
+def deploy_host(host, client_factory, retries=2, backoff=1.0, dry_run=False):
+    result = HostResult(host["host"])
+    start = time.monotonic()
+    pending = list(host["files"])
+
+    while True:
+        result.attempts += 1
+        client = None
+        try:
+            client = client_factory(
+                host["host"], host["port"], host["username"], host.get("password")
+            )
+            for remote_path, data, digest in list(pending):
+                existing = client.read(remote_path)
+                if existing is not None and sha256(existing) == digest:
+                    result.unchanged.append(remote_path)
+                elif not dry_run:
+                    client.write(remote_path, data)
+                    written = client.read(remote_path)
+                    if written is None or sha256(written) != digest:
+                        raise IOError("Verify failed for {}".format(remote_path))
+                    result.uploaded.append(remote_path)
+                else:
+                    result.uploaded.append(remote_path)
+                pending.remove((remote_path, data, digest))
+            result.error = None
+            break
+        except Exception as e:
+            result.error = "{}: {}".format(type(e).__name__, e)
+            if result.attempts > retries:
+                break
+            time.sleep(backoff * 2 ** (result.attempts - 1))
+        finally:
+            if client is not None:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+
+    if result.error:
+        result.status = "failed"
+    elif result.uploaded:
+        result.status = "would update" if dry_run else "updated"
+    else:
+        result.status = "unchanged"
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def deploy(hosts, client_factory, workers=16, retries=2, backoff=1.0, dry_run=False):
+    """Deploys to every host from a bounded thread pool, returns a list of HostResult"""
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                deploy_host, host, client_factory, retries, backoff, dry_run
+            )
+            for host in hosts
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            print(result.summary_line(), flush=True)
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Deploy ports.json and config.json to many processors over SFTP",
+        epilog=info,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("inventory", help="inventory JSON file")
+    parser.add_argument(
+        "--workers", type=int, default=16, help="hosts at once (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--retries", type=int, default=2, help="retries per host (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10, help="SFTP timeout in seconds"
+    )
+    parser.add_argument(
+        "--password-env",
+        default=None,
+        help="environment variable with the admin password, if not in the inventory",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="compare hashes without uploading"
+    )
+    parser.add_argument(
+        "--local-root",
+        default=None,
+        help="write to <local-root>/<host>/ instead of SFTP, for testing",
+    )
+    args = parser.parse_args(argv)
+
+    hosts = load_inventory(args.inventory, args.password_env)
+    if args.local_root:
+
+        def client_factory(host, port, username, password):
+            return LocalDirectoryClient(args.local_root, host)
+
+    else:
+        try:
+            import paramiko  # noqa: F401
+        except ImportError:
+            print('Missing required library "paramiko", please `pip install paramiko`')
+            return 2
+
+        def client_factory(host, port, username, password):
+            return ParamikoClient(host, port, username, password, args.timeout)
+
+    results = deploy(
+        hosts, client_factory, args.workers, args.retries, 1.0, args.dry_run
+    )
+
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    print(
+        "\n{} hosts: {}".format(
+            len(results),
+            ", ".join(
+                "{} {}".format(n, status) for status, n in sorted(counts.items())
+            ),
+        )
+    )
+    failed = sorted(result.host for result in results if result.status == "failed")
+    if failed:
+        print("Failed: {}".format(", ".join(failed)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Client for the Extron-Frontend-API processor RPC server
+
+Example:
+    import asyncio
+    from frontend_api_client import FleetClient, commands
+
+    async def main():
+        fleet = FleetClient(["10.0.0.10", "10.0.0.11"])
+        result = await fleet.broadcast([commands.set_state(commands.BUTTON, "Btn_Power", 1)])
+        print(result.summary())
+
+    asyncio.run(main())
+"""
+
+from . import commands
+from .client import FleetClient, FleetResult, ProcessorClient
+from .replies import Reply, RpcError, parse_batch, parse_reply
+
+__version__ = "1.0.0"
+
+__all__ = [
+    "commands",
+    "FleetClient",
+    "FleetResult",
+    "ProcessorClient",
+    "Reply",
+    "RpcError",
+    "parse_batch",
+    "parse_reply",
+]
@@ -0,0 +1,159 @@
+"""
+Fleet-wide command throughput
+
+Against real processors:
+    python -m frontend_api_client.benchmark --hosts 10.0.0.10 10.0.0.11 --object Btn_Bench
+
+Against local stand-in processors (no hardware needed):
+    python -m frontend_api_client.benchmark --mock 50 --latency 0.005
+
+Each processor gets --commands SetState calls, sent three ways:
+- sequential: one connection per command, one command at a time
+- unbatched: one connection per command, concurrently (limited per host)
+- batched: call() with automatic batching
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Tuple
+
+from . import commands
+from .client import FleetClient
+
+
+async def _mock_processor(latency: float) -> Tuple[asyncio.AbstractServer, int]:
+    """Answers like handle_unsolicited_rpc_rx: a JSON list of results, then disconnects"""
+
+    async def handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.decode().split("\r\n"):
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        body = await reader.readexactly(length)
+        payload = json.loads(body)
+        if isinstance(payload, dict):  # {"request_id": ..., "commands": [...]}
+            payload = payload["commands"]
+        count = len(payload)
+        await asyncio.sleep(latency * count)  # The processor runs commands in series
+        writer.write(json.dumps(["200 OK"] * count).encode())
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _timed(label: str, total: int, coroutine) -> float:
+    start = time.perf_counter()
+    failures = await coroutine
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0
+    print(
+        "{:<12} {:>7} commands {:>8.2f}s {:>10.0f} commands/s  {} failed".format(
+            label, total, elapsed, rate, failures
+        )
+    )
+    return rate
+
+
+async def _run(args):
+    servers = []
+    if args.mock:
+        hosts: List[Tuple[str, int]] = []
+        for _ in range(args.mock):
+            server, port = await _mock_processor(args.latency)
+            servers.append(server)
+            hosts.append(("127.0.0.1", port))
+    else:
+        hosts = [(host, args.port) for host in args.hosts]
+
+    def make_fleet():
+        return FleetClient(
+            ["{}:{}".format(host, port) for host, port in hosts],
+            max_hosts=args.max_hosts,
+            max_concurrency=args.per_host,
+            max_batch=args.max_batch,
+            timeout=args.timeout,
+        )
+
+    command = commands.set_state(commands.BUTTON, args.object, 1)
+    total = len(hosts) * args.commands
+    print("{} processors, {} commands each".format(len(hosts), args.commands))
+
+    async def sequential():
+        fleet = make_fleet()
+        failures = 0
+
+        async def host_task(client):
+            nonlocal failures
+            for _ in range(args.commands):
+                try:
+                    replies = await client.call_many([command])
+                    failures += sum(not reply.ok for reply in replies)
+                except Exception:
+                    failures += 1
+
+        await asyncio.gather(*(host_task(c) for c in fleet.clients.values()))
+        return failures
+
+    async def unbatched():
+        fleet = make_fleet()
+        results = await asyncio.gather(
+            *(
+                client.call_many([command])
+                for client in fleet.clients.values()
+                for _ in range(args.commands)
+            ),
+            return_exceptions=True,
+        )
+        return sum(
+            1 if isinstance(r, Exception) else sum(not reply.ok for reply in r)
+            for r in results
+        )
+
+    async def batched():
+        fleet = make_fleet()
+        results = await asyncio.gather(
+            *(
+                client.call(command)
+                for client in fleet.clients.values()
+                for _ in range(args.commands)
+            ),
+            return_exceptions=True,
+        )
+        return sum(1 for r in results if isinstance(r, Exception) or not r.ok)
+
+    try:
+        await _timed("sequential", total, sequential())
+        await _timed("unbatched", total, unbatched())
+        await _timed("batched", total, batched())
+    finally:
+        for server in servers:
+            server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RPC client throughput benchmark")
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument("--hosts", nargs="+", help="processor addresses")
+    targets.add_argument("--mock", type=int, help="number of local stand-in processors")
+    parser.add_argument("--port", type=int, default=8080, help="RPC server port")
+    parser.add_argument(
+        "--object", default="Btn_Bench", help="button used for SetState calls"
+    )
+    parser.add_argument("--commands", type=int, default=200, help="per processor")
+    parser.add_argument("--per-host", type=int, default=2, help="connections per host")
+    parser.add_argument("--max-hosts", type=int, default=100, help="hosts at once")
+    parser.add_argument("--max-batch", type=int, default=50, help="commands per batch")
+    parser.add_argument("--timeout", type=float, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=0.002, help="mock: seconds per command"
+    )
+    asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+asyncio clients for the processor RPC server
+
+ProcessorClient talks to one processor.  Commands passed to call() within
+batch_window seconds are sent together as one list, so many small calls share
+one TCP connection.  Concurrent connections to the processor are limited,
+because each one is handled on the processor's single RPC server.
+
+The processor reads each request from a single ReceiveData, so a batch is also
+cut at max_request_bytes.  call_many() sends its batches one after another to
+keep the commands in order.
+
+With retries, each batch is sent with a request_id and retried with the same
+one, so the processor replies from its cache instead of running it twice.
+
+FleetClient fans commands out across many processors and collects the results.
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .commands import Command
+from .replies import Reply, RpcError, parse_batch
+
+DEFAULT_PORT = 8080
+# A request this size arrives in one ReceiveData on the processor's RPC server
+MAX_REQUEST_BYTES = 4096
+# Room for the request_id envelope and the Content-Length digits
+_REQUEST_OVERHEAD = 64
+
+
+class ProcessorClient:
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_PORT,
+        max_concurrency: int = 2,
+        batch_window: float = 0.005,
+        max_batch: int = 50,
+        max_request_bytes: int = MAX_REQUEST_BYTES,
+        timeout: float = 5,
+        retries: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_request_bytes = max_request_bytes
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self._semaphore: Optional[asyncio.Semaphore] = None  # Made on the running loop
+        self._pending: List[Tuple[Command, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self.batches = 0
+        self.commands = 0
+        self.errors = 0
+        self.retried = 0
+
+    def _request(
+        self, commands: Sequence[Command], request_id: Optional[str] = None
+    ) -> bytes:
+        if request_id is None:
+            payload = list(commands)
+        else:
+            payload = {"request_id": request_id, "commands": list(commands)}
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            "POST / HTTP/1.0\r\n"
+            "Host: {}:{}\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: {}\r\n\r\n".format(self.host, self.port, len(body))
+        )
+        return head.encode("ascii") + body
+
+    def _batch_length(self, commands: Sequence[Command]) -> int:
+        """Returns how many of the leading commands fit in one request"""
+        size = len(self._request([])) + _REQUEST_OVERHEAD
+        for count, command in enumerate(commands[: self.max_batch]):
+            size += len(json.dumps(command).encode("utf-8")) + 2  # ", "
+            if size > self.max_request_bytes:
+                return count
+        return min(len(commands), self.max_batch)
+
+    def _batches(self, commands: List[Command]) -> List[List[Command]]:
+        """Splits the commands into requests, raises ValueError if one can not fit"""
+        batches = []
+        while commands:
+            length = self._batch_length(commands)
+            if not length:
+                raise ValueError(
+                    "Command does not fit in max_request_bytes: {}".format(commands[0])
+                )
+            batches.append(commands[:length])
+            commands = commands[length:]
+        return batches
+
+    async def _send_batch(self, commands: Sequence[Command]) -> List[Reply]:
+        if not self.retries:
+            return await self._send_once(commands)
+        request_id = uuid.uuid4().hex
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._send_once(commands, request_id)
+            except RpcError:
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                await asyncio.sleep(0.1 * 2**attempt)
+
+    async def _send_once(
+        self, commands: Sequence[Command], request_id: Optional[str] = None
+    ) -> List[Reply]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.batches += 1
+            self.commands += len(commands)
+            writer = None
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout
+                )
+                # One write, the processor reads the request from a single ReceiveData
+                writer.write(self._request(commands, request_id))
+                await writer.drain()
+                # The processor disconnects after replying
+                body = await asyncio.wait_for(reader.read(), self.timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                self.errors += 1
+                raise RpcError(
+                    "{}:{} {}".format(self.host, self.port, e or "timed out")
+                )
+            finally:
+                if writer is not None:
+                    writer.close()
+        return parse_batch(body, len(commands))
+
+    async def call_many(
+        self, commands: Iterable[Command], concurrent: bool = False
+    ) -> List[Reply]:
+        """
+        Sends the commands now, in batches of max_batch or max_request_bytes,
+        and returns replies in order.  Each batch is sent after the one before
+        it has replied, so the processor runs the commands in order.  With
+        concurrent=True the batches are sent at once, up to max_concurrency,
+        for commands that can run in any order.
+        """
+        batches = self._batches(list(commands))
+        if concurrent:
+            results = await asyncio.gather(
+                *(self._send_batch(batch) for batch in batches)
+            )
+        else:
+            results = [await self._send_batch(batch) for batch in batches]
+        return [reply for batch_replies in results for reply in batch_replies]
+
+    async def call(self, command: Command) -> Reply:
+        """Queues the command into the next batch and waits for its reply"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((command, future))
+        queued = [command for command, _ in self._pending]
+        if len(queued) >= self.max_batch or self._batch_length(queued) < len(queued):
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        length = self._batch_length([command for command, _ in self._pending])
+        if not length and self._pending:
+            (command, future), self._pending = self._pending[0], self._pending[1:]
+            future.set_exception(
+                ValueError(
+                    "Command does not fit in max_request_bytes: {}".format(command)
+                )
+            )
+        pending, self._pending = self._pending[:length], self._pending[length:]
+        if self._pending:
+            self._flush_handle = asyncio.get_running_loop().call_later(0, self._flush)
+        if pending:
+            asyncio.ensure_future(self._resolve(pending))
+
+    async def _resolve(self, pending: List[Tuple[Command, asyncio.Future]]):
+        try:
+            replies = await self._send_batch([command for command, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), reply in zip(pending, replies):
+            if not future.done():
+                future.set_result(reply)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "commands": self.commands,
+            "errors": self.errors,
+            "retried": self.retried,
+            "avg_batch": round(self.commands / self.batches, 2) if self.batches else 0,
+        }
+
+
+class FleetResult:
+    def __init__(self):
+        self.replies: Dict[str, List[Reply]] = {}
+        self.errors: Dict[str, Exception] = {}
+
+    @property
+    def ok_hosts(self) -> List[str]:
+        """Hosts where every command succeeded"""
+        return sorted(
+            host
+            for host, replies in self.replies.items()
+            if all(reply.ok for reply in replies)
+        )
+
+    @property
+    def failed_hosts(self) -> List[str]:
+        """Hosts that could not be reached, or had a command fail"""
+        failed = set(self.errors)
+        for host, replies in self.replies.items():
+            if not all(reply.ok for reply in replies):
+                failed.add(host)
+        return sorted(failed)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "hosts": len(self.replies) + len(self.errors),
+            "ok": len(self.ok_hosts),
+            "failed": len(self.failed_hosts),
+            "unreachable": len(self.errors),
+        }
+
+
+class FleetClient:
+    """
+    hosts: addresses, or "address:port" for a processor on another port.
+    clients: one ProcessorClient per host, created with client_options.
+    max_hosts: processors contacted at once across the fleet.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        port: int = DEFAULT_PORT,
+        max_hosts: int = 100,
+        **client_options
+    ):
+        self.clients = {}
+        for host in hosts:
+            address, _, host_port = host.rpartition(":")
+            if address and host_port.isdigit():  # "host:port" overrides port
+                client = ProcessorClient(address, int(host_port), **client_options)
+            else:
+                client = ProcessorClient(host, port, **client_options)
+            self.clients[host] = client
+        self.max_hosts = max_hosts
+        self._semaphore: Optional[asyncio.Semaphore] = None  # Made on the running loop
+
+    def client(self, host: str) -> ProcessorClient:
+        return self.clients[host]
+
+    async def _run_host(self, host: str, commands: List[Command], result: FleetResult):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_hosts)
+        async with self._semaphore:
+            try:
+                result.replies[host] = await self.clients[host].call_many(commands)
+            except Exception as e:
+                result.errors[host] = e
+
+    async def run(self, plan: Dict[str, List[Command]]) -> FleetResult:
+        """plan: {host: [commands]}, each host's commands are sent as batches"""
+        result = FleetResult()
+        await asyncio.gather(
+            *(
+                self._run_host(host, list(commands), result)
+                for host, commands in plan.items()
+            )
+        )
+        return result
+
+    async def broadcast(
+        self, commands: Iterable[Command], hosts: Optional[Iterable[str]] = None
+    ) -> FleetResult:
+        """Sends the same commands to every host, or the hosts given"""
+        commands = list(commands)
+        hosts = list(hosts) if hosts is not None else list(self.clients)
+        return await self.run({host: commands for host in hosts})
@@ -0,0 +1,357 @@
+"""
+Typed builders for every RPC command the processor accepts
+
+Methods (METHODS_MAP in src/main.py) act on one object:
+    set_state(BUTTON, "Btn_Power", 1)
+    -> {"type": "Button", "object": "Btn_Power", "function": "SetState", "arg1": "1"}
+
+Macros (MACROS_MAP in src/main.py) have their own call formats:
+    get_all_elements()
+    -> {"type": "get_all_elements"}
+
+Every value is sent as a string, the same as the processor expects.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+Command = Dict[str, Any]
+
+# Domains, the "type" of a method call
+PROCESSOR_DEVICE = "ProcessorDevice"
+UI_DEVICE = "UIDevice"
+BUTTON = "Button"
+KNOB = "Knob"
+LABEL = "Label"
+LEVEL = "Level"
+SLIDER = "Slider"
+RELAY_INTERFACE = "RelayInterface"
+SERIAL_INTERFACE = "SerialInterface"
+ETHERNET_CLIENT_INTERFACE = "EthernetClientInterface"
+
+DOMAINS = (
+    PROCESSOR_DEVICE,
+    UI_DEVICE,
+    BUTTON,
+    KNOB,
+    LABEL,
+    LEVEL,
+    SLIDER,
+    RELAY_INTERFACE,
+    SERIAL_INTERFACE,
+    ETHERNET_CLIENT_INTERFACE,
+)
+
+
+def _arg(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        # The processor strips the brackets and splits on commas, so no quotes
+        return "[{}]".format(",".join(str(item) for item in value))
+    return str(value)
+
+
+def method(domain: str, obj: str, function: str, *args: Any) -> Command:
+    """Builds any method call, trailing None arguments are left out"""
+    if domain not in DOMAINS:
+        raise ValueError("Unknown domain: {}".format(domain))
+    args_list = list(args)
+    while args_list and args_list[-1] is None:
+        args_list.pop()
+    if len(args_list) > 3:
+        raise ValueError("Methods take at most 3 arguments")
+    command = {"type": domain, "object": obj, "function": function}
+    for number, value in enumerate(args_list, start=1):
+        command["arg{}".format(number)] = "" if value is None else _arg(value)
+    return command
+
+
+#### Methods ####
+
+
+def set_state(domain: str, obj: str, state: int) -> Command:
+    return method(domain, obj, "SetState", state)
+
+
+def set_fill(domain: str, obj: str, fill: int) -> Command:
+    return method(domain, obj, "SetFill", fill)
+
+
+def set_text(domain: str, obj: str, text: str) -> Command:
+    return method(domain, obj, "SetText", text)
+
+
+def set_visible(domain: str, obj: str, visible: bool) -> Command:
+    return method(domain, obj, "SetVisible", visible)
+
+
+def set_blinking(
+    domain: str, obj: str, rate: str, state_list: Iterable[int]
+) -> Command:
+    return method(domain, obj, "SetBlinking", rate, state_list)
+
+
+def set_enable(domain: str, obj: str, enabled: bool) -> Command:
+    return method(domain, obj, "SetEnable", enabled)
+
+
+def show_popup(
+    ui_device: str, popup: Union[str, int], duration: Optional[float] = None
+) -> Command:
+    return method(UI_DEVICE, ui_device, "ShowPopup", popup, duration)
+
+
+def hide_all_popups(ui_device: str) -> Command:
+    return method(UI_DEVICE, ui_device, "HideAllPopups")
+
+
+def show_page(ui_device: str, page: Union[str, int]) -> Command:
+    return method(UI_DEVICE, ui_device, "ShowPage", page)
+
+
+def get_volume(ui_device: str, name: str) -> Command:
+    return method(UI_DEVICE, ui_device, "GetVolume", name)
+
+
+def play_sound(ui_device: str, filename: str) -> Command:
+    return method(UI_DEVICE, ui_device, "PlaySound", filename)
+
+
+def set_led_blinking(
+    ui_device: str, led_id: int, rate: str, state_list: Iterable[str]
+) -> Command:
+    return method(UI_DEVICE, ui_device, "SetLEDBlinking", led_id, rate, state_list)
+
+
+def set_led_state(ui_device: str, led_id: int, state: str) -> Command:
+    return method(UI_DEVICE, ui_device, "SetLEDState", led_id, state)
+
+
+def set_level(domain: str, obj: str, level: int) -> Command:
+    return method(domain, obj, "SetLevel", level)
+
+
+def set_range(
+    domain: str, obj: str, min: int, max: int, step: Optional[int] = None
+) -> Command:
+    return method(domain, obj, "SetRange", min, max, step)
+
+
+def inc(domain: str, obj: str) -> Command:
+    return method(domain, obj, "Inc")
+
+
+def dec(domain: str, obj: str) -> Command:
+    return method(domain, obj, "Dec")
+
+
+def pulse(relay: str, duration: float) -> Command:
+    return method(RELAY_INTERFACE, relay, "Pulse", duration)
+
+
+def toggle(relay: str) -> Command:
+    return method(RELAY_INTERFACE, relay, "Toggle")
+
+
+def send(domain: str, port: str, data: str, priority: Optional[str] = None) -> Command:
+    """priority: "high", "normal" or "low", for ports with a send queue"""
+    return method(domain, port, "Send", data, priority)
+
+
+def send_and_wait(domain: str, port: str, data: str, timeout: float) -> Command:
+    return method(domain, port, "SendAndWait", data, timeout)
+
+
+def set_executive_mode(processor: str, mode: int) -> Command:
+    return method(PROCESSOR_DEVICE, processor, "SetExecutiveMode", mode)
+
+
+def reboot(domain: str, device: str) -> Command:
+    return method(domain, device, "Reboot")
+
+
+def connect(port: str, timeout: Optional[float] = None) -> Command:
+    return method(ETHERNET_CLIENT_INTERFACE, port, "Connect", timeout)
+
+
+def disconnect(port: str) -> Command:
+    return method(ETHERNET_CLIENT_INTERFACE, port, "Disconnect")
+
+
+def start_keepalive(domain: str, port: str, interval: float, data: str) -> Command:
+    return method(domain, port, "StartKeepAlive", interval, data)
+
+
+def stop_keepalive(domain: str, port: str) -> Command:
+    return method(domain, port, "StopKeepAlive")
+
+
+def save_program_log(processor: str, filepath: str) -> Command:
+    return method(PROCESSOR_DEVICE, processor, "SaveProgramLog", filepath)
+
+
+def get_property(domain: str, obj: str, property: str) -> Command:
+    return method(domain, obj, "get_property", property)
+
+
+def ramp(
+    domain: str, obj: str, target: int, duration: float, easing: Optional[str] = None
+) -> Command:
+    """easing: linear, ease_in, ease_out or ease_in_out"""
+    return method(domain, obj, "ramp", target, duration, easing)
+
+
+#### Macros ####
+
+
+def get_all_elements() -> Command:
+    return {"type": "get_all_elements"}
+
+
+def set_backend_server(address: Optional[str] = None) -> Command:
+    """No address: the processor picks from its config.json"""
+    command = {"type": "set_backend_server"}
+    if address is not None:
+        command["address"] = address
+    return command
+
+
+def program_log_saver(enabled: bool) -> Command:
+    return {"type": "program_log_saver", "enabled": _arg(enabled)}
+
+
+def unpair() -> Command:
+    return {"type": "unpair"}
+
+
+def get_port_queue_stats(alias: Optional[str] = None) -> Command:
+    command = {"type": "get_port_queue_stats"}
+    if alias is not None:
+        command["alias"] = alias
+    return command
+
+
+def get_event_stats(reset: bool = False) -> Command:
+    command = {"type": "get_event_stats"}
+    if reset:
+        command["reset"] = "true"
+    return command
+
+
+def set_local_rules(rules: List[Dict[str, Any]], persist: bool = False) -> Command:
+    command = {"type": "set_local_rules", "rules": rules}
+    if persist:
+        command["persist"] = "true"
+    return command
+
+
+def reload_config() -> Command:
+    return {"type": "reload_config"}
+
+
+def reload_ports() -> Command:
+    return {"type": "reload_ports"}
+
+
+def traffic_record(enabled: bool) -> Command:
+    return {"type": "traffic_record", "enabled": _arg(enabled)}
+
+
+def scheduled(
+    command: Command,
+    delay: Optional[float] = None,
+    at: Optional[Union[str, float]] = None,
+    tag: Optional[str] = None,
+) -> Command:
+    """Returns a copy of the command that runs after delay seconds, or at a time"""
+    command = dict(command)
+    if delay is not None:
+        command["delay"] = _arg(delay)
+    if at is not None:
+        command["at"] = _arg(at)
+    if tag is not None:
+        command["tag"] = tag
+    return command
+
+
+def cancel_scheduled(
+    tag: Optional[str] = None, task_id: Optional[int] = None
+) -> Command:
+    command = {"type": "cancel_scheduled"}
+    if tag is not None:
+        command["tag"] = tag
+    if task_id is not None:
+        command["id"] = _arg(task_id)
+    return command
+
+
+def get_scheduled(tag: Optional[str] = None) -> Command:
+    command = {"type": "get_scheduled"}
+    if tag is not None:
+        command["tag"] = tag
+    return command
+
+
+def store_sequence(
+    name: str, commands: List[Command], persist: bool = False
+) -> Command:
+    command = {"type": "store_sequence", "name": name, "commands": list(commands)}
+    if persist:
+        command["persist"] = "true"
+    return command
+
+
+def run_sequence(name: str, params: Optional[Dict[str, Any]] = None) -> Command:
+    command = {"type": "run_sequence", "name": name}
+    if params:
+        command["params"] = {key: _arg(value) for key, value in params.items()}
+    return command
+
+
+def get_sequences() -> Command:
+    return {"type": "get_sequences"}
+
+
+def delete_sequence(name: str) -> Command:
+    return {"type": "delete_sequence", "name": name}
+
+
+def subscribe(
+    domain: str,
+    obj: str,
+    property: str,
+    interval: float,
+    deadband: Optional[float] = None,
+    arg1: Optional[str] = None,
+) -> Command:
+    if domain not in DOMAINS:
+        raise ValueError("Unknown domain: {}".format(domain))
+    command = {
+        "type": "subscribe",
+        "domain": domain,
+        "object": obj,
+        "property": property,
+        "interval": _arg(interval),
+    }
+    if deadband is not None:
+        command["deadband"] = _arg(deadband)
+    if arg1 is not None:
+        command["arg1"] = _arg(arg1)
+    return command
+
+
+def unsubscribe(
+    domain: Optional[str] = None,
+    obj: Optional[str] = None,
+    property: Optional[str] = None,
+) -> Command:
+    """Removes every matching subscription, or all of them with no arguments"""
+    command = {"type": "unsubscribe"}
+    for key, value in (("domain", domain), ("object", obj), ("property", property)):
+        if value is not None:
+            command[key] = value
+    return command
+
+
+def get_subscriptions() -> Command:
+    return {"type": "get_subscriptions"}
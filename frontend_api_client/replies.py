@@ -0,0 +1,70 @@
+"""
+Parsing of processor replies
+
+The processor answers a batch with a JSON list, one result per command, in
+order.  Most results are strings with an HTTP status code and optional data
+separated by a pipe: "200 OK" or "200 OK | 42".  Some macros return JSON
+objects or lists, which are treated as "200 OK" with the object as data.
+A macro that fails on the processor returns null, which is an error.
+"""
+
+import json
+from typing import Any, List, NamedTuple, Optional
+
+
+class Reply(NamedTuple):
+    status: int
+    reason: str
+    data: Optional[Any]
+    raw: Any
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class RpcError(Exception):
+    """The processor could not be reached or its reply could not be read"""
+
+
+def parse_reply(result: Any) -> Reply:
+    if result is None:
+        return Reply(500, "Internal Server Error", None, result)
+    if isinstance(result, (dict, list)):
+        return Reply(200, "OK", result, result)
+    if not isinstance(result, str):
+        return Reply(502, "Bad Gateway", result, result)
+
+    status_text, _, data = result.partition("|")
+    status_text = status_text.strip()
+    code, _, reason = status_text.partition(" ")
+    try:
+        status = int(code)
+    except ValueError:
+        # Not a status line, ex: a bare value
+        return Reply(200, "OK", result, result)
+    return Reply(status, reason, data.strip() if data else None, result)
+
+
+def parse_batch(body: bytes, expected: int) -> List[Reply]:
+    """Returns one Reply per command sent"""
+    text = body.decode("utf-8", errors="replace").strip()
+    try:
+        results = json.loads(text)
+    except ValueError:
+        # Errors for the whole batch are sent as one plain string
+        reply = parse_reply(text)
+        if reply.ok:
+            raise RpcError("Unreadable reply: {!r}".format(text[:200]))
+        return [reply] * expected
+
+    if not isinstance(results, list):
+        results = [results]
+    replies = [parse_reply(result) for result in results]
+    if len(replies) != expected:
+        raise RpcError(
+            "Expected {} results, got {}: {!r}".format(
+                expected, len(replies), text[:200]
+            )
+        )
+    return replies
@@ -1,6 +1,10 @@
+import argparse
+import ast
+import hashlib
+import json
 import os
-import tkinter as tk
-from tkinter import filedialog
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
 info = """
 This is a utility script for converting your existing GUI element instantiations
@@ -29,148 +33,421 @@ This should be safe to run against your entire old repository,
 and will find all instances of GUI element instantiations and process them
 in a single run, recursively.
 
+Running it again only re-reads files that changed,
+and elements already in the lists are not added twice.
+
+Command line (no display needed):
+python gui_element_instantiation_converter.py <old_repo_directory>
+
 """
 
+__version__ = "2.0.0"
+
+# Key: Extron class, Value: (destination file, list name)
+GUI_ELEMENTS = {
+    "Button": ("buttons.py", "all_buttons"),
+    "Knob": ("knobs.py", "all_knobs"),
+    "Label": ("labels.py", "all_labels"),
+    "Level": ("levels.py", "all_levels"),
+    "Slider": ("sliders.py", "all_sliders"),
+}
+
+DEFAULT_DEST_DIRECTORY = "src/gui_elements"
+CACHE_FILE = ".gui_converter_cache.json"
+CACHE_VERSION = 2  # Bump when extract_instantiations changes
+
+
+def _extronlib_ui_names(tree):
+    """
+    Returns (names, modules, shadowed) from the file's imports:
+    names: Key: local name, Value: class name, for from extronlib.ui import ...
+    modules: local names of the extronlib.ui module, ex: "ui" or "extronlib.ui"
+    shadowed: local names imported from anything else, ex: tkinter's Button
+    """
+    names = {}
+    modules = set()
+    shadowed = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                local = alias.asname or alias.name
+                if node.module == "extronlib.ui":
+                    names[local] = alias.name
+                elif node.module == "extronlib" and alias.name == "ui":
+                    modules.add(local)
+                else:
+                    shadowed.add(local)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == "extronlib.ui":
+                    modules.add(alias.asname or "extronlib.ui")
+    return names, modules, shadowed
+
+
+def _call_class_name(node, names, modules, shadowed):
+    """
+    Returns "Button" for Button(...) and Button imported from extronlib.ui,
+    including ui.Button(...) and extronlib.ui.Button(...).
+    Returns None for anything else, ex: tk.Button(...)
+    """
+    func = node.func
+    if isinstance(func, ast.Name):
+        if func.id in names:
+            return names[func.id]
+        return None if func.id in shadowed else func.id
+    if isinstance(func, ast.Attribute):
+        module = func.value
+        if isinstance(module, ast.Name) and module.id in modules:
+            return func.attr
+        if isinstance(module, ast.Attribute) and ast.unparse(module) in modules:
+            return func.attr
+    return None
+
+
+def _is_gui_element_call(node):
+    """Object(UIHost, ID_or_name), keyword arguments like holdTime are allowed"""
+    if len(node.args) < 2 or any(isinstance(a, ast.Starred) for a in node.args):
+        return False
+    host, element_id = node.args[0], node.args[1]
+    if not isinstance(host, (ast.Name, ast.Attribute, ast.Subscript)):
+        return False
+    return isinstance(element_id, ast.Constant) and isinstance(
+        element_id.value, (int, str)
+    )
+
+
+def extract_instantiations(source, file_path="<source>"):
+    """
+    Returns {class name: [instantiation source]} for every
+    variable_name = Object(gui_object, ID) in the source, in file order
+    """
+    tree = ast.parse(source, filename=file_path)
+    names, modules, shadowed = _extronlib_ui_names(tree)
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            value = node.value
+        elif isinstance(node, ast.AnnAssign):
+            value = node.value
+        else:
+            continue
+        if not isinstance(value, ast.Call):
+            continue
+        class_name = _call_class_name(value, names, modules, shadowed)
+        if class_name not in GUI_ELEMENTS or not _is_gui_element_call(value):
+            continue
+        # Written as Button(...), the name the gui_elements files import
+        call = ast.Call(ast.Name(class_name, ast.Load()), value.args, value.keywords)
+        found.append((node.lineno, class_name, ast.unparse(call)))
+
+    found.sort()
+    results = {class_name: [] for class_name in GUI_ELEMENTS}
+    for _, class_name, instantiation in found:
+        results[class_name].append(instantiation)
+    return results
+
+
+def process_file(file_path, cached_hash=None):
+    """
+    Runs in a worker process.
+    Returns (file_path, mtime, sha256, results, err).
+    results is None if the contents match cached_hash.
+    """
+    try:
+        mtime = os.path.getmtime(file_path)
+        with open(file_path, "rb") as f:
+            contents = f.read()
+    except OSError as e:
+        return file_path, None, None, None, str(e)
+
+    sha256 = hashlib.sha256(contents).hexdigest()
+    if sha256 == cached_hash:
+        return file_path, mtime, sha256, None, None
+    try:
+        results = extract_instantiations(contents.decode("utf-8"), file_path)
+    except (SyntaxError, UnicodeDecodeError, ValueError) as e:
+        return file_path, mtime, sha256, {}, "Could not parse: {}".format(e)
+    return file_path, mtime, sha256, results, None
+
+
+def find_source_files(source_directory, exclude_directories=()):
+    excluded = {os.path.abspath(path) for path in exclude_directories}
+    this_file = os.path.abspath(__file__)
+    source_files = []
+    for root, dirs, files in os.walk(source_directory):
+        dirs[:] = sorted(
+            d
+            for d in dirs
+            if not d.startswith(".")
+            and d != "__pycache__"
+            and os.path.abspath(os.path.join(root, d)) not in excluded
+        )
+        for file in sorted(files):
+            path = os.path.abspath(os.path.join(root, file))
+            if file.endswith(".py") and path != this_file:
+                source_files.append(path)
+    return source_files
+
+
+def _load_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def _save_cache(cache_path, files):
+    if not cache_path:
+        return
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"version": CACHE_VERSION, "files": files}, f)
+    os.replace(temp_path, cache_path)
+
+
+def render_list(existing_source, list_name, instantiations):
+    """
+    Returns the destination file's source with list_name holding the existing
+    elements plus any new ones.  Running it again with the same
+    instantiations returns the same source.
+    """
+    tree = ast.parse(existing_source)
+    lines = existing_source.splitlines()
+    target = None
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+            and node.targets[0].id == list_name
+            and isinstance(node.value, ast.List)
+        ):
+            target = node
+            break
+
+    entries = []
+    comments = []
+    if target is not None:
+        entries = [ast.unparse(element) for element in target.value.elts]
+        comments = [
+            line.strip()
+            for line in lines[target.lineno - 1 : target.end_lineno]
+            if line.strip().startswith("#")
+        ]
+    for instantiation in instantiations:
+        if instantiation not in entries:
+            entries.append(instantiation)
+
+    body = ["{} = [".format(list_name)]
+    body += ["    {}".format(comment) for comment in comments]
+    body += ["    {},".format(entry) for entry in entries]
+    body.append("]")
+
+    if target is None:
+        new_lines = lines + ([""] if lines and lines[-1].strip() else []) + body
+    else:
+        new_lines = lines[: target.lineno - 1] + body + lines[target.end_lineno :]
+    return "\n".join(new_lines) + "\n"
+
 
 class InstantionConverter:
+    def __init__(
+        self,
+        user_selected_directory,
+        dest_directory=DEFAULT_DEST_DIRECTORY,
+        cache_path=None,
+        workers=None,
+        dry_run=False,
+    ):
+        self.selected_directory = user_selected_directory
+        self.dest_directory = dest_directory
+        self.cache_path = (
+            cache_path
+            if cache_path is not None
+            else os.path.join(user_selected_directory, CACHE_FILE)
+        )
+        self.workers = workers
+        self.dry_run = dry_run
 
-    def __init__(self, user_selected_directory):
-        self.ignore_lines_with_words = ("import", "extronlib")
-        self.required_chars = ("=", "(", ")", ",")
-        self.dest_button_file = "src/gui_elements/buttons.py"
-        self.dest_knob_file = "src/gui_elements/knobs.py"
-        self.dest_label_file = "src/gui_elements/labels.py"
-        self.dest_level_file = "src/gui_elements/levels.py"
-        self.dest_slider_file = "src/gui_elements/sliders.py"
-
-        self.gui_elements = {
-            "Button": [],
-            "Knob": [],
-            "Label": [],
-            "Level": [],
-            "Slider": [],
-        }
-
-        self.search_terms = self._make_search_terms()
+        self.gui_elements = {class_name: [] for class_name in GUI_ELEMENTS}
+        self.stats = {"files": 0, "parsed": 0, "cached": 0, "errors": 0, "written": 0}
 
-        self.selected_directory = user_selected_directory
+    def _process_directory(self):
+        if not os.path.isdir(self.selected_directory):
+            print(f"The directory '{self.selected_directory}' does not exist.")
+            return False
 
-    def _make_search_terms(self):
-        result = []
-        raw_gui_elements = self.gui_elements.keys()
-        for raw_element in raw_gui_elements:
-            search_str = f"{raw_element}("
-            result.append(search_str)
-        return result
-
-    def _file_to_lines(self, file_path):
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-        return lines
-
-    def _process_file(self, file_path):
-        lines = self._file_to_lines(file_path)
-        print(f"Processing file: {file_path}")
-
-        for line in lines:
-            # Ignore lines with certain words
-            if any(word in line for word in self.ignore_lines_with_words):
-                continue
+        cache = _load_cache(self.cache_path)
+        source_files = find_source_files(
+            self.selected_directory, exclude_directories=(self.dest_directory,)
+        )
+        self.stats["files"] = len(source_files)
 
-            if ":" in line or "[" in line or "{" in line:
+        to_process = []
+        for path in source_files:
+            entry = cache.get(path, None)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
                 continue
-
-            # Ignore commented out lines
-            line_strip = line.strip()
-            if line_strip.startswith("#"):
+            if entry is not None and entry["mtime"] == mtime:
+                self.stats["cached"] += 1
                 continue
-
-            # Ignore lines that don't contain required characters
-            if not all(char in line for char in self.required_chars):
+            to_process.append((path, entry["sha256"] if entry else None))
+
+        if to_process:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                outcomes = executor.map(
+                    process_file,
+                    [path for path, _ in to_process],
+                    [cached_hash for _, cached_hash in to_process],
+                    chunksize=max(1, len(to_process) // 64),
+                )
+                for path, mtime, sha256, results, err in outcomes:
+                    if err:
+                        print(f"------------ Error processing file {path}: {err}")
+                        self.stats["errors"] += 1
+                    if mtime is None:
+                        cache.pop(path, None)
+                        continue
+                    if results is None:  # Touched but unchanged
+                        cache[path]["mtime"] = mtime
+                        self.stats["cached"] += 1
+                        continue
+                    self.stats["parsed"] += 1
+                    cache[path] = {"mtime": mtime, "sha256": sha256, "results": results}
+
+        # Deleted files drop out of the cache
+        current = set(source_files)
+        cache = {path: entry for path, entry in cache.items() if path in current}
+        if not self.dry_run:
+            _save_cache(self.cache_path, cache)
+
+        for path in source_files:
+            entry = cache.get(path, None)
+            if entry is None:
                 continue
-
-            else:
-                try:
-                    splits = line.split("=")
-                    assignment_side = "=".join(splits[1:])  # grab optional args
-                    for search_str in self.search_terms:
-                        if search_str in assignment_side:
-                            obj_type = search_str[:-1]
-                            collection_list = self.gui_elements[obj_type]
-                            collection_list.append(assignment_side)
-                except:
-                    print(f"------------ Error processing line: {line}")
-
-    def _process_directory(self):
-        if selected_directory:
-            try:
-                for root, dirs, files in os.walk(selected_directory):
-                    for file in files:
-                        if (
-                            file.endswith(".py")
-                            and "gui_element_instantiation_converter" not in file
-                        ):
-                            self._process_file(os.path.join(root, file))
-
-            except FileNotFoundError:
-                print(f"The directory '{selected_directory}' does not exist.")
-        else:
-            print("No directory selected to process")
+            for class_name, instantiations in entry["results"].items():
+                for instantiation in instantiations:
+                    if instantiation not in self.gui_elements[class_name]:
+                        self.gui_elements[class_name].append(instantiation)
+        return True
 
     def _write_to_file(self, dest_file, collection, list_name):
-        with open(dest_file, "a") as file:
-            file.write("\n")
-            file.write(f"{list_name} = [\n")
-            for element in collection:
-                file.write(f"    {element},")
-            file.write("\n]\n")
-            print(f"{list_name} written to {dest_file}")
+        if os.path.exists(dest_file):
+            with open(dest_file, "r") as file:
+                existing = file.read()
+        else:
+            existing = ""
+        updated = render_list(existing, list_name, collection)
+        if updated == existing:
+            print(f"{list_name} is already up to date in {dest_file}")
+            return
+        if self.dry_run:
+            print(f"{list_name} would be updated in {dest_file}")
+            return
+        with open(dest_file, "w") as file:
+            file.write(updated)
+        self.stats["written"] += 1
+        print(f"{list_name} written to {dest_file}")
 
     def bundle_and_save(self):
-        self._process_directory()
-        self._write_to_file(
-            self.dest_button_file, self.gui_elements["Button"], "all_buttons"
-        )
-        self._write_to_file(self.dest_knob_file, self.gui_elements["Knob"], "all_knobs")
-        self._write_to_file(
-            self.dest_label_file, self.gui_elements["Label"], "all_labels"
-        )
-        self._write_to_file(
-            self.dest_level_file, self.gui_elements["Level"], "all_levels"
-        )
-        self._write_to_file(
-            self.dest_slider_file, self.gui_elements["Slider"], "all_sliders"
+        if not self._process_directory():
+            return False
+        for class_name, (file_name, list_name) in GUI_ELEMENTS.items():
+            self._write_to_file(
+                os.path.join(self.dest_directory, file_name),
+                self.gui_elements[class_name],
+                list_name,
+            )
+        print(
+            "{files} files: {parsed} parsed, {cached} unchanged, "
+            "{errors} errors, {written} lists written".format(**self.stats)
         )
+        return True
 
 
-def select_source_directory():
-    global selected_directory
-    selected_directory = filedialog.askdirectory(title="Select Source Directory")
-    if selected_directory:
-        print(f"Selected directory: {selected_directory}")
-    else:
-        print("No directory selected")
-
-
-def start_conversion():
-    converter = InstantionConverter(selected_directory)
-    converter.bundle_and_save()
-    print("Conversion complete")
-    exit()
-
+def run_gui():
+    import tkinter as tk
+    from tkinter import filedialog
 
-root = tk.Tk()
-root.title("GUI Instantiation Converter")
+    selected = {"directory": None}
 
-label = tk.Label(root, text=info, anchor="w", justify="left")
-label.pack(pady=10, fill="both")
-
-button_select = tk.Button(
-    root, text="Select Directory", command=select_source_directory
-)
-button_select.pack(pady=5)
-
-button_start = tk.Button(root, text="Start", command=start_conversion)
-button_start.pack(pady=5)
+    def select_source_directory():
+        selected["directory"] = filedialog.askdirectory(title="Select Source Directory")
+        if selected["directory"]:
+            print(f"Selected directory: {selected['directory']}")
+        else:
+            print("No directory selected")
 
-root.mainloop()
+    def start_conversion():
+        if not selected["directory"]:
+            print("No directory selected to process")
+            return
+        converter = InstantionConverter(selected["directory"])
+        converter.bundle_and_save()
+        print("Conversion complete")
+        root.destroy()
+
+    root = tk.Tk()
+    root.title("GUI Instantiation Converter")
+
+    label = tk.Label(root, text=info, anchor="w", justify="left")
+    label.pack(pady=10, fill="both")
+
+    button_select = tk.Button(
+        root, text="Select Directory", command=select_source_directory
+    )
+    button_select.pack(pady=5)
+
+    button_start = tk.Button(root, text="Start", command=start_conversion)
+    button_start.pack(pady=5)
+
+    root.mainloop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert GUI element instantiations from an existing project. "
+        "Opens a window when run without arguments."
+    )
+    parser.add_argument("source", help="directory of the project to convert")
+    parser.add_argument(
+        "--dest",
+        default=DEFAULT_DEST_DIRECTORY,
+        help="gui_elements directory to write to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="cache file (default: {} in the source directory)".format(CACHE_FILE),
+    )
+    parser.add_argument("--no-cache", action="store_true", help="re-read every file")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="report changes without writing"
+    )
+    args = parser.parse_args(argv)
+
+    converter = InstantionConverter(
+        args.source,
+        dest_directory=args.dest,
+        cache_path="" if args.no_cache else args.cache,
+        workers=args.workers,
+        dry_run=args.dry_run,
+    )
+    return 0 if converter.bundle_and_save() else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    run_gui()
@@ -0,0 +1,232 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+"""
+Builds layout_manifest.json from the GUI Designer .gdl files in layout/
+
+Run this on a workstation, not on the processor.
+Upload the result to the root of the processor, the same as ports.json.
+
+The processor uses the manifest to instantiate GUI elements and to validate
+popup and page calls without reading private UIDevice attributes at boot.
+Each layout records the sha256 of its .gdl.  The processor only uses a layout
+when the .gdl in its layout/ folder still has that hash.
+
+The .gdl format is not documented, so both JSON and XML layouts are read.
+If your controls are missed, adjust the field names in the constants below.
+"""
+
+__version__ = "1.0.0"
+
+MANIFEST_VERSION = 2
+DEFAULT_OUTPUT = "layout_manifest.json"
+
+ID_KEYS = ("id", "ID", "Id", "controlId", "ControlId", "ControlID")
+NAME_KEYS = ("name", "Name")
+TYPE_KEYS = ("type", "Type", "class", "Class", "controlType", "ControlType")
+CHILD_KEYS = ("pages", "popups", "controls", "children", "objects", "items")
+
+PAGE_TYPES = ("page", "mainpage")
+POPUP_TYPES = ("popup", "popuppage", "modal")
+
+# Lowercase GDL control type: Extron class used on the processor
+CONTROL_TYPES = {
+    "button": "Button",
+    "togglebutton": "Button",
+    "radiobutton": "Button",
+    "knob": "Knob",
+    "label": "Label",
+    "text": "Label",
+    "level": "Level",
+    "bargraph": "Level",
+    "slider": "Slider",
+}
+
+
+def _first(node, keys):
+    for key in keys:
+        if key in node:
+            return node[key]
+    return None
+
+
+def _xml_to_dict(element):
+    node = dict(element.attrib)
+    node.setdefault("type", element.tag)
+    children = [_xml_to_dict(child) for child in element]
+    if children:
+        node["children"] = children
+    return node
+
+
+def parse_gdl(contents):
+    """Returns the .gdl contents (bytes) as nested dicts, JSON or XML"""
+    try:
+        return json.loads(contents.decode("utf-8-sig"))
+    except ValueError:
+        pass
+    return _xml_to_dict(ET.fromstring(contents))
+
+
+def _children(node):
+    for key, value in node.items():
+        if isinstance(value, list):
+            for child in value:
+                if isinstance(child, dict):
+                    yield key, child
+        elif isinstance(value, dict) and key in CHILD_KEYS:
+            yield key, value
+
+
+def _container_kind(node, parent_key):
+    node_type = str(_first(node, TYPE_KEYS) or "").lower()
+    if node_type in PAGE_TYPES or (parent_key == "pages" and not node_type):
+        return "page"
+    if node_type in POPUP_TYPES or (parent_key == "popups" and not node_type):
+        return "popup"
+    return None
+
+
+def _int_id(node_id):
+    try:
+        return int(node_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_layout(gdl, skipped=None):
+    """
+    Returns {"pages", "popups", "controls"} for one parsed .gdl.
+    Nodes with an id that is not an integer are skipped and added to skipped.
+    """
+    layout = {"pages": {}, "popups": {}, "controls": []}
+    seen_controls = set()
+    skipped = [] if skipped is None else skipped
+
+    def walk(node, parent_key, page):
+        kind = _container_kind(node, parent_key)
+        node_id = _first(node, ID_KEYS)
+        name = _first(node, NAME_KEYS)
+        number = _int_id(node_id)
+        if node_id is not None and name is not None and number is None:
+            skipped.append("{} (id {!r})".format(name, node_id))
+        elif kind is not None and node_id is not None and name is not None:
+            layout[kind + "s"][str(number)] = str(name)
+            page = str(name)
+        elif kind is None and node_id is not None and name is not None:
+            control_type = CONTROL_TYPES.get(
+                str(_first(node, TYPE_KEYS) or "").lower(), None
+            )
+            if control_type is not None and number not in seen_controls:
+                seen_controls.add(number)
+                layout["controls"].append(
+                    {
+                        "id": number,
+                        "name": str(name),
+                        "type": control_type,
+                        "page": page,
+                    }
+                )
+        for key, child in _children(node):
+            walk(child, key, page)
+
+    walk(gdl, None, None)
+    layout["controls"].sort(key=lambda control: control["id"])
+    return layout
+
+
+def device_layouts(room_config_path):
+    """Returns {UI device alias: layout file name} from the room config JSON"""
+    if not room_config_path or not os.path.exists(room_config_path):
+        return {}
+    with open(room_config_path, "r") as f:
+        room_config = json.load(f)
+    devices = {}
+    for device in room_config.get("devices", []):
+        layout_file = device.get("ui", {}).get("layout_file", None)
+        if layout_file:
+            devices[device["alias"]] = layout_file
+    return devices
+
+
+def build_manifest(layout_directory, room_config_path=None, skipped=None):
+    """Returns (manifest, errors), nodes with invalid ids are added to skipped"""
+    layouts = {}
+    errors = []
+    skipped = [] if skipped is None else skipped
+    for path in sorted(glob.glob(os.path.join(layout_directory, "*.gdl"))):
+        file_skipped = []
+        try:
+            with open(path, "rb") as f:
+                contents = f.read()
+            layout = parse_layout(parse_gdl(contents), file_skipped)
+            layout["sha256"] = hashlib.sha256(contents).hexdigest()
+            layouts[os.path.basename(path)] = layout
+        except (OSError, ValueError, ET.ParseError) as e:
+            errors.append("{}: {}".format(path, e))
+            continue
+        skipped.extend("{}: {}".format(path, node) for node in file_skipped)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "devices": device_layouts(room_config_path),
+        "layouts": layouts,
+    }
+    return manifest, errors
+
+
+def write_manifest(manifest, output_path):
+    """Compact and sorted so unchanged layouts give an identical file"""
+    with open(output_path, "w") as f:
+        json.dump(manifest, f, sort_keys=True, separators=(",", ":"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build layout_manifest.json from GUI Designer .gdl files"
+    )
+    parser.add_argument(
+        "--layout",
+        default="layout",
+        help="directory of .gdl files (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--room-config",
+        default=None,
+        help="room configuration JSON, maps UI device aliases to their layout file",
+    )
+    parser.add_argument(
+        "--output", default=DEFAULT_OUTPUT, help="output file (default: %(default)s)"
+    )
+    args = parser.parse_args(argv)
+
+    skipped = []
+    manifest, errors = build_manifest(args.layout, args.room_config, skipped)
+    for err in errors:
+        print("Error reading {}".format(err))
+    for node in skipped:
+        print("Skipped, id is not a number: {}".format(node))
+    if not manifest["layouts"]:
+        print("No .gdl files found in {}".format(args.layout))
+        return 1
+
+    write_manifest(manifest, args.output)
+    for name, layout in manifest["layouts"].items():
+        print(
+            "{}: {} pages, {} popups, {} controls".format(
+                name,
+                len(layout["pages"]),
+                len(layout["popups"]),
+                len(layout["controls"]),
+            )
+        )
+    print("Manifest written to {}".format(args.output))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import hashlib
+import json
+from difflib import get_close_matches
+
+from extronlib.system import File, Timer
+
+from utils import log
+
+"""
+Compiled config.json
+
+config.json is parsed once into a Config object with one typed attribute per
+key, so hot paths read an attribute instead of calling config.get() with a
+default every time.  Missing keys use the defaults below.  Unknown keys and
+bad values are reported by name, and bad values fall back to their default.
+
+ConfigWatcher re-reads config.json when its contents change and hands the new
+Config to a callback, which swaps it in all at once.  Keys with live set to
+False only take effect after the program restarts.
+
+"""
+
+NUMBER = "number"
+INTEGER = "integer"
+
+# Key: (type, default, live), live is False for keys that need a restart
+FIELDS = {
+    "backend_server_addresses": (list, None, True),
+    "backend_server_timeout": (NUMBER, 2, True),
+    "backend_server_min_timeout": (NUMBER, 0.1, True),
+    "backend_uplink_min_timeout": (NUMBER, 0.5, True),
+    "check_backend_server_interval": (NUMBER, 5, True),
+    "backend_server_selection": (str, "priority", False),
+    "backend_server_tiers": (dict, None, True),
+    "backend_server_hysteresis": (NUMBER, 0.2, True),
+    "backend_server_reselect_interval": (NUMBER, 60, False),
+    "backend_hedge_percentile": (NUMBER, None, True),
+    "backend_hedge_min_delay": (NUMBER, 0.02, True),
+    "backend_routes": (list, None, False),
+    "server_search_interval": (NUMBER, 2, True),
+    "backend_server_offline_gui_popup": (str, None, True),
+    "ntp_primary": (str, "pool.ntp.org", False),
+    "ntp_secondary": (str, None, False),
+    "rpc_server_port": (INTEGER, 8080, False),
+    "rpc_server_interface": (str, "LAN", False),
+    "log_to_disk": (bool, False, False),
+    "button_events": (dict, None, False),
+    "ramp_frame_rate": (NUMBER, 20, False),
+    "repeat_send_interval": (NUMBER, 0.25, True),
+    "event_journal_size": (INTEGER, 100, True),
+    "event_journal_persist": (bool, False, False),
+    "knob_accumulate_window": (NUMBER, 0.1, True),
+    "config_reload_interval": (NUMBER, 5, False),
+    "traffic_record": (bool, False, True),
+    "traffic_record_max_bytes": (INTEGER, 1000000, False),
+    "traffic_record_files": (INTEGER, 3, False),
+    "rpc_request_cache_size": (INTEGER, 256, True),
+    "rpc_request_cache_ttl": (NUMBER, 300, True),
+    "rpc_request_wait_timeout": (NUMBER, 30, True),
+    "scheduler_tick": (NUMBER, 0.1, False),
+    "property_push_delay": (NUMBER, 0.1, True),
+}
+
+# Rates, intervals and timeouts that break their users at zero
+ABOVE_ZERO = frozenset(
+    (
+        "backend_server_timeout",
+        "backend_server_min_timeout",
+        "backend_uplink_min_timeout",
+        "check_backend_server_interval",
+        "backend_server_reselect_interval",
+        "server_search_interval",
+        "rpc_server_port",
+        "ramp_frame_rate",
+        "config_reload_interval",
+        "traffic_record_max_bytes",
+        "rpc_request_wait_timeout",
+        "scheduler_tick",
+    )
+)
+
+# Key: (low, high), the value must be between them, exclusive
+BETWEEN = {
+    "backend_hedge_percentile": (0, 100),
+}
+
+CHOICES = {
+    "backend_server_selection": ("priority", "latency"),
+    "rpc_server_interface": ("LAN", "AVLAN"),
+}
+
+
+class Config:
+    __slots__ = tuple(FIELDS) + ("digest", "loaded")
+
+    def __init__(self):
+        for key, (_, default, _) in FIELDS.items():
+            setattr(self, key, default)
+        self.digest = None
+        self.loaded = False  # False when config.json is missing or unreadable
+
+    def get(self, key, default=None):
+        """For keys read once at startup, hot paths should use the attribute"""
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def changed_keys(self, other):
+        return [key for key in FIELDS if getattr(self, key) != getattr(other, key)]
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in FIELDS}
+
+
+def _convert(key, value):
+    """Returns (value, err)"""
+    expected = FIELDS[key][0]
+    if value is None:
+        return None, None
+
+    if expected in (NUMBER, INTEGER):
+        if isinstance(value, bool):
+            return None, "'{}' must be a number, got {}".format(key, json.dumps(value))
+        try:
+            value = int(value) if expected == INTEGER else float(value)
+        except (TypeError, ValueError):
+            return None, "'{}' must be a number, got {}".format(key, json.dumps(value))
+        if key in ABOVE_ZERO and value <= 0:
+            return None, "'{}' must be above zero, got {}".format(
+                key, json.dumps(value)
+            )
+        if value < 0:
+            return None, "'{}' can not be negative".format(key)
+        if key in BETWEEN and not BETWEEN[key][0] < value < BETWEEN[key][1]:
+            return None, "'{}' must be between {} and {}, got {}".format(
+                key, BETWEEN[key][0], BETWEEN[key][1], json.dumps(value)
+            )
+        return value, None
+
+    if not isinstance(value, expected):
+        return None, "'{}' must be a {}, got {}".format(
+            key,
+            {list: "list", dict: "object", str: "string", bool: "boolean"}[expected],
+            json.dumps(value),
+        )
+    if key in CHOICES and value not in CHOICES[key]:
+        return None, "'{}' must be one of {}, got {}".format(
+            key, ", ".join(CHOICES[key]), json.dumps(value)
+        )
+    return value, None
+
+
+def compile_config(raw):
+    """
+    Returns (Config, errors), errors is a list of readable messages.
+    Bad values are replaced with their default.
+    """
+    config = Config()
+    errors = []
+    if not isinstance(raw, dict):
+        return config, ["config.json must be a JSON object"]
+
+    for key, value in raw.items():
+        if key not in FIELDS:
+            suggestion = get_close_matches(key, FIELDS, n=1)
+            if suggestion:
+                errors.append(
+                    "Unknown key '{}', did you mean '{}'?".format(key, suggestion[0])
+                )
+            else:
+                errors.append("Unknown key '{}'".format(key))
+            continue
+        value, err = _convert(key, value)
+        if err:
+            errors.append(err)
+            continue
+        if value is not None:
+            setattr(config, key, value)
+
+    config.loaded = True
+    return config, errors
+
+
+def load_config(path):
+    """Returns (Config, errors), a default Config if the file can't be used"""
+    try:
+        with File(path, "rb") as f:
+            contents = f.read()
+    except Exception:
+        return Config(), ["{} not found".format(path)]
+
+    try:
+        raw = json.loads(contents.decode())
+    except ValueError as e:
+        config = Config()
+        config.digest = hashlib.md5(contents).hexdigest()
+        return config, ["{} is not valid JSON: {}".format(path, str(e))]
+
+    config, errors = compile_config(raw)
+    config.digest = hashlib.md5(contents).hexdigest()
+    return config, errors
+
+
+def file_digest(path):
+    """Returns the md5 of the file, or None if it can't be read"""
+    try:
+        with File(path, "rb") as f:
+            return hashlib.md5(f.read()).hexdigest()
+    except Exception:
+        return None
+
+
+class FileWatcher:
+    """Calls reload() from a Timer when the file's contents change, ex: ports.json"""
+
+    def __init__(self, path, on_change=None, interval=5, digest=None):
+        self.path = path
+        self.on_change = on_change
+        self.digest = digest if digest is not None else file_digest(path)
+        self.reloads = 0
+        self.timer = Timer(interval, self._check) if interval > 0 else None
+
+    def _check(self, timer=None, count=None):
+        digest = file_digest(self.path)
+        if digest is None or digest == self.digest:
+            return  # Deleted, being written, or unchanged
+        self.digest = digest
+        self.reload()
+
+    def reload(self):
+        self.reloads += 1
+        return self.on_change()
+
+
+class ConfigWatcher(FileWatcher):
+    def __init__(self, path, config, on_reload, interval=5):
+        self.on_reload = on_reload
+        super().__init__(path, None, interval, config.digest)
+
+    def reload(self):
+        """Returns the list of errors, the current config is kept if the file is unusable"""
+        config, errors = load_config(self.path)
+        for err in errors:
+            log("config.json: {}".format(err), "error")
+        # The contents that were read, so a rejected file is only logged once
+        if config.digest is not None:
+            self.digest = config.digest
+        if not config.loaded:
+            log("config.json not reloaded, keeping the current config", "error")
+            return errors
+        self.reloads += 1
+        self.on_reload(config)
+        return errors
@@ -0,0 +1,62 @@
+from threading import Lock
+from time import monotonic
+
+"""
+Adaptive backend server timeouts
+
+Round trip times are tracked with an exponentially weighted moving average,
+the same way TCP computes its retransmission timeout:
+timeout = smoothed RTT + 4 * RTT variation, clamped between min and max.
+
+"""
+
+ALPHA = 0.125  # Weight of a new sample in the smoothed RTT
+BETA = 0.25  # Weight of a new sample in the RTT variation
+
+
+class RttEstimator:
+    def __init__(self, min_timeout, max_timeout):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.last_proof = 0.0
+        self.samples = 0
+        self._lock = Lock()
+
+    def observe(self, rtt):
+        """Records a successful round trip, which also proves the server is alive"""
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+            self.samples += 1
+            self.last_proof = monotonic()
+
+    def timeout(self):
+        if self.srtt is None:
+            return self.max_timeout
+        timeout = self.srtt + 4 * self.rttvar
+        return min(self.max_timeout, max(self.min_timeout, timeout))
+
+    def seconds_since_proof(self):
+        return monotonic() - self.last_proof
+
+    def reset(self):
+        """Forget the history, ex: after changing servers"""
+        with self._lock:
+            self.srtt = None
+            self.rttvar = None
+            self.last_proof = 0.0
+            self.samples = 0
+
+    def stats(self):
+        return {
+            "srtt": None if self.srtt is None else round(self.srtt, 4),
+            "rttvar": None if self.rttvar is None else round(self.rttvar, 4),
+            "timeout": round(self.timeout(), 4),
+            "samples": self.samples,
+        }
@@ -0,0 +1,145 @@
+import hashlib
+from bisect import bisect
+from fnmatch import fnmatchcase
+from threading import Lock
+
+from utils import log
+
+"""
+Sharded routing of user interactions across groups of backend servers
+
+Configured in config.json, the first matching route wins:
+
+"backend_routes": [
+    {"domains": ["button"], "names": ["Btn_Audio_*"], "servers": ["http://audio1:8080", "http://audio2:8080"]},
+    {"domains": ["port"], "servers": ["http://devices1:8080", "http://devices2:8080"]}
+]
+
+- domains: optional, event domains this route handles (button, slider, knob, port)
+- names: optional, element name patterns this route handles
+- servers: the server group.  Elements are spread across the healthy members
+  with consistent hashing, so an element keeps its server unless that server fails.
+
+Events that match no route, or whose group has no healthy member,
+go to the paired backend server as normal.
+
+"""
+
+REPLICAS = 64  # Points per server on the hash ring, evens out the spread
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode()).hexdigest()[:8], 16)
+
+
+class HashRing:
+    def __init__(self, members, replicas=REPLICAS):
+        points = []
+        for member in members:
+            for replica in range(replicas):
+                points.append((_hash("{}#{}".format(member, replica)), member))
+        points.sort()
+        self._keys = [point[0] for point in points]
+        self._members = [point[1] for point in points]
+
+    def lookup(self, key, healthy):
+        """Returns the first healthy member clockwise from the key, or None"""
+        if not self._keys:
+            return None
+        start = bisect(self._keys, _hash(key))
+        count = len(self._keys)
+        for offset in range(count):
+            member = self._members[(start + offset) % count]
+            if member in healthy:
+                return member
+        return None
+
+
+class Route:
+    def __init__(self, route_config):
+        domains = route_config.get("domains", None)
+        names = route_config.get("names", None)
+        self.domains = frozenset(domains) if domains else None
+        self.names = tuple(names) if names else None
+        self.servers = list(route_config["servers"])
+        if not self.servers:
+            raise ValueError("Route has no servers")
+        self.ring = HashRing(self.servers)
+
+    def matches(self, domain, name):
+        if self.domains is not None and domain not in self.domains:
+            return False
+        if self.names is not None:
+            return any(fnmatchcase(name, pattern) for pattern in self.names)
+        return True
+
+
+class BackendRouter:
+    def __init__(self, routes_config=None):
+        self.routes = []
+        for number, route_config in enumerate(routes_config or []):
+            try:
+                self.routes.append(Route(route_config))
+            except (KeyError, TypeError, ValueError) as e:
+                log("Invalid backend route {}: {}".format(number, str(e)), "error")
+
+        self.healthy = set()
+        self.routed = {}  # Key: server, Value: number of events sent
+        self._route_cache = {}  # Key: (domain, name), Value: Route or None
+        self._lock = Lock()
+
+    def servers(self):
+        servers = []
+        for route in self.routes:
+            for server in route.servers:
+                if server not in servers:
+                    servers.append(server)
+        return servers
+
+    def _route_for(self, domain, name):
+        key = (domain, name)
+        try:
+            return self._route_cache[key]
+        except KeyError:
+            pass
+        route = None
+        for candidate in self.routes:
+            if candidate.matches(domain, name):
+                route = candidate
+                break
+        self._route_cache[key] = route
+        return route
+
+    def address_for(self, domain, name):
+        """Returns the server for the element, or None to use the paired server"""
+        if not self.routes:
+            return None
+        route = self._route_for(domain, name)
+        if route is None:
+            return None
+        address = route.ring.lookup("{}:{}".format(domain, name), self.healthy)
+        if address is not None:
+            with self._lock:
+                self.routed[address] = self.routed.get(address, 0) + 1
+        return address
+
+    def mark(self, address, healthy):
+        """Updates a server's health, returns True if it just became healthy"""
+        with self._lock:
+            was_healthy = address in self.healthy
+            if healthy:
+                self.healthy.add(address)
+            else:
+                self.healthy.discard(address)
+        if was_healthy and not healthy:
+            log("Routed backend server unavailable: {}".format(address), "error")
+        return healthy and not was_healthy
+
+    def stats(self):
+        return {
+            server: {
+                "healthy": server in self.healthy,
+                "events": self.routed.get(server, 0),
+            }
+            for server in self.servers()
+        }
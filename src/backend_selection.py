@@ -0,0 +1,96 @@
+from threading import Lock
+
+"""
+RTT-aware backend server selection
+
+With the "latency" policy, the processor pairs with the lowest latency
+healthy server in the best priority tier that has a healthy server.
+Servers not listed in "backend_server_tiers" are in tier 0 (best).
+
+To avoid flapping between servers with similar latency, a paired server is
+only replaced by a server in the same tier if the other server is faster by
+more than the hysteresis ratio, on SWITCH_AFTER re-checks in a row.
+
+"""
+
+POLICIES = ("priority", "latency")
+SMOOTHING = 0.5  # Weight of a new RTT sample for each server
+SWITCH_AFTER = 2
+
+
+class ServerSelector:
+    def __init__(self, policy="priority", tiers=None, hysteresis=0.2):
+        if policy not in POLICIES:
+            raise ValueError(
+                "Invalid backend server selection policy: {}".format(policy)
+            )
+        self.policy = policy
+        self.tiers = tiers or {}
+        self.hysteresis = hysteresis
+        self.rtts = {}  # Key: address, Value: smoothed RTT, None if unhealthy
+        self._candidate = None
+        self._streak = 0
+        self._lock = Lock()
+
+    def tier(self, address):
+        return int(self.tiers.get(address, 0))
+
+    def record(self, address, rtt):
+        """Records a probe result, rtt is None if the server did not answer"""
+        with self._lock:
+            previous = self.rtts.get(address, None)
+            if rtt is None or previous is None:
+                self.rtts[address] = rtt
+            else:
+                self.rtts[address] = (1 - SMOOTHING) * previous + SMOOTHING * rtt
+
+    def best(self, addresses=None):
+        """Returns the healthy server with the best (tier, rtt), or None"""
+        with self._lock:
+            healthy = [
+                (self.tier(address), rtt, address)
+                for address, rtt in self.rtts.items()
+                if rtt is not None and (addresses is None or address in addresses)
+            ]
+        if not healthy:
+            return None
+        return min(healthy)[2]
+
+    def should_switch(self, current):
+        """Returns the address to switch to, or None to stay on current"""
+        candidate = self.best()
+        if candidate is None or candidate == current:
+            self._candidate, self._streak = None, 0
+            return None
+
+        current_rtt = self.rtts.get(current, None)
+        if current_rtt is None or self.tier(candidate) < self.tier(current):
+            self._candidate, self._streak = None, 0
+            return candidate  # Current is unhealthy or a better tier is back
+
+        if self.tier(candidate) > self.tier(current):
+            return None
+        if self.rtts[candidate] >= current_rtt * (1 - self.hysteresis):
+            self._candidate, self._streak = None, 0
+            return None
+
+        if candidate == self._candidate:
+            self._streak += 1
+        else:
+            self._candidate, self._streak = candidate, 1
+        if self._streak < SWITCH_AFTER:
+            return None
+        self._candidate, self._streak = None, 0
+        return candidate
+
+    def stats(self):
+        with self._lock:
+            rtts = {
+                address: None if rtt is None else round(rtt, 4)
+                for address, rtt in self.rtts.items()
+            }
+        return {
+            "policy": self.policy,
+            "rtts": rtts,
+            "tiers": {address: self.tier(address) for address in rtts},
+        }
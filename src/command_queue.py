@@ -0,0 +1,181 @@
+import re
+from collections import deque
+from threading import Lock
+from time import monotonic
+
+from extronlib.system import Wait
+
+from utils import log
+
+"""
+Paced outbound command queue for serial and ethernet ports
+
+Configured per port in ports.json:
+- SendMinGap: minimum seconds between commands.  Enables the queue.
+- SendCollapseKey: optional regex, the first group (or whole match) is the
+  "key" of a set-command.  A queued command with the same key is replaced
+  by the newer command, ex: "^(\\w+)=" collapses "VOL=10" and "VOL=12"
+
+"""
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class OutboundCommandQueue:
+    """
+    Sends commands to one port no faster than min_gap apart.
+
+    Higher priority commands are sent first.  A queued command that is
+    identical to, or has the same collapse key as, a newer command is
+    redundant and will not be sent.  It is replaced by the newer command,
+    at the higher of the two priorities.
+    """
+
+    def __init__(self, interface, alias, min_gap, collapse_key=None):
+        self.interface = interface
+        self.alias = alias
+        self.min_gap = min_gap
+        self.collapse_key = re.compile(collapse_key) if collapse_key else None
+
+        # One FIFO per priority level, entries are [data, key, enqueue_time]
+        self._queues = [deque() for _ in PRIORITIES]
+        self._lock = Lock()
+        self._drain_wait = None
+        self._last_send = 0.0
+        self.paused = False
+
+        self.sent = 0
+        self.collapsed = 0
+        self.max_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _key_for(self, data):
+        if not self.collapse_key:
+            return None
+        match = self.collapse_key.search(data)
+        if not match:
+            return None
+        return match.group(1) if self.collapse_key.groups else match.group(0)
+
+    def _collapse(self, data, key, level):
+        """
+        Replaces a redundant queued command, returns True if found.
+        It keeps its place, unless the newer command has a higher priority,
+        then it moves to the end of that priority's queue.
+        """
+        for queue_level, queue in enumerate(self._queues):
+            for entry in queue:
+                if entry[0] == data or (key is not None and entry[1] == key):
+                    entry[0] = data
+                    if level < queue_level:
+                        queue.remove(entry)
+                        self._queues[level].append(entry)
+                    self.collapsed += 1
+                    return True
+        return False
+
+    def depth(self):
+        return sum(len(queue) for queue in self._queues)
+
+    def put(self, data, priority=None):
+        priority = "normal" if priority is None else str(priority).lower()
+        if priority not in PRIORITIES:
+            raise ValueError("Invalid priority: {}".format(priority))
+
+        key = self._key_for(data)
+        with self._lock:
+            if not self._collapse(data, key, PRIORITIES[priority]):
+                self._queues[PRIORITIES[priority]].append([data, key, monotonic()])
+                self.max_depth = max(self.max_depth, self.depth())
+            if self._drain_wait is not None or self.paused:
+                return  # Already draining or held, the new command will be picked up
+            delay = self._last_send + self.min_gap - monotonic()
+            self._drain_wait = Wait(max(delay, 0), self._drain)
+
+    def _pop_next(self):
+        for queue in self._queues:
+            if queue:
+                return queue.popleft()
+        return None
+
+    def _drain(self):
+        with self._lock:
+            entry = None if self.paused else self._pop_next()
+            if entry is None:
+                self._drain_wait = None
+                return
+            self._last_send = monotonic()
+            latency = self._last_send - entry[2]
+            self.sent += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+        try:
+            self.interface.Send(entry[0])
+        except Exception as e:
+            log("Queued send failed on {}: {}".format(self.alias, str(e)), "error")
+
+        with self._lock:
+            if self.depth():
+                self._drain_wait = Wait(self.min_gap, self._drain)
+            else:
+                self._drain_wait = None
+
+    def pause(self):
+        """Holds queued commands until resume() is called"""
+        with self._lock:
+            self.paused = True
+
+    def resume(self):
+        with self._lock:
+            self.paused = False
+            if self._drain_wait is None and self.depth():
+                delay = self._last_send + self.min_gap - monotonic()
+                self._drain_wait = Wait(max(delay, 0), self._drain)
+
+    def clear(self):
+        with self._lock:
+            for queue in self._queues:
+                queue.clear()
+
+    def stats(self):
+        with self._lock:
+            depth = self.depth()
+        return {
+            "depth": depth,
+            "paused": self.paused,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "collapsed": self.collapsed,
+            "avg_latency": (
+                round(self.total_latency / self.sent, 4) if self.sent else 0
+            ),
+            "max_latency": round(self.max_latency, 4),
+        }
+
+
+def make_command_queue(interface, port_definition, required=False):
+    """
+    Returns an OutboundCommandQueue for the port definition,
+    or None if the port does not have SendMinGap configured.
+
+    required: always make a queue (unpaced if SendMinGap is not configured)
+    """
+    min_gap = port_definition.get("SendMinGap", None)
+    if min_gap in [None, ""]:
+        if not required:
+            return None
+        min_gap = 0
+
+    alias = port_definition["Alias"]
+    try:
+        return OutboundCommandQueue(
+            interface,
+            alias,
+            float(min_gap),
+            port_definition.get("SendCollapseKey", None),
+        )
+    except (ValueError, re.error) as e:
+        log("Invalid send queue for {}: {}".format(alias, str(e)), "error")
+        return None
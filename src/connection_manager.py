@@ -0,0 +1,203 @@
+import random
+from threading import Lock
+
+from extronlib import event
+from extronlib.system import Wait
+
+from utils import log
+
+"""
+Managed connection lifecycle for EthernetClientInterfaceEx ports (TCP and SSH)
+
+Configured per port in ports.json:
+- Managed: true to connect at boot and reconnect automatically
+- ReconnectMin: first reconnect delay in seconds, doubled after every failure
+- ReconnectMax: longest reconnect delay in seconds
+- ConnectTimeout: seconds to wait for each connection attempt
+- SendPolicy: "hold" queues Send commands while disconnected,
+  "fail" rejects them immediately
+
+"""
+
+SEND_POLICIES = ("hold", "fail")
+
+
+class ManagedConnection:
+    """
+    Keeps one ethernet client port connected.
+
+    Reconnects with exponential backoff and jitter after a disconnect,
+    until stop() is called (ex: the backend sends "Disconnect").
+    """
+
+    def __init__(
+        self,
+        interface,
+        alias,
+        on_state_change,
+        send_queue=None,
+        reconnect_min=1.0,
+        reconnect_max=60.0,
+        connect_timeout=5.0,
+        send_policy="hold",
+    ):
+        if send_policy not in SEND_POLICIES:
+            raise ValueError("Invalid send policy: {}".format(send_policy))
+        self.interface = interface
+        self.alias = alias
+        self.on_state_change = on_state_change
+        self.send_queue = send_queue
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.connect_timeout = connect_timeout
+        self.send_policy = send_policy
+
+        self.connected = False
+        self.enabled = False
+        self.attempts = 0
+        self.reconnects = 0
+        self._reconnect_wait = None
+        self._lock = Lock()
+
+        event(interface, ["Connected", "Disconnected"])(self.handle_state)
+        if self.send_queue is not None:
+            self.send_queue.pause()
+
+    def start(self):
+        """Connects now and keeps the connection up"""
+        with self._lock:
+            self.enabled = True
+            self.attempts = 0
+        self._schedule_attempt(0)
+
+    def stop(self):
+        """Stops reconnecting, the caller is responsible for disconnecting"""
+        with self._lock:
+            self.enabled = False
+            if self._reconnect_wait is not None:
+                self._reconnect_wait.Cancel()
+                self._reconnect_wait = None
+
+    def handle_state(self, interface, state):
+        """Connected / Disconnected event handler"""
+        self._set_connected(state == "Connected")
+
+    def _set_connected(self, connected):
+        with self._lock:
+            if connected == self.connected:
+                return
+            self.connected = connected
+            if connected:
+                self.attempts = 0
+            enabled = self.enabled
+
+        if self.send_queue is not None:
+            if connected:
+                self.send_queue.resume()
+            else:
+                self.send_queue.pause()
+                if self.send_policy == "fail":
+                    self.send_queue.clear()
+
+        state = "Connected" if connected else "Disconnected"
+        log("Managed connection {}: {}".format(self.alias, state), "info")
+        self.on_state_change(self.alias, state)
+
+        if not connected and enabled:
+            self.reconnects += 1
+            self._schedule_attempt(self._next_delay())
+
+    def _next_delay(self):
+        backoff = min(self.reconnect_max, self.reconnect_min * (2**self.attempts))
+        return backoff * random.uniform(0.5, 1.0)
+
+    def _schedule_attempt(self, delay):
+        with self._lock:
+            if self._reconnect_wait is not None or not self.enabled:
+                return
+            self._reconnect_wait = Wait(delay, self._attempt)
+
+    def connect_now(self, timeout=None):
+        """
+        Connects immediately and keeps the connection up,
+        returns the result of Connect
+        """
+        with self._lock:
+            self.enabled = True
+            if self._reconnect_wait is not None:
+                self._reconnect_wait.Cancel()
+                self._reconnect_wait = None
+        return self._attempt(timeout)
+
+    def _attempt(self, timeout=None):
+        with self._lock:
+            self._reconnect_wait = None
+            if not self.enabled:
+                return "Disabled"
+            if self.connected:
+                return "ConnectedAlready"
+
+        try:
+            result = self.interface.Connect(
+                self.connect_timeout if timeout is None else timeout
+            )
+        except Exception as e:
+            result = str(e)
+
+        if "Connected" in result:  # Includes "ConnectedAlready"
+            self._set_connected(True)
+            return result
+
+        self.attempts += 1
+        delay = self._next_delay()
+        log(
+            "Managed connection {} failed: {}.  Retrying in {:.1f}s".format(
+                self.alias, result, delay
+            ),
+            "warning",
+        )
+        self._schedule_attempt(delay)
+        return result
+
+    def check_send(self):
+        """Raises ConnectionError if a Send should fail fast"""
+        if not self.connected and self.send_policy == "fail":
+            raise ConnectionError("{} is disconnected".format(self.alias))
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "enabled": self.enabled,
+            "send_policy": self.send_policy,
+            "failed_attempts": self.attempts,
+            "reconnects": self.reconnects,
+        }
+
+
+def is_managed(port_definition):
+    return str(port_definition.get("Managed", "")).lower() in ["true", "1", "yes"]
+
+
+def make_managed_connection(interface, port_definition, on_state_change, send_queue):
+    """
+    Returns a ManagedConnection for the port definition,
+    or None if the port is not managed
+    """
+    if not is_managed(port_definition):
+        return None
+
+    alias = port_definition["Alias"]
+    try:
+        return ManagedConnection(
+            interface,
+            alias,
+            on_state_change,
+            send_queue=send_queue,
+            reconnect_min=float(port_definition.get("ReconnectMin", 1)),
+            reconnect_max=float(port_definition.get("ReconnectMax", 60)),
+            connect_timeout=float(port_definition.get("ConnectTimeout", 5)),
+            send_policy=str(port_definition.get("SendPolicy", "hold")).lower(),
+        )
+    except ValueError as e:
+        log("Invalid managed connection for {}: {}".format(alias, str(e)), "error")
+        return None
@@ -0,0 +1,138 @@
+from collections import deque
+from threading import Lock
+from time import monotonic
+
+from extronlib.system import Wait
+
+from utils import log
+
+"""
+Aggregation of high rate GUI events before they are sent to the backend
+
+"""
+
+
+class KnobAccumulator:
+    """
+    Sums knob steps into one net delta per window.
+
+    The first step after the knob has been idle opens a window.
+    When the window closes, the net delta is sent as one event,
+    so the last event of a turn is always sent once turning stops.
+    """
+
+    def __init__(self, send_func, window=0.1):
+        self.send_func = send_func
+        self.window = window
+        self._deltas = {}
+        self._waits = {}
+        self._lock = Lock()
+
+    def add(self, knob, steps):
+        if self.window <= 0:
+            self.send_func(knob, steps)
+            return
+
+        name = str(knob.Name)
+        with self._lock:
+            self._deltas[name] = self._deltas.get(name, 0) + steps
+            if name not in self._waits:
+                self._waits[name] = Wait(self.window, lambda: self.flush(knob))
+
+    def flush(self, knob):
+        name = str(knob.Name)
+        with self._lock:
+            delta = self._deltas.pop(name, 0)
+            self._waits.pop(name, None)
+        if delta != 0:  # Turned back and forth within the window
+            self.send_func(knob, delta)
+
+
+class RepeatAggregator:
+    """
+    Sends at most one Repeated event per button per interval,
+    with the number of repeats since the last one was sent.
+
+    Call flush() before sending any other event for the button
+    so the backend receives the pending repeats first.
+    """
+
+    def __init__(self, send_func, interval=0.25):
+        self.send_func = send_func
+        self.interval = interval
+        self._states = {}  # Key: button name, Value: [count, last_sent, wait]
+        self._lock = Lock()
+
+    def add(self, button):
+        if self.interval <= 0:
+            self.send_func(button, 1)
+            return
+
+        name = str(button.Name)
+        count = 0
+        with self._lock:
+            state = self._states.setdefault(name, [0, 0.0, None])
+            state[0] += 1
+            if state[2] is not None:
+                return  # Will be sent when the pending wait expires
+            now = monotonic()
+            remaining = state[1] + self.interval - now
+            if remaining <= 0:
+                count = state[0]
+                state[0] = 0
+                state[1] = now
+            else:
+                state[2] = Wait(remaining, lambda: self.flush(button))
+        if count:
+            self.send_func(button, count)
+
+    def flush(self, button):
+        name = str(button.Name)
+        with self._lock:
+            state = self._states.get(name, None)
+            if state is None:
+                return
+            if state[2] is not None:
+                state[2].Cancel()
+                state[2] = None
+            count = state[0]
+            state[0] = 0
+            if count:
+                state[1] = monotonic()
+        if count:
+            self.send_func(button, count)
+
+
+class OrderedSender:
+    """
+    Sends each key's events one at a time, in the order they were added,
+    so a button's Released can't reach the backend before its last Repeated.
+    Different keys are sent in parallel.
+    """
+
+    def __init__(self, send_func):
+        self.send_func = send_func  # Returns when the event has been sent
+        self._queues = {}  # Key: key, Value: deque, only while it is being sent
+        self._lock = Lock()
+
+    def add(self, key, data):
+        with self._lock:
+            queue = self._queues.get(key, None)
+            if queue is not None:
+                queue.append(data)  # Sent by the running worker
+                return
+            queue = deque([data])
+            self._queues[key] = queue
+        Wait(0, lambda: self._send_queued(key, queue))
+
+    def _send_queued(self, key, queue):
+        while True:
+            with self._lock:
+                if not queue:
+                    del self._queues[key]
+                    return
+                data = queue.popleft()
+            try:
+                self.send_func(data)
+            except Exception as e:
+                log("Error sending event for {}: {}".format(key, str(e)), "error")
@@ -0,0 +1,142 @@
+import json
+from collections import OrderedDict
+from threading import Lock
+from time import time
+
+from extronlib.system import File, Wait
+
+from utils import log
+
+"""
+Store-and-forward journal for user interactions while no backend server is paired
+
+Events are compacted as they are recorded:
+- Button presses (ORDERED_ACTIONS) are kept in order, up to max_ordered
+- Knob turns are summed into one net delta per knob
+- Everything else keeps only the latest value per element and action
+
+"""
+
+ORDERED_ACTIONS = ("Pressed", "Released", "Held", "Repeated", "Tapped")
+SUMMED_ACTIONS = {("knob", "Turned")}
+
+PERSIST_DELAY = 2  # Seconds, limits flash writes while events are arriving
+
+
+class EventJournal:
+    def __init__(self, max_ordered=100, persist_path=None):
+        self.max_ordered = max_ordered
+        self.persist_path = persist_path
+        self.ordered = []
+        self.latest = OrderedDict()
+        self.dropped = 0
+        self._lock = Lock()
+        self._persist_wait = None
+
+    def _entry(self, gui_element_data):
+        entry = {
+            "domain": gui_element_data[0],
+            "name": gui_element_data[1],
+            "action": gui_element_data[2],
+            "value": gui_element_data[3],
+            "timestamp": str(time()),
+        }
+        if len(gui_element_data) > 4:
+            entry.update(gui_element_data[4])
+        return entry
+
+    def record(self, gui_element_data):
+        if self.max_ordered <= 0:
+            return
+        entry = self._entry(gui_element_data)
+        domain, name, action = entry["domain"], entry["name"], entry["action"]
+
+        with self._lock:
+            if action in ORDERED_ACTIONS:
+                self.ordered.append(entry)
+                if len(self.ordered) > self.max_ordered:
+                    del self.ordered[0]
+                    self.dropped += 1
+            else:
+                key = (domain, name, action)
+                previous = self.latest.pop(key, None)
+                if previous is not None and (domain, action) in SUMMED_ACTIONS:
+                    entry["value"] = str(int(previous["value"]) + int(entry["value"]))
+                self.latest[key] = entry  # Moves to the end, newest last
+        self._schedule_persist()
+
+    def events(self):
+        """Returns all journaled events, oldest first"""
+        with self._lock:
+            events = self.ordered + list(self.latest.values())
+        events.sort(key=lambda entry: float(entry["timestamp"]))
+        return events
+
+    def __len__(self):
+        return len(self.ordered) + len(self.latest)
+
+    def remove(self, events):
+        """
+        Removes events returned by events() once they were sent.  Events
+        recorded since then are kept, a knob turned since keeps only its new
+        delta.
+        """
+        sent = set(id(entry) for entry in events)
+        with self._lock:
+            self.ordered = [entry for entry in self.ordered if id(entry) not in sent]
+            for entry in events:
+                domain, action = entry["domain"], entry["action"]
+                key = (domain, entry["name"], action)
+                current = self.latest.get(key, None)
+                if current is entry:
+                    del self.latest[key]
+                elif current is not None and (domain, action) in SUMMED_ACTIONS:
+                    delta = int(current["value"]) - int(entry["value"])
+                    if delta:
+                        current["value"] = str(delta)
+                    else:
+                        del self.latest[key]
+        self._schedule_persist()
+
+    def clear(self):
+        with self._lock:
+            self.ordered = []
+            self.latest = OrderedDict()
+            self.dropped = 0
+        self._schedule_persist()
+
+    def _schedule_persist(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            if self._persist_wait is None:
+                self._persist_wait = Wait(PERSIST_DELAY, self.save)
+
+    def save(self):
+        with self._lock:
+            self._persist_wait = None
+        try:
+            with File(self.persist_path, "w") as f:
+                json.dump(self.events(), f)
+        except Exception as e:
+            log("Error saving event journal: {}".format(str(e)), "error")
+
+    def load(self):
+        """Restores events saved before a reboot"""
+        if not self.persist_path or not File.Exists(self.persist_path):
+            return
+        try:
+            with File(self.persist_path, "r") as f:
+                saved = json.load(f)
+        except Exception as e:
+            log("Error loading event journal: {}".format(str(e)), "error")
+            return
+        with self._lock:
+            for entry in saved:
+                if entry["action"] in ORDERED_ACTIONS:
+                    self.ordered.append(entry)
+                else:
+                    key = (entry["domain"], entry["name"], entry["action"])
+                    self.latest[key] = entry
+            self.ordered = self.ordered[-self.max_ordered :]
+        log("Loaded {} journaled events".format(len(self)), "info")
@@ -0,0 +1,115 @@
+from fnmatch import fnmatchcase
+from threading import Lock
+
+from utils import log
+
+"""
+Per-element button event subscriptions
+
+Configured in config.json:
+
+"button_events": {
+    "default": ["Pressed"],
+    "elements": {"Btn_Vol_Up": ["Pressed", "Released", "Repeated"]},
+    "patterns": {"Btn_Nav_*": ["Pressed", "Tapped"]}
+}
+
+Exact element names take priority over patterns,
+patterns are checked in order and the first match wins.
+
+"""
+
+VALID_BUTTON_EVENTS = ("Pressed", "Released", "Held", "Repeated", "Tapped")
+
+
+def _validated_events(events, where):
+    valid = []
+    for event_name in events:
+        if event_name in VALID_BUTTON_EVENTS:
+            valid.append(event_name)
+        else:
+            log("Invalid button event {} in {}".format(event_name, where), "error")
+    return tuple(valid)
+
+
+def compile_button_subscriptions(button_names, subscription_config, default_events):
+    """
+    Returns a dictionary of {"button name": (events,)} for every button.
+
+    Buttons subscribed to no events are left out.
+    """
+    subscription_config = subscription_config or {}
+    default = _validated_events(
+        subscription_config.get("default", default_events), "default"
+    )
+    elements = {
+        name: _validated_events(events, name)
+        for name, events in subscription_config.get("elements", {}).items()
+    }
+    patterns = [
+        (pattern, _validated_events(events, pattern))
+        for pattern, events in subscription_config.get("patterns", {}).items()
+    ]
+
+    for name in elements:
+        if name not in button_names:
+            log(
+                "Button event subscription for unknown button: {}".format(name),
+                "warning",
+            )
+
+    subscriptions = {}
+    for name in button_names:
+        events = elements.get(name, None)
+        if events is None:
+            for pattern, pattern_events in patterns:
+                if fnmatchcase(name, pattern):
+                    events = pattern_events
+                    break
+            else:
+                events = default
+        if events:
+            subscriptions[name] = events
+    return subscriptions
+
+
+def group_by_events(subscriptions, element_map):
+    """
+    Returns {(events,): [elements]} so each group can be registered
+    with a single @event call
+    """
+    groups = {}
+    for name, events in subscriptions.items():
+        groups.setdefault(events, []).append(element_map[name])
+    return groups
+
+
+class EventCounter:
+    """Counts user interaction events per element and action"""
+
+    def __init__(self):
+        self.counts = {}
+        self._lock = Lock()
+
+    def count(self, domain, name, action):
+        key = (domain, name)
+        with self._lock:
+            actions = self.counts.setdefault(key, {})
+            actions[action] = actions.get(action, 0) + 1
+
+    def report(self):
+        """Returns {"domain": {"name": {"action": count}}}, busiest elements first"""
+        with self._lock:
+            items = [
+                (domain, name, dict(actions))
+                for (domain, name), actions in self.counts.items()
+            ]
+        items.sort(key=lambda item: sum(item[2].values()), reverse=True)
+        report = {}
+        for domain, name, actions in items:
+            report.setdefault(domain, {})[name] = actions
+        return report
+
+    def reset(self):
+        with self._lock:
+            self.counts = {}
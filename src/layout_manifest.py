@@ -0,0 +1,178 @@
+import hashlib
+import json
+
+from extronlib.system import File
+
+from utils import log
+
+"""
+Precompiled layout manifest
+
+layout_manifest_builder.py (run on a workstation) parses the .gdl files in
+layout/ into layout_manifest.json, which is uploaded to the processor like
+ports.json.  At boot the manifest is read once to:
+- Instantiate GUI elements that are not already in the gui_elements lists
+- Build the popup and page tables used to validate ShowPopup and ShowPage
+
+A layout is only used if the .gdl in layout/ on the processor still has the
+sha256 recorded by the builder.  A stale or unverifiable layout is ignored,
+and its UI devices read their tables from extronlib as before.
+
+Manifest format:
+{
+    "version": 2,
+    "devices": {"TouchPanel_1": "Test_Page.gdl"},
+    "layouts": {
+        "Test_Page.gdl": {
+            "sha256": "<sha256 of the .gdl>",
+            "pages": {"1": "Main"},
+            "popups": {"10": "Pop_Volume"},
+            "controls": [{"id": 101, "name": "Btn_Power", "type": "Button", "page": "Main"}]
+        }
+    }
+}
+
+"""
+
+MANIFEST_VERSION = 2
+LAYOUT_DIRECTORY = "layout"
+
+
+def load_manifest(path="layout_manifest.json"):
+    """Returns the manifest dict, or None if there is no usable manifest"""
+    if not File.Exists(path):
+        return None
+    try:
+        with File(path, "r") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        log("Error loading layout manifest: {}".format(str(e)), "error")
+        return None
+    if manifest.get("version", None) != MANIFEST_VERSION:
+        log(
+            "Unsupported layout manifest version: {}".format(
+                manifest.get("version", None)
+            ),
+            "error",
+        )
+        return None
+    return manifest
+
+
+def _int_ids(table, kind):
+    """Entries with an id that is not an integer are skipped, not the whole layout"""
+    result = {}
+    for item_id, name in table.items():
+        try:
+            result[int(item_id)] = name
+        except (TypeError, ValueError):
+            log(
+                "Skipping layout manifest {} {} with invalid id: {}".format(
+                    kind, name, item_id
+                ),
+                "error",
+            )
+    return result
+
+
+class LayoutIndex:
+    """Precomputed popup and page tables for one layout"""
+
+    def __init__(self, layout):
+        self.pages = _int_ids(layout["pages"], "page")
+        self.popups = _int_ids(layout["popups"], "popup")
+        self.page_names = frozenset(self.pages.values())
+        self.popup_names = frozenset(self.popups.values())
+        self.controls = layout.get("controls", [])
+
+
+def layout_name_for_device(manifest, device_alias):
+    """Returns the name of the layout used by the UI device, or None"""
+    layouts = manifest.get("layouts", {})
+    layout_name = manifest.get("devices", {}).get(device_alias, None)
+    if layout_name is None and len(layouts) == 1:
+        layout_name = list(layouts.keys())[0]  # Single layout, no room config needed
+    return layout_name if layout_name in layouts else None
+
+
+def layout_is_current(layout_name, layout, layout_directory=LAYOUT_DIRECTORY):
+    """True if the .gdl the layout was built from has not changed"""
+    path = "{}/{}".format(layout_directory, layout_name)
+    if not layout.get("sha256", None) or not File.Exists(path):
+        return False
+    try:
+        with File(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest() == layout["sha256"]
+    except Exception as e:
+        log("Error reading {}: {}".format(path, str(e)), "error")
+        return False
+
+
+def build_layout_indexes(manifest, ui_devices, layout_directory=LAYOUT_DIRECTORY):
+    """
+    Returns {device alias: LayoutIndex} for every UI device whose layout
+    is in the manifest and matches its .gdl
+    """
+    current = {}  # Key: layout name, Value: True if the .gdl matches
+    indexes = {}
+    for ui_device in ui_devices:
+        layout_name = layout_name_for_device(manifest, ui_device.DeviceAlias)
+        if layout_name is None:
+            continue
+        layout = manifest["layouts"][layout_name]
+        if layout_name not in current:
+            current[layout_name] = layout_is_current(
+                layout_name, layout, layout_directory
+            )
+            if not current[layout_name]:
+                log(
+                    "layout_manifest.json is out of date for {}, "
+                    "re-run layout_manifest_builder.py".format(layout_name),
+                    "warning",
+                )
+        if not current[layout_name]:
+            continue
+        try:
+            indexes[ui_device.DeviceAlias] = LayoutIndex(layout)
+        except (KeyError, TypeError, ValueError) as e:
+            log(
+                "Invalid layout manifest for {}: {}".format(
+                    ui_device.DeviceAlias, str(e)
+                ),
+                "error",
+            )
+    return indexes
+
+
+def instantiate_elements(indexes, ui_device_map, element_lists):
+    """
+    Adds an object for every manifest control not already in its list.
+
+    element_lists: {control type: (class, list)}, ex: {"Button": (Button, all_buttons)}
+    Names must be unique across UI devices, the same as the hand-written lists.
+    Returns the number of elements added.
+    """
+    existing = set()
+    for _, elements in element_lists.values():
+        existing.update(str(element.Name) for element in elements)
+
+    added = 0
+    for device_alias, index in indexes.items():
+        ui_device = ui_device_map[device_alias]
+        for control in index.controls:
+            if control["type"] not in element_lists or control["name"] in existing:
+                continue
+            element_class, elements = element_lists[control["type"]]
+            try:
+                elements.append(element_class(ui_device, int(control["id"])))
+            except Exception as e:
+                log(
+                    "Error instantiating {} {}: {}".format(
+                        control["type"], control["name"], str(e)
+                    ),
+                    "error",
+                )
+                continue
+            existing.add(control["name"])
+            added += 1
+    return added
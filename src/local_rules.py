@@ -0,0 +1,121 @@
+from threading import Lock
+
+from utils import log
+
+"""
+Local fast-feedback rules
+
+Rules run on the processor as soon as a user interaction happens,
+before the event is sent to the backend.  The backend's reply is still
+authoritative and can overwrite anything a rule did.
+
+Rules are loaded from rules.json or pushed with the "set_local_rules" macro.
+Actions use the same format as RPC commands.
+
+[
+    {
+        "on": {"type": "Button", "object": "Btn_Power", "action": "Pressed"},
+        "do": [
+            {"type": "Button", "object": "Btn_Power", "function": "SetState", "arg1": "{toggle}"},
+            {"type": "UIDevice", "object": "TouchPanel_1", "function": "ShowPopup", "arg1": "Popup_Power"}
+        ]
+    }
+]
+
+Placeholders in action args:
+- {value}: the event value (button state, slider level)
+- {toggle}: "0" if the event value is "1", otherwise "1"
+
+"""
+
+
+def _toggled(value):
+    return "0" if value == "1" else "1"
+
+
+class LocalRuleEngine:
+    """Compiles rules into an {(domain, name, action): [actions]} index"""
+
+    def __init__(self, domain_class_map, methods_map):
+        self.domain_class_map = domain_class_map
+        self.methods_map = methods_map
+        self.index = {}
+        self.rules = []
+        self._lock = Lock()
+
+    def _compile_action(self, action):
+        object_map = self.domain_class_map[action["type"]]
+        object_name = action["object"]
+        if object_name not in object_map:
+            raise KeyError(object_name)
+        func = self.methods_map[action["function"]]
+        args = [
+            action.get(arg, None)
+            for arg in ["arg1", "arg2", "arg3"]
+            if action.get(arg, None) not in ["", None]
+        ]
+        templated = any("{" in str(arg) for arg in args)
+        # Objects are looked up when the rule runs, reload_ports can replace them
+        return (func, object_map, object_name, tuple(args), templated)
+
+    def compile(self, rules):
+        """
+        Replaces all rules, returns a list of errors.
+
+        Invalid rules are skipped, every valid rule is still loaded.
+        """
+        index = {}
+        errors = []
+        for number, rule in enumerate(rules):
+            try:
+                trigger = rule["on"]
+                key = (
+                    trigger["type"].lower(),
+                    trigger["object"],
+                    trigger.get("action", "Pressed"),
+                )
+                actions = [self._compile_action(action) for action in rule["do"]]
+            except KeyError as e:
+                errors.append("Rule {}: not found: {}".format(number, str(e)))
+                continue
+            except (TypeError, AttributeError) as e:
+                errors.append("Rule {}: malformed: {}".format(number, str(e)))
+                continue
+            index.setdefault(key, []).extend(actions)
+
+        with self._lock:
+            self.index = index
+            self.rules = rules
+        for err in errors:
+            log("Local rules: {}".format(err), "error")
+        return errors
+
+    def run(self, domain, name, action, value):
+        """Runs every action triggered by the event"""
+        actions = self.index.get((domain, name, action), None)
+        if not actions:
+            return
+        for func, object_map, object_name, args, templated in actions:
+            obj = object_map.get(object_name, None)
+            if obj is None:
+                log(
+                    "Local rule error on {} {}: Object not found: {}".format(
+                        name, action, object_name
+                    ),
+                    "error",
+                )
+                continue
+            if templated:
+                args = [
+                    str(arg)
+                    .replace("{value}", value)
+                    .replace("{toggle}", _toggled(value))
+                    for arg in args
+                ]
+            try:
+                func(obj, *args)
+            except Exception as e:
+                log(
+                    "Local rule error on {} {}: {}".format(name, action, str(e)),
+                    "error",
+                )
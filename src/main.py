@@ -1,14 +1,31 @@
 import json
 import urllib.error
 import urllib.request
+import uuid
+from threading import Lock
+from time import monotonic
 from time import sleep  # Only for intentionally blocking the main thread
 
 from extronlib import event
 from extronlib.interface import EthernetServerInterfaceEx
 from extronlib.system import File as open
 from extronlib.system import SaveProgramLog, Timer, Wait
+from extronlib.ui import Button, Knob, Label, Level, Slider
 
 import variables
+from app_config import FIELDS, ConfigWatcher, FileWatcher, load_config
+from backend_health import RttEstimator
+from backend_routing import BackendRouter
+from backend_selection import ServerSelector
+from command_queue import make_command_queue
+from connection_manager import is_managed, make_managed_connection
+from event_aggregation import KnobAccumulator, OrderedSender, RepeatAggregator
+from event_journal import EventJournal
+from event_subscriptions import (
+    EventCounter,
+    compile_button_subscriptions,
+    group_by_events,
+)
 from extronlib_extensions import (
     EthernetClientInterfaceEx,
     RelayInterfaceEx,
@@ -20,16 +37,30 @@ from gui_elements.labels import all_labels
 from gui_elements.levels import all_levels
 from gui_elements.sliders import all_sliders
 from hardware.hardware import all_processors, all_ui_devices
+from layout_manifest import build_layout_indexes, instantiate_elements, load_manifest
+from local_rules import LocalRuleEngine
+from property_subscriptions import PropertySubscriptions
+from ramps import RampScheduler
+from receive_framing import make_receive_forwarder
+from request_cache import RequestCache, unwrap_batch
+from sequences import SequenceStore
+from ssh_sessions import SshSessionPool, is_session_reuse, make_ssh_session
+from timer_wheel import TimerWheel, parse_at
+from traffic_recorder import TrafficRecorder
+from uplink_hedging import UplinkHedger
 from utils import (
     ProgramLogSaver,
     backend_server_ok,
+    backend_server_probe,
     backend_server_ready_to_pair,
+    function_error,
     log,
     set_ntp,
 )
 
+# Default events for buttons without a subscription in config.json "button_events".
 # "Released" is ommitted by default to increase performance,
-# but it can be added to the list if needed.
+# but it can be added per button or pattern where needed.
 BUTTON_EVENTS = ["Pressed", "Held", "Repeated", "Tapped"]
 
 
@@ -41,24 +72,113 @@ def load_json(path):
         return None
 
 
-config = load_json("config.json")
-if not config:
+# Compiled once, see app_config.py.  Swapped by apply_config() when config.json changes
+config, config_errors = load_config("config.json")
+for err in config_errors:
+    log("config.json: {}".format(err), "error")
+if not config.loaded:
     log("Config file not found!", "error")
     log("Using Default for ALL config settings (except backend servers)", "warning")
     log("See default config settings in 'config.json.exmaple'", "info")
     log(
         "Without a config file, the backend servers must now be manually set", "warning"
     )
-    config = {}
 
 
-log_to_disk = config.get("log_to_disk", False)
-if log_to_disk:
+if config.log_to_disk:
     ProgramLogSaver.EnableProgramLogSaver()
     variables.program_log_saver = "Enabled"
     log("Enabling Program Log Saver", "info")
 
-variables.backend_server_timeout = config.get("backend_server_timeout", 2)
+variables.backend_server_timeout = config.backend_server_timeout
+
+# Test probes and uplink events are timed separately,
+# uplink replies also include the backend's processing time
+probe_rtt = RttEstimator(
+    config.backend_server_min_timeout, config.backend_server_timeout
+)
+uplink_rtt = RttEstimator(
+    config.backend_uplink_min_timeout, config.backend_server_timeout
+)
+backend_router = BackendRouter(config.backend_routes)
+server_selector = ServerSelector(
+    config.backend_server_selection,
+    config.backend_server_tiers,
+    config.backend_server_hysteresis,
+)
+
+# Slow uplink replies are hedged to a warm secondary server, see uplink_hedging.py
+uplink_hedger = UplinkHedger(
+    config.backend_hedge_percentile,
+    config.backend_hedge_min_delay,
+    config.backend_server_timeout,
+)
+
+ramp_scheduler = RampScheduler(config.ramp_frame_rate)
+
+event_journal = EventJournal(
+    config.event_journal_size,
+    "event_journal.json" if config.event_journal_persist else None,
+)
+event_journal.load()
+
+# Optional, for replay with traffic_replay.py
+traffic_recorder = TrafficRecorder(
+    "traffic.jsonl", config.traffic_record_max_bytes, config.traffic_record_files
+)
+if config.traffic_record:
+    traffic_recorder.start()
+
+# Replies to RPC batches sent with a request_id, so retries don't run twice
+request_cache = RequestCache(
+    config.rpc_request_cache_size, config.rpc_request_cache_ttl
+)
+
+# Commands with "delay" or "at", see timer_wheel.py
+command_scheduler = TimerWheel(config.scheduler_tick)
+
+
+PORT_FIELDS = {
+    # Key: Class, Value: (required fields, integer fields)
+    "RelayInterfaceEx": (("Host", "Port"), ()),
+    "SerialInterfaceEx": (
+        ("Host", "Port", "Parity", "FlowControl", "Mode"),
+        ("Baud", "Data", "Stop", "CharDelay"),
+    ),
+    "EthernetClientInterfaceEx": (("Hostname", "Protocol"), ("IPPort",)),
+}
+ETHERNET_PROTOCOL_FIELDS = {
+    "TCP": ((), ()),
+    "UDP": ((), ("ServicePort", "bufferSize")),
+    "SSH": (("Username", "Password"), ()),
+}
+
+
+def check_port_definition(port_definition):
+    """Returns None if the port can be instantiated, or the reason it can't"""
+    if not isinstance(port_definition, dict):
+        return "Port definition is not an object"
+    port_class = port_definition.get("Class", None)
+    if port_class not in PORT_FIELDS:
+        return "Unknown Port Definition Class: {}".format(port_class)
+    required, integers = PORT_FIELDS[port_class]
+    if port_class == "EthernetClientInterfaceEx":
+        protocol = port_definition.get("Protocol", None)
+        if protocol not in ETHERNET_PROTOCOL_FIELDS:
+            return "Unknown Ethernet Protocol: {}".format(protocol)
+        required += ETHERNET_PROTOCOL_FIELDS[protocol][0]
+        integers += ETHERNET_PROTOCOL_FIELDS[protocol][1]
+    missing = [key for key in required + integers if key not in port_definition]
+    if missing:
+        return "Missing {}".format(", ".join(missing))
+    for key in integers:
+        try:
+            int(port_definition[key])
+        except (TypeError, ValueError):
+            return "{} is not an integer: {}".format(key, port_definition[key])
+    if "Host" in required and port_definition["Host"] not in PROCESSORS_MAP:
+        return "Host Processor not found: {}".format(port_definition["Host"])
+    return None
 
 
 class PortInstantiation:
@@ -66,6 +186,8 @@ class PortInstantiation:
     Instantiates all ports defined in ports.json
 
     Use port_instantiation_helper.py make the JSON file
+
+    reconcile() applies an edited ports.json without a restart
     """
 
     def __init__(self):
@@ -73,21 +195,131 @@ class PortInstantiation:
         self.all_relays = []
         self.all_serial_interfaces = []
         self.all_ethernet_interfaces = []
+        self.definitions = {}  # Key: alias, Value: port definition
+        self.interfaces = {}  # Key: alias, Value: interface
+        self.receive_forwarders = {}
+        self.send_queues = {}
+        self.managed_connections = {}
+        self.ssh_sessions = SshSessionPool()
+        self._lock = Lock()
         self.instantiate_ports()
 
     def instantiate_ports(self):
         if not self.port_definitions:
             return
         for port_definition in self.port_definitions:
-            port_class = port_definition["Class"]
-            if port_class == "RelayInterfaceEx":
-                self.instantiate_relays(port_definition)
-            elif port_class == "SerialInterfaceEx":
-                self.instantiate_serial_interface(port_definition)
-            elif port_class == "EthernetClientInterfaceEx":
-                self.instantiate_ethernet_client_interface(port_definition)
-            else:
-                log("Unknown Port Definition Class: {}".format(port_class), "error")
+            self.instantiate_port(port_definition)
+
+    def instantiate_port(self, port_definition):
+        port_class = port_definition["Class"]
+        if port_class == "RelayInterfaceEx":
+            interface = self.instantiate_relays(port_definition)
+        elif port_class == "SerialInterfaceEx":
+            interface = self.instantiate_serial_interface(port_definition)
+        elif port_class == "EthernetClientInterfaceEx":
+            interface = self.instantiate_ethernet_client_interface(port_definition)
+        else:
+            log("Unknown Port Definition Class: {}".format(port_class), "error")
+            return
+        if interface is not None:
+            self.definitions[port_definition["Alias"]] = port_definition
+            self.interfaces[port_definition["Alias"]] = interface
+
+    def teardown_port(self, alias):
+        """Stops everything attached to the port and forgets it"""
+        interface = self.interfaces.pop(alias, None)
+        self.definitions.pop(alias, None)
+
+        connection = self.managed_connections.pop(alias, None)
+        if connection is not None:
+            connection.stop()
+        self.ssh_sessions.remove(alias)
+        forwarder = self.receive_forwarders.pop(alias, None)
+        if forwarder is not None:
+            forwarder.flush()
+        queue = self.send_queues.pop(alias, None)
+        if queue is not None:
+            queue.clear()
+
+        for interfaces in (
+            self.all_relays,
+            self.all_serial_interfaces,
+            self.all_ethernet_interfaces,
+        ):
+            if interface in interfaces:
+                interfaces.remove(interface)
+        if isinstance(interface, EthernetClientInterfaceEx):
+            try:
+                interface.Disconnect()
+            except Exception as e:
+                log("Error disconnecting {}: {}".format(alias, str(e)), "warning")
+
+    def reconcile(self, port_definitions):
+        """
+        Diffs new port definitions against the current ports by alias.
+        Only added, changed, and removed ports are touched.
+        Returns a summary dict.
+        """
+        new_definitions = {}
+        for port_definition in port_definitions:
+            alias = port_definition["Alias"]
+            if alias in new_definitions:
+                log("Duplicate port alias in ports.json: {}".format(alias), "error")
+            new_definitions[alias] = port_definition
+
+        summary = {
+            "added": [],
+            "updated": [],
+            "removed": [],
+            "unchanged": [],
+            "failed": [],
+        }
+        with self._lock:
+            for alias, port_definition in list(self.definitions.items()):
+                if alias not in new_definitions:
+                    self.teardown_port(alias)
+                    summary["removed"].append(alias)
+                elif new_definitions[alias] == port_definition:
+                    summary["unchanged"].append(alias)
+
+            for alias, port_definition in new_definitions.items():
+                previous = self.definitions.get(alias, None)
+                if previous == port_definition:
+                    continue
+                # Checked before the running port is torn down, so it is kept on errors
+                err = check_port_definition(port_definition)
+                if err is not None:
+                    log("Port {} not changed: {}".format(alias, err), "error")
+                    summary["failed"].append(alias)
+                    continue
+                if previous is not None:
+                    self.teardown_port(alias)
+                if self._try_instantiate(port_definition):
+                    summary["updated" if previous is not None else "added"].append(
+                        alias
+                    )
+                    continue
+                summary["failed"].append(alias)
+                if previous is not None and self._try_instantiate(previous):
+                    log(
+                        "Port {} restored from its old definition".format(alias), "info"
+                    )
+            self.port_definitions = list(self.definitions.values())
+        return summary
+
+    def _try_instantiate(self, port_definition):
+        """Returns True if the port is running"""
+        try:
+            self.instantiate_port(port_definition)
+        except Exception as e:
+            log(
+                "Error instantiating port {}: {}".format(
+                    port_definition["Alias"], str(e)
+                ),
+                "error",
+            )
+            self.teardown_port(port_definition["Alias"])
+        return port_definition["Alias"] in self.interfaces
 
     def instantiate_relays(self, port_definition):
         host = PROCESSORS_MAP.get(port_definition["Host"], None)
@@ -101,7 +333,9 @@ class PortInstantiation:
             return
         port = port_definition["Port"]
         alias = port_definition["Alias"]
-        self.all_relays.append(RelayInterfaceEx(host, port, alias=alias))
+        interface = RelayInterfaceEx(host, port, alias=alias)
+        self.all_relays.append(interface)
+        return interface
 
     def instantiate_serial_interface(self, port_definition):
         host = PROCESSORS_MAP.get(port_definition["Host"], None)
@@ -122,20 +356,22 @@ class PortInstantiation:
         flow_control = port_definition["FlowControl"]
         mode = port_definition["Mode"]
         alias = port_definition["Alias"]
-        self.all_serial_interfaces.append(
-            SerialInterfaceEx(
-                host,
-                port,
-                Baud=baud,
-                Data=data,
-                Parity=parity,
-                Stop=stop,
-                FlowControl=flow_control,
-                CharDelay=char_delay,
-                Mode=mode,
-                alias=alias,
-            )
+        interface = SerialInterfaceEx(
+            host,
+            port,
+            Baud=baud,
+            Data=data,
+            Parity=parity,
+            Stop=stop,
+            FlowControl=flow_control,
+            CharDelay=char_delay,
+            Mode=mode,
+            alias=alias,
         )
+        self.all_serial_interfaces.append(interface)
+        self.attach_receive_forwarder(interface, port_definition)
+        self.attach_send_queue(interface, port_definition)
+        return interface
 
     def instantiate_ethernet_client_interface(self, port_definition):
         host = port_definition["Hostname"]
@@ -144,35 +380,90 @@ class PortInstantiation:
         alias = port_definition["Alias"]
 
         if protocol == "TCP":
-            self.all_ethernet_interfaces.append(
-                EthernetClientInterfaceEx(host, ip_port, Protocol=protocol, alias=alias)
+            interface = EthernetClientInterfaceEx(
+                host, ip_port, Protocol=protocol, alias=alias
             )
         elif protocol == "UDP":
             service_port = port_definition["ServicePort"]
             buffer_size = port_definition["bufferSize"]
-            self.all_ethernet_interfaces.append(
-                EthernetClientInterfaceEx(
-                    host,
-                    ip_port,
-                    Protocol=protocol,
-                    ServicePort=int(service_port),
-                    bufferSize=int(buffer_size),
-                    alias=alias,
-                )
+            interface = EthernetClientInterfaceEx(
+                host,
+                ip_port,
+                Protocol=protocol,
+                ServicePort=int(service_port),
+                bufferSize=int(buffer_size),
+                alias=alias,
             )
         elif protocol == "SSH":
             username = port_definition["Username"]
             password = port_definition["Password"]
             credentials = (username, password)
-            self.all_ethernet_interfaces.append(
-                EthernetClientInterfaceEx(
-                    host,
-                    ip_port,
-                    Protocol=protocol,
-                    Credentials=credentials,
-                    alias=alias,
-                )
+            interface = EthernetClientInterfaceEx(
+                host,
+                ip_port,
+                Protocol=protocol,
+                Credentials=credentials,
+                alias=alias,
             )
+        else:
+            log("Unknown Ethernet Protocol: {}".format(protocol), "error")
+            return None
+        self.all_ethernet_interfaces.append(interface)
+        self.attach_receive_forwarder(interface, port_definition)
+        managed = is_managed(port_definition)
+        if managed and protocol == "UDP":
+            log(
+                "Managed connections are not supported for UDP: {}".format(alias),
+                "error",
+            )
+            managed = False
+        # Managed ports always have a queue to hold Send commands while disconnected
+        self.attach_send_queue(interface, port_definition, required=managed)
+        if managed:
+            self.attach_managed_connection(interface, port_definition)
+        elif is_session_reuse(port_definition):
+            self.attach_ssh_session(interface, port_definition)
+        if managed and is_session_reuse(port_definition):
+            log("{} is Managed, SessionReuse ignored".format(alias), "warning")
+        return interface
+
+    def attach_receive_forwarder(self, interface, port_definition):
+        """Forwards framed ReceiveData to the backend if configured in ports.json"""
+        forwarder = make_receive_forwarder(
+            port_definition,
+            lambda alias, frames: send_port_frames(alias, frames),
+        )
+        if forwarder is None:
+            return
+        event(interface, "ReceiveData")(forwarder.handle_receive)
+        self.receive_forwarders[forwarder.alias] = forwarder
+
+    def attach_send_queue(self, interface, port_definition, required=False):
+        """Paces the port's Send commands if configured in ports.json"""
+        queue = make_command_queue(interface, port_definition, required)
+        if queue is None:
+            return
+        self.send_queues[queue.alias] = queue
+
+    def attach_managed_connection(self, interface, port_definition):
+        """Connects at boot and reconnects automatically"""
+        connection = make_managed_connection(
+            interface,
+            port_definition,
+            lambda alias, state: send_port_status(alias, state),
+            self.send_queues.get(port_definition["Alias"], None),
+        )
+        if connection is None:
+            return
+        self.managed_connections[connection.alias] = connection
+        connection.start()
+
+    def attach_ssh_session(self, interface, port_definition):
+        """Keeps the SSH session warm and shares it across RPC calls"""
+        session = make_ssh_session(interface, port_definition)
+        if session is None:
+            return
+        self.ssh_sessions.add(session)
 
 
 def make_str_obj_map(element_list):
@@ -210,11 +501,25 @@ class PopupPageValidator:
     Needed because ShowPopup and ShowPage methods do not return errors
     """
 
-    def __init__(self, ui_device):
+    def __init__(self, ui_device, layout_index=None):
         self.ui_device = ui_device
         self.ui_device_name = ui_device.DeviceAlias
-        self.valid_popups = getattr(self.ui_device, "_popups")
-        self.valid_pages = getattr(self.ui_device, "_pages")
+        if layout_index is not None:
+            # Precomputed from layout_manifest.json, only used if its .gdl matches
+            self.popup_ids = frozenset(layout_index.popups.keys())
+            self.popup_names = layout_index.popup_names
+            self.page_ids = frozenset(layout_index.pages.keys())
+            self.page_names = layout_index.page_names
+        else:
+            # No current manifest for this device, index the tables extronlib read
+            valid_popups = getattr(self.ui_device, "_popups")
+            valid_pages = getattr(self.ui_device, "_pages")
+            self.popup_ids = frozenset(valid_popups.keys())
+            self.popup_names = frozenset(
+                value["name"] for value in valid_popups.values() if "name" in value
+            )
+            self.page_ids = frozenset(valid_pages.keys())
+            self.page_names = frozenset(valid_pages.values())
 
     def _is_valid_popup_integer(self, popup):
         try:
@@ -224,17 +529,15 @@ class PopupPageValidator:
             return False
         if popup_int == 65535:
             raise ValueError("Invalid popup: 'Offline Page' can not be called")
-        if popup_int in self.valid_popups.keys():
+        if popup_int in self.popup_ids:
             return True
         raise ValueError("Invalid popup integer: {}".format(popup))
 
     def _is_valid_popup_string(self, popup_str):
         if popup_str == "Offline Page":
             raise ValueError("Invalid popup: 'Offline Page' can not be called")
-        for value in self.valid_popups.values():
-            for sub_key in value:
-                if sub_key == "name" and value[sub_key] == popup_str:
-                    return True
+        if popup_str in self.popup_names:
+            return True
         raise ValueError("Invalid popup string: {}".format(popup_str))
 
     def _is_valid_page_integer(self, page):
@@ -243,12 +546,12 @@ class PopupPageValidator:
         except ValueError as e:
             # Not an integer
             return False
-        if page_int in self.valid_pages.keys():
+        if page_int in self.page_ids:
             return True
         raise ValueError("Invalid page integer: {}".format(page))
 
     def _is_valid_page_string(self, page_str):
-        if page_str in self.valid_pages.values():
+        if page_str in self.page_names:
             return True
         return False
 
@@ -279,14 +582,41 @@ class PopupPageValidator:
 
 class PopupPageValidatorFactory:
     @staticmethod
-    def create(ui_devices):
+    def create(ui_devices, layout_indexes=None):
+        layout_indexes = layout_indexes or {}
         validators = []
         for ui_device in ui_devices:
-            validators.append(PopupPageValidator(ui_device))
+            validators.append(
+                PopupPageValidator(
+                    ui_device, layout_indexes.get(ui_device.DeviceAlias, None)
+                )
+            )
         return validators
 
 
-all_popup_page_validators = PopupPageValidatorFactory.create(all_ui_devices)
+## Layout Manifest ##
+# Optional, made by layout_manifest_builder.py from the .gdl files
+layout_manifest = load_manifest("layout_manifest.json")
+LAYOUT_INDEXES = (
+    build_layout_indexes(layout_manifest, all_ui_devices) if layout_manifest else {}
+)
+if LAYOUT_INDEXES:
+    added = instantiate_elements(
+        LAYOUT_INDEXES,
+        make_str_obj_map(all_ui_devices),
+        {
+            "Button": (Button, all_buttons),
+            "Knob": (Knob, all_knobs),
+            "Label": (Label, all_labels),
+            "Level": (Level, all_levels),
+            "Slider": (Slider, all_sliders),
+        },
+    )
+    log("Instantiated {} GUI elements from layout manifest".format(added), "info")
+
+all_popup_page_validators = PopupPageValidatorFactory.create(
+    all_ui_devices, LAYOUT_INDEXES
+)
 
 
 # Key: string name, Value: object
@@ -305,6 +635,21 @@ RELAYS_MAP = make_str_obj_map(ports.all_relays)
 SERIAL_INTERFACE_MAP = make_str_obj_map(ports.all_serial_interfaces)
 ETHERNET_INTERFACE_MAP = make_str_obj_map(ports.all_ethernet_interfaces)
 
+
+def sync_port_maps():
+    """Updates the port maps in place after ports.json is reloaded"""
+    for port_map, interfaces in (
+        (RELAYS_MAP, ports.all_relays),
+        (SERIAL_INTERFACE_MAP, ports.all_serial_interfaces),
+        (ETHERNET_INTERFACE_MAP, ports.all_ethernet_interfaces),
+    ):
+        current = make_str_obj_map(interfaces)
+        for alias in list(port_map.keys()):
+            if alias not in current:
+                del port_map[alias]
+        port_map.update(current)
+
+
 ## Custom Classes ##
 ALL_POPUP_PAGE_VALIDATORS = make_str_obj_map(all_popup_page_validators)
 
@@ -360,6 +705,7 @@ def set_state(obj, state):
 
 
 def set_fill(obj, fill):
+    ramp_scheduler.cancel(obj)
     obj.SetFill(int(fill))
 
 
@@ -429,18 +775,22 @@ def set_led_state(obj, ledid, state):
 
 
 def set_level(obj, level):
+    ramp_scheduler.cancel(obj)
     obj.SetLevel(int(level))
 
 
 def set_range(obj, min, max, step=1):
+    ramp_scheduler.cancel(obj)
     obj.SetRange(int(min), int(max), int(step))
 
 
 def inc(obj):
+    ramp_scheduler.cancel(obj)
     obj.Inc()
 
 
 def dec(obj):
+    ramp_scheduler.cancel(obj)
     obj.Dec()
 
 
@@ -452,11 +802,35 @@ def toggle(obj):
     obj.Toggle()
 
 
-def send(obj, data):
-    obj.Send(data)
+def acquire_ssh_session(obj, timeout=None):
+    """
+    Reuses the warm SSH session of a port with SessionReuse,
+    returns the Connect result or None if the port does not reuse sessions
+    """
+    session = ports.ssh_sessions.get(getattr(obj, "alias", None), None)
+    if session is None:
+        return None
+    result = session.acquire(timeout)
+    if "Connected" not in result:
+        raise ConnectionError(result)
+    return result
+
+
+def send(obj, data, priority=None):
+    alias = getattr(obj, "alias", None)
+    connection = ports.managed_connections.get(alias, None)
+    if connection is not None:
+        connection.check_send()
+    acquire_ssh_session(obj)
+    queue = ports.send_queues.get(alias, None)
+    if queue is None:
+        obj.Send(data)
+    else:
+        queue.put(data, priority)
 
 
 def send_and_wait(obj, data, timeout):
+    acquire_ssh_session(obj)
     return obj.SendAndWait(data, float(timeout))
 
 
@@ -470,7 +844,14 @@ def set_executive_mode(obj, mode):
 
 
 def connect(obj, timeout=None):
-    if timeout is None:
+    connection = ports.managed_connections.get(getattr(obj, "alias", None), None)
+    session = ports.ssh_sessions.get(getattr(obj, "alias", None), None)
+    if connection is not None:
+        # Managed ports keep retrying in the background if this attempt fails
+        result = connection.connect_now(None if timeout is None else float(timeout))
+    elif session is not None:
+        result = session.acquire(None if timeout is None else float(timeout))
+    elif timeout is None:
         result = obj.Connect()
     else:
         result = obj.Connect(float(timeout))
@@ -485,6 +866,13 @@ def connect(obj, timeout=None):
 
 
 def disconnect(obj):
+    connection = ports.managed_connections.get(getattr(obj, "alias", None), None)
+    if connection is not None:
+        connection.stop()  # Stay disconnected until "Connect" is called
+    session = ports.ssh_sessions.get(getattr(obj, "alias", None), None)
+    if session is not None:
+        session.release()  # Stays warm until SessionIdleTimeout
+        return
     obj.Disconnect()
 
 
@@ -518,6 +906,14 @@ def get_property_(obj, property):
         return e
 
 
+def ramp(obj, target, duration, easing="linear"):
+    """
+    Animates a Level or Slider from its current value to target over duration seconds.
+    Easing: linear, ease_in, ease_out, ease_in_out
+    """
+    ramp_scheduler.start(obj, int(target), float(duration), easing)
+
+
 # TODO: Add more methods as needed
 
 #### Macros ####
@@ -536,13 +932,73 @@ def get_all_elements_():
         "all_relays": list(RELAYS_MAP.keys()),
         "all_serial_interfaces": list(SERIAL_INTERFACE_MAP.keys()),
         "all_ethernet_interfaces": str(ETHERNET_INTERFACE_MAP),
+        "managed_connections": {
+            alias: connection.stats()
+            for alias, connection in ports.managed_connections.items()
+        },
+        "ssh_sessions": {
+            alias: session.stats() for alias, session in ports.ssh_sessions.items()
+        },
         "backend_server_available": variables.backend_server_available,
         "backend_server_role": variables.backend_server_role,
         "backend_server_address": variables.backend_server_address,
+        "event_journal_size": len(event_journal),
+        "backend_server_rtt": {
+            "probe": probe_rtt.stats(),
+            "uplink": uplink_rtt.stats(),
+        },
+        "backend_server_selection": server_selector.stats(),
+        "backend_routes": backend_router.stats(),
+        "uplink_hedging": uplink_hedger.stats(),
+        "traffic_recorder": traffic_recorder.stats(),
+        "rpc_request_cache": request_cache.stats(),
+        "scheduled_commands": command_scheduler.stats(),
+        "sequences": sequence_store.describe(),
+        "property_subscriptions": property_subscriptions.stats(),
     }
     return data
 
 
+def pair_backend_server(role, address, message, log_level):
+    if backend_server_ready_to_pair(address):
+        backend_server_available_setter(True)
+        variables.backend_server_role = role
+        variables.backend_server_address = address
+        probe_rtt.reset()
+        uplink_rtt.reset()
+        if uplink_hedger.secondary == address:
+            uplink_hedger.secondary = None
+        log(message, log_level)
+        replay_event_journal(address)
+    else:
+        log("Unhandled Pairing Exception with server {}".format(address), "error")
+
+
+def check_backend_servers(server_list):
+    """
+    Probes every server at once, records their RTT,
+    returns the list of available servers
+    """
+    available_servers = []
+    variables.checked_servers = 0
+    for address in server_list:
+
+        # Spawn an asynchronous task to check each server
+        # This avoids long waits if the server list is large and many are not available
+        @Wait(0)
+        def async_check_all_servers(addr=address):
+            log("Checking backend server: {}".format(addr), "info")
+            rtt = backend_server_probe(addr)
+            server_selector.record(addr, rtt)
+            if rtt is not None:
+                available_servers.append(addr)
+            variables.checked_servers += 1
+
+    while variables.checked_servers < len(server_list):
+        sleep(0.1)  # Block main thread until all servers are checked
+    return available_servers
+
+
 def set_backend_server_(address=None):
     """
     Call example: {"type": "set_backend_server", "address": "http://10.0.0.1:8080"}
@@ -550,15 +1006,6 @@ def set_backend_server_(address=None):
     If no address is provided, the function will try servers in the config.json file.
     """
 
-    def _set_server(role, address, message, log_level):
-        if backend_server_ready_to_pair(address):
-            backend_server_available_setter(True)
-            variables.backend_server_role = role
-            variables.backend_server_address = address
-            log(message, log_level)
-        else:
-            log("Unhandled Pairing Exception with server {}".format(address), "error")
-
     def _no_server(message):
         backend_server_available_setter(False)
         variables.backend_server_role = "none"
@@ -567,7 +1014,7 @@ def set_backend_server_(address=None):
 
     if address is not None and address != "":  # Custom address specified
         if backend_server_ok(address):
-            _set_server(
+            pair_backend_server(
                 role="custom",
                 address=address,
                 message="Using custom backend server: {}".format(address),
@@ -580,45 +1027,39 @@ def set_backend_server_(address=None):
             return "502 Bad Gateway | {}".format(err)
 
     # No custom address provided, check config.json
-    server_list = config.get("backend_server_addresses", None)
+    server_list = config.backend_server_addresses
     if not server_list:
         err = "No backend server addresses configured in config.json"
         _no_server(err)
         return "502 Bad Gateway | {}".format(err)
 
     log("Checking backend server addresses: {}".format(server_list), "info")
-    available_servers = []
-    variables.checked_servers = 0
-    for address in server_list:
-
-        # Spawn an asynchronous task to check each server
-        # This avoids long waits if the server list is large and many are not available
-        @Wait(0)
-        def async_check_all_servers(addr=address):
-            log("Checking backend server: {}".format(addr), "info")
-            if backend_server_ok(addr):
-                available_servers.append(addr)
-            variables.checked_servers += 1
-
-    while variables.checked_servers < len(server_list):
-        sleep(0.1)  # Block main thread until all servers are checked
+    available_servers = check_backend_servers(server_list)
 
     log("Available backend servers: {}".format(available_servers), "info")
-    if config["backend_server_addresses"][0] in available_servers:
+    if server_selector.policy == "latency" and available_servers:
+        # Lowest latency server in the best tier, see backend_selection.py
+        best = server_selector.best(available_servers)
+        pair_backend_server(
+            role="primary" if best == server_list[0] else "secondary",
+            address=best,
+            message="Using lowest latency backend server: {}".format(best),
+            log_level="info",
+        )
+        return "200 OK | Lowest Latency Server Selected"
+    elif server_list[0] in available_servers:
         # Give priority to the first server in the config list
-        _set_server(
+        pair_backend_server(
             role="primary",
-            address=config["backend_server_addresses"][0],
-            message="Using primary backend server: {}".format(
-                config["backend_server_addresses"][0]
-            ),
+            address=server_list[0],
+            message="Using primary backend server: {}".format(server_list[0]),
             log_level="info",
         )
         return "200 OK | Primary Server Selected"
     elif len(available_servers) > 0:
         # First server in config is not available but other(s) are
         # Use the first available server
-        _set_server(
+        pair_backend_server(
             role="secondary",
             address=available_servers[0],
             message="First backend server not available, using: {}".format(
@@ -632,6 +1073,56 @@ def set_backend_server_(address=None):
     return "502 Bad Gateway | No backend servers available"
 
 
+def get_port_queue_stats_(alias=None):
+    """
+    Call example: {"type": "get_port_queue_stats", "alias": "Projector"}
+
+    If no alias is provided, stats for all queued ports are returned.
+    """
+    if alias:
+        queue, err = get_object(alias, ports.send_queues)
+        if err is not None:
+            return err
+        return {alias: queue.stats()}
+    return {alias: queue.stats() for alias, queue in ports.send_queues.items()}
+
+
+def get_event_stats_(reset=None):
+    """
+    Call example: {"type": "get_event_stats", "reset": "true"}
+
+    Returns the number of events each element has produced since boot
+    (or the last reset) and the events each button is subscribed to.
+    """
+    data = {
+        "event_counts": event_counter.report(),
+        "button_subscriptions": {
+            name: list(events) for name, events in BUTTON_SUBSCRIPTIONS.items()
+        },
+    }
+    if reset is not None and string_to_bool(reset):
+        event_counter.reset()
+    return data
+
+
+def set_local_rules_(rules, persist=None):
+    """
+    Call example: {"type": "set_local_rules", "rules": [...], "persist": "true"}
+
+    Replaces all local fast-feedback rules.
+    Rules are saved to rules.json and survive a reboot if persist is true.
+    """
+    if not isinstance(rules, list):
+        return "400 Bad Request | rules must be a list"
+    errors = local_rules.compile(rules)
+    if persist is not None and string_to_bool(persist):
+        with open("rules.json", "w") as f:
+            json.dump(rules, f)
+    if errors:
+        return "400 Bad Request | {} rules skipped: {}".format(len(errors), errors)
+    return "200 OK | {} rules loaded".format(len(rules))
+
+
 def program_log_saver_enable_disable(enabled: bool):
     if string_to_bool(enabled):
         if variables.program_log_saver == "Enabled":
@@ -665,6 +1156,235 @@ def unpair_backend_server():
         return "409 Conflict | No server to unpair from"
 
 
+def traffic_record_(enabled):
+    """
+    Call example: {"type": "traffic_record", "enabled": "true"}
+
+    Records RPC bodies and uplink events to traffic.jsonl for traffic_replay.py
+    """
+    if string_to_bool(enabled):
+        traffic_recorder.start()
+        return "200 OK | Recording to {}".format(traffic_recorder.path)
+    traffic_recorder.stop()
+    return "200 OK | Recorded {} messages".format(traffic_recorder.recorded)
+
+
+def cancel_scheduled_(tag=None, task_id=None):
+    """
+    Call example: {"type": "cancel_scheduled", "tag": "room_on"}
+    or: {"type": "cancel_scheduled", "id": "17"}
+
+    Cancels pending delayed and scheduled commands.
+    """
+    if tag is not None:
+        cancelled = command_scheduler.cancel_tag(str(tag))
+        return "200 OK | Cancelled {} commands".format(cancelled)
+    if task_id is not None:
+        try:
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            return "400 Bad Request | Invalid id: {}".format(task_id)
+        if command_scheduler.cancel(task_id):
+            return "200 OK | Cancelled 1 commands"
+        return "404 Not Found | No pending command {}".format(task_id)
+    return "400 Bad Request | tag or id is required"
+
+
+def get_scheduled_(tag=None):
+    """
+    Call example: {"type": "get_scheduled", "tag": "room_on"}
+
+    Returns pending delayed and scheduled commands, soonest first.
+    If no tag is provided, all pending commands are returned.
+    """
+    return command_scheduler.pending(str(tag) if tag is not None else None)
+
+
+def store_sequence_(name, commands, persist=None):
+    """
+    Call example: {"type": "store_sequence", "name": "system_off", "commands": [...], "persist": "true"}
+
+    Compiles and stores a named sequence of commands, replacing any with the same name.
+    Sequences are saved to sequences.json and survive a reboot if persist is true.
+    """
+    persist = persist is not None and string_to_bool(persist)
+    errors = sequence_store.store(str(name), commands, persist)
+    if errors:
+        return "400 Bad Request | Sequence not stored: {}".format(errors)
+    return "200 OK | Stored {} with {} steps".format(name, len(commands))
+
+
+def run_sequence_(name, params=None):
+    """
+    Call example: {"type": "run_sequence", "name": "presentation", "params": {"input": "HDMI1"}}
+
+    {placeholders} in the stored commands are replaced with params.
+    """
+    result, err = sequence_store.run(str(name), params)
+    if err is not None:
+        return err
+    return result
+
+
+def get_sequences_():
+    """
+    Call example: {"type": "get_sequences"}
+
+    Returns the stored sequences with their step count and params.
+    """
+    return sequence_store.describe()
+
+
+def delete_sequence_(name):
+    """
+    Call example: {"type": "delete_sequence", "name": "system_off"}
+    """
+    if sequence_store.delete(str(name)):
+        return "200 OK | Deleted {}".format(name)
+    return "404 Not Found | No sequence named {}".format(name)
+
+
+def subscribe_(domain, object_name, property, interval, deadband=None, arg1=None):
+    """
+    Call example: {"type": "subscribe", "domain": "Level", "object": "Lvl_Volume",
+                   "property": "Level", "interval": "0.5", "deadband": "2"}
+
+    Samples the property every interval seconds and pushes changed values
+    to the backend server at /api/v1/properties.
+    arg1 is passed to Get* methods, ex: "property": "GetVolume", "arg1": "Master"
+    """
+    object_map = DOMAIN_CLASS_MAP.get(domain, None)
+    if object_map is None:
+        return "400 Bad Request | Unknown domain: {}".format(domain)
+    args = (arg1,) if arg1 not in ("", None) else ()
+    try:
+        _, err = property_subscriptions.subscribe(
+            domain, object_map, object_name, property, interval, deadband, args
+        )
+    except (TypeError, ValueError) as e:
+        return "400 Bad Request | {}".format(str(e))
+    if err is not None:
+        return "400 Bad Request | {}".format(err)
+    return "200 OK | Subscribed to {} {}".format(object_name, property)
+
+
+def unsubscribe_(domain=None, object_name=None, property=None):
+    """
+    Call example: {"type": "unsubscribe", "object": "Lvl_Volume", "property": "Level"}
+
+    Removes every subscription matching the given fields.
+    With no fields, all subscriptions are removed.
+    """
+    removed = property_subscriptions.unsubscribe(
+        lambda sub: (domain is None or sub.domain == domain)
+        and (object_name is None or sub.name == object_name)
+        and (property is None or sub.prop == property)
+    )
+    return "200 OK | Removed {} subscriptions".format(removed)
+
+
+def get_subscriptions_():
+    """
+    Call example: {"type": "get_subscriptions"}
+
+    Returns every subscription with the last value pushed.
+    """
+    return property_subscriptions.describe()
+
+
+def reload_ports_():
+    """
+    Call example: {"type": "reload_ports"}
+
+    Re-reads ports.json and only adds, replaces, or removes the ports that changed.
+    Unchanged ports keep their connections, queues, and sessions.
+    """
+    port_definitions = load_json("ports.json")
+    if not isinstance(port_definitions, list):
+        err = "ports.json not found or is not a list of port definitions"
+        log(err, "error")
+        return "400 Bad Request | {}".format(err)
+    try:
+        summary = ports.reconcile(port_definitions)
+    except (KeyError, TypeError) as e:
+        log("Invalid port definition in ports.json: {}".format(str(e)), "error")
+        return "400 Bad Request | Invalid port definition: {}".format(str(e))
+    finally:
+        sync_port_maps()
+
+    log("ports.json reloaded: {}".format(summary), "info")
+    return summary
+
+
+def reload_config_():
+    """
+    Call example: {"type": "reload_config"}
+
+    Re-reads config.json now instead of waiting for the file watcher
+    """
+    if variables.config_watcher is None:
+        return "409 Conflict | Config watcher is not running"
+    errors = variables.config_watcher.reload()
+    if errors:
+        return "400 Bad Request | {} config errors: {}".format(len(errors), errors)
+    return "200 OK | Config reloaded"
+
+
+def apply_config(new_config):
+    """
+    Called by the config watcher with a compiled config.
+    Live settings are pushed to their objects, then the config is swapped in one step.
+    """
+    global config
+    changed = config.changed_keys(new_config)
+    if not changed:
+        return
+
+    variables.backend_server_timeout = new_config.backend_server_timeout
+    for estimator, min_timeout in (
+        (probe_rtt, new_config.backend_server_min_timeout),
+        (uplink_rtt, new_config.backend_uplink_min_timeout),
+    ):
+        estimator.min_timeout = min_timeout
+        estimator.max_timeout = new_config.backend_server_timeout
+    server_selector.tiers = new_config.backend_server_tiers or {}
+    server_selector.hysteresis = new_config.backend_server_hysteresis
+    uplink_hedger.enabled = new_config.backend_hedge_percentile is not None
+    uplink_hedger.percentile = new_config.backend_hedge_percentile
+    uplink_hedger.min_delay = new_config.backend_hedge_min_delay
+    uplink_hedger.timeout = new_config.backend_server_timeout
+    if not uplink_hedger.enabled:
+        uplink_hedger.secondary = None
+    repeat_aggregator.interval = new_config.repeat_send_interval
+    knob_accumulator.window = new_config.knob_accumulate_window
+    event_journal.max_ordered = new_config.event_journal_size
+    request_cache.max_entries = new_config.rpc_request_cache_size
+    request_cache.ttl = new_config.rpc_request_cache_ttl
+    property_subscriptions.push_delay = new_config.property_push_delay
+    for timer in (
+        variables.server_check_timer,
+        variables.hedge_timer,
+        variables.route_check_timer,
+    ):
+        if timer:
+            timer.Change(new_config.check_backend_server_interval)
+    if new_config.traffic_record != config.traffic_record:
+        if new_config.traffic_record:
+            traffic_recorder.start()
+        else:
+            traffic_recorder.stop()
+
+    config = new_config
+    log("config.json reloaded, changed: {}".format(", ".join(changed)), "info")
+
+    needs_restart = [key for key in changed if not FIELDS[key][2]]
+    if needs_restart:
+        log(
+            "config.json changes need a restart: {}".format(", ".join(needs_restart)),
+            "warning",
+        )
+
+
 METHODS_MAP = {
     # All 'methods' take "type", "object", "function" as required arguments
     # and "arg1", "arg2", "arg3" as optional arguments.
@@ -698,6 +1418,7 @@ METHODS_MAP = {
     "StopKeepAlive": stop_keepalive,
     "SaveProgramLog": save_program_log,
     "get_property": get_property_,
+    "ramp": ramp,
 }
 
 MACROS_MAP = {
@@ -705,24 +1426,113 @@ MACROS_MAP = {
     "set_backend_server": set_backend_server_,
     "program_log_saver": program_log_saver_enable_disable,
     "unpair": unpair_backend_server,
+    "get_port_queue_stats": get_port_queue_stats_,
+    "get_event_stats": get_event_stats_,
+    "set_local_rules": set_local_rules_,
+    "reload_config": reload_config_,
+    "reload_ports": reload_ports_,
+    "traffic_record": traffic_record_,
+    "cancel_scheduled": cancel_scheduled_,
+    "get_scheduled": get_scheduled_,
+    "store_sequence": store_sequence_,
+    "run_sequence": run_sequence_,
+    "get_sequences": get_sequences_,
+    "delete_sequence": delete_sequence_,
+    "subscribe": subscribe_,
+    "unsubscribe": unsubscribe_,
+    "get_subscriptions": get_subscriptions_,
 }
 
 #### User interaction events ####
 
 
-@event(all_buttons, BUTTON_EVENTS)
+event_counter = EventCounter()
+
+local_rules = LocalRuleEngine(DOMAIN_CLASS_MAP, METHODS_MAP)
+local_rules.compile(load_json("rules.json") or [])
+
+sequence_store = SequenceStore(
+    DOMAIN_CLASS_MAP, METHODS_MAP, command_scheduler, "sequences.json"
+)
+sequence_store.load()
+
+# Sampled on the command scheduler, changes are sent by send_property_changes()
+property_subscriptions = PropertySubscriptions(
+    command_scheduler,
+    lambda changes: send_property_changes(changes),
+    config.property_push_delay,
+)
+
+
+def send_button_repeats(button, count):
+    button_data = (
+        "button",
+        str(button.Name),
+        "Repeated",
+        str(button.State),
+        {"count": str(count)},
+    )
+    button_sender.add(button_data[1], button_data)
+
+
+# Each button's events reach the backend in order, ex: the last Repeated before Released
+button_sender = OrderedSender(
+    lambda button_data: send_user_interaction(button_data, blocking=True)
+)
+repeat_aggregator = RepeatAggregator(send_button_repeats, config.repeat_send_interval)
+
+
 def any_button_event(button, action):
+    event_counter.count("button", button.Name, action)
     button_data = ("button", str(button.Name), action, str(button.State))
-    send_user_interaction(button_data)
+    local_rules.run(*button_data)  # Immediate feedback before the backend replies
+    if action == "Repeated":
+        repeat_aggregator.add(button)
+        return
+    repeat_aggregator.flush(button)  # Pending repeats are sent before this event
+    button_sender.add(button_data[1], button_data)
+
+
+# Key: button name, Value: tuple of subscribed events
+BUTTON_SUBSCRIPTIONS = compile_button_subscriptions(
+    list(BUTTONS_MAP.keys()), config.button_events, BUTTON_EVENTS
+)
+for events, buttons in group_by_events(BUTTON_SUBSCRIPTIONS, BUTTONS_MAP).items():
+    event(buttons, list(events))(any_button_event)
 
 
 @event(all_sliders, "Changed")
 def any_slider_changed(slider, action, value):
+    event_counter.count("slider", slider.Name, action)
     slider_data = ("slider", str(slider.Name), action, str(value))
+    local_rules.run(*slider_data)  # Immediate feedback before the backend replies
     send_user_interaction(slider_data)
 
 
-# TODO: Knob events
+def send_knob_delta(knob, delta):
+    knob_data = ("knob", str(knob.Name), "Turned", str(delta))
+    send_user_interaction(knob_data)
+
+
+knob_accumulator = KnobAccumulator(send_knob_delta, config.knob_accumulate_window)
+
+
+@event(all_knobs, "Turned")
+def any_knob_turned(knob, action, steps):
+    event_counter.count("knob", knob.Name, action)
+    knob_accumulator.add(knob, steps)
+
+
+def send_port_frames(alias, frames):
+    """Forwards complete frames received on a port, batched per flush window"""
+    port_data = ("port", alias, "ReceiveData", frames)
+    send_user_interaction(port_data)
+
+
+def send_port_status(alias, state):
+    """Reports managed connection state changes"""
+    port_data = ("port", alias, "ConnectionStatus", state)
+    send_user_interaction(port_data)
 
 
 #### Internal Functions ####
@@ -734,7 +1544,7 @@ def backend_server_available_setter(status):
             variables.backend_server_available = True
             server_check_loop("start")
             log("Backend Server Available", "info")
-            offline_popup = config.get("backend_server_offline_gui_popup", None)
+            offline_popup = config.backend_server_offline_gui_popup
             if offline_popup:
                 for ui_device in list(UI_DEVICE_MAP.values()):
                     ui_device.HidePopup(offline_popup)
@@ -744,7 +1554,7 @@ def backend_server_available_setter(status):
             server_check_loop("stop")
             log("Backend Server Unavailable", "error")
             set_backend_server_loop()
-            offline_popup = config.get("backend_server_offline_gui_popup", None)
+            offline_popup = config.backend_server_offline_gui_popup
             if offline_popup:
                 for ui_device in list(UI_DEVICE_MAP.values()):
                     ui_device.ShowPopup(offline_popup)
@@ -754,7 +1564,7 @@ def server_check_loop(start_or_stop):
     if start_or_stop == "start":
         if not variables.server_check_timer:
             variables.server_check_timer = Timer(
-                config.get("check_backend_server_interval", 5), server_check_callback
+                config.check_backend_server_interval, server_check_callback
             )
         else:
             variables.server_check_timer.Restart()
@@ -763,10 +1573,89 @@ def server_check_loop(start_or_stop):
 
 
 def server_check_callback(_, __):
-    if backend_server_ok(variables.backend_server_address):
-        return
-    else:
+    if uplink_rtt.seconds_since_proof() < config.check_backend_server_interval:
+        return  # Live traffic already proved the server is up
+    probe_backend_server()
+
+
+def probe_backend_server():
+    """Returns True if the server answered, otherwise counts a timeout"""
+    rtt = backend_server_probe(variables.backend_server_address, probe_rtt.timeout())
+    if rtt is None:
         handle_backend_server_timeout()
+        return False
+    probe_rtt.observe(rtt)
+    return True
+
+
+def start_fast_probe():
+    """
+    After the first anomaly, probe back to back using the adaptive timeout
+    until the server answers or has timed out 3 times
+    """
+    if variables.fast_probe_active or not variables.backend_server_available:
+        return
+    variables.fast_probe_active = True
+
+    @Wait(0)
+    def _fast_probe():
+        try:
+            while variables.backend_server_available:
+                if probe_backend_server():
+                    break
+        finally:
+            variables.fast_probe_active = False
+
+
+def reselect_backend_server(timer, count):
+    """
+    Latency policy only: re-checks every server and moves to a faster one,
+    with hysteresis so the processor doesn't flap between servers
+    """
+    server_list = config.backend_server_addresses
+    if (
+        not server_list
+        or not variables.backend_server_available
+        or variables.backend_server_role == "custom"
+    ):
+        return
+
+    check_backend_servers(server_list)
+    candidate = server_selector.should_switch(variables.backend_server_address)
+    if candidate is None:
+        return
+    pair_backend_server(
+        role="primary" if candidate == server_list[0] else "secondary",
+        address=candidate,
+        message="Switching to lower latency backend server: {}".format(candidate),
+        log_level="warning",
+    )
+
+
+def refresh_hedge_secondary(timer=None, count=None):
+    """
+    Keeps the fastest other server in the config list ready for hedged requests.
+    It is only health probed, pairing it would make two backends own the processor.
+    """
+    if not uplink_hedger.enabled:
+        return
+    server_list = config.backend_server_addresses or []
+    candidates = [
+        address
+        for address in server_list
+        if address != variables.backend_server_address
+    ]
+    if not variables.backend_server_available or not candidates:
+        uplink_hedger.secondary = None
+        return
+
+    for address in candidates:
+        server_selector.record(address, backend_server_probe(address))
+    best = server_selector.best(candidates)  # Only servers that answered the probe
+    if best == uplink_hedger.secondary:
+        return
+    uplink_hedger.secondary = best
+    log("Hedge secondary backend server: {}".format(best), "info")
 
 
 def set_backend_server_loop():
@@ -785,7 +1674,7 @@ def set_backend_server_loop():
             set_backend_server_()
             timer.Restart()
 
-    timer = Timer(config.get("server_search_interval", 2), _timer_callback)
+    timer = Timer(config.server_search_interval, _timer_callback)
 
 
 def send_client_error(client, code, description):
@@ -845,24 +1734,8 @@ def method_call_handler(data):
         if result is None:
             return ("200 OK", None)
         return ("200 OK | {}".format(str(result)), None)
-    except KeyError as e:
-        err = "400 Bad Request | Key Error: {}".format(str(e))
-        log(str(err), "error")
-        return None, err
-    except ValueError as e:
-        err = "400 Bad Request | Value Error: {}".format(str(e))
-        log(str(err), "error")
-        return None, err
-    except ConnectionError as e:
-        err = "503 Service Unavailable | Connection Error: {}".format(str(e))
-        log(str(err), "error")
-        return None, err
-    except PermissionError as e:
-        err = "403 Forbidden | Permission Error: {}".format(str(e))
-        log(str(err), "error")
-        return None, err
     except Exception as e:
-        err = "400 Bad Request | Function Error: {}".format(str(e))
+        err = function_error(e)
         log(str(err), "error")
         return None, err
 
@@ -884,6 +1757,75 @@ def macro_call_handler(command_type, data_dict=None):
             None,
         ),
         "unpair": lambda: (MACROS_MAP["unpair"](), None),
+        "get_port_queue_stats": lambda: (
+            MACROS_MAP["get_port_queue_stats"](data_dict.get("alias", None)),
+            None,
+        ),
+        "get_event_stats": lambda: (
+            MACROS_MAP["get_event_stats"](data_dict.get("reset", None)),
+            None,
+        ),
+        "set_local_rules": lambda: (
+            MACROS_MAP["set_local_rules"](
+                data_dict["rules"], data_dict.get("persist", None)
+            ),
+            None,
+        ),
+        "reload_config": lambda: (MACROS_MAP["reload_config"](), None),
+        "reload_ports": lambda: (MACROS_MAP["reload_ports"](), None),
+        "traffic_record": lambda: (
+            MACROS_MAP["traffic_record"](data_dict["enabled"]),
+            None,
+        ),
+        "cancel_scheduled": lambda: (
+            MACROS_MAP["cancel_scheduled"](
+                data_dict.get("tag", None), data_dict.get("id", None)
+            ),
+            None,
+        ),
+        "get_scheduled": lambda: (
+            MACROS_MAP["get_scheduled"](data_dict.get("tag", None)),
+            None,
+        ),
+        "store_sequence": lambda: (
+            MACROS_MAP["store_sequence"](
+                data_dict["name"],
+                data_dict["commands"],
+                data_dict.get("persist", None),
+            ),
+            None,
+        ),
+        "run_sequence": lambda: (
+            MACROS_MAP["run_sequence"](
+                data_dict["name"], data_dict.get("params", None)
+            ),
+            None,
+        ),
+        "get_sequences": lambda: (MACROS_MAP["get_sequences"](), None),
+        "delete_sequence": lambda: (
+            MACROS_MAP["delete_sequence"](data_dict["name"]),
+            None,
+        ),
+        "subscribe": lambda: (
+            MACROS_MAP["subscribe"](
+                data_dict["domain"],
+                data_dict["object"],
+                data_dict["property"],
+                data_dict["interval"],
+                data_dict.get("deadband", None),
+                data_dict.get("arg1", None),
+            ),
+            None,
+        ),
+        "unsubscribe": lambda: (
+            MACROS_MAP["unsubscribe"](
+                data_dict.get("domain", None),
+                data_dict.get("object", None),
+                data_dict.get("property", None),
+            ),
+            None,
+        ),
+        "get_subscriptions": lambda: (MACROS_MAP["get_subscriptions"](), None),
     }
 
     if command_type not in handlers:
@@ -895,6 +1837,59 @@ def macro_call_handler(command_type, data_dict=None):
         return (None, e)
 
 
+SCHEDULE_KEYS = ("delay", "at", "tag")
+
+
+def run_scheduled_command(command):
+    """Runs a command from the timer wheel, there is no client to reply to"""
+    command_type = command["type"]
+    if command_type in DOMAIN_CLASS_MAP:
+        result, err = method_call_handler(command)
+    else:
+        result, err = macro_call_handler(command_type, command)
+    if err is not None:
+        log("Scheduled {} failed: {}".format(command_type, str(err)), "error")
+
+
+def schedule_command(command):
+    """
+    Queues a command that has "delay" or "at" on the timer wheel,
+    returns tuple golang style (data, error)
+    """
+    command_type = command["type"]
+    if command_type not in DOMAIN_CLASS_MAP and command_type not in MACROS_MAP:
+        return None, "400 Bad Request | Unknown Action: {}".format(str(command_type))
+
+    if command.get("at", None) is not None:
+        delay, err = parse_at(command["at"])
+        if err is not None:
+            return None, "400 Bad Request | {}".format(err)
+    elif command.get("delay", None) is None:
+        return None, "400 Bad Request | Missing at or delay"
+    else:
+        try:
+            delay = float(command["delay"])
+        except (TypeError, ValueError):
+            return None, "400 Bad Request | Invalid delay: {}".format(command["delay"])
+    if delay < 0:
+        return None, "400 Bad Request | Scheduled time has passed"
+
+    scheduled = {k: v for k, v in command.items() if k not in SCHEDULE_KEYS}
+    label = " ".join(
+        str(scheduled[key])
+        for key in ("type", "object", "function", "arg1", "arg2", "arg3")
+        if scheduled.get(key, None) not in ("", None)
+    )
+    tag = command.get("tag", None)
+    task_id = command_scheduler.schedule(
+        delay,
+        lambda: run_scheduled_command(scheduled),
+        str(tag) if tag is not None else None,
+        label,
+    )
+    return "200 OK | Scheduled {}".format(task_id), None
+
+
 class RxDataReplyProcessor:
 
     def __init__(self, json_data, client):
@@ -902,11 +1897,13 @@ class RxDataReplyProcessor:
         # client is only present when function is called from RPC server
         # No replies sent when invoked as a REST API reply processor
         self.client = client
+        self.request_id = None
         self.valid_json = self._validate_json()
 
         self.successes = 0
         self.errors = 0
         self.ordered_reply = []
+        self.deferred = False  # True when the reply is sent later, see request_cache.py
 
     def _validate_json(self):
         try:
@@ -917,6 +1914,9 @@ class RxDataReplyProcessor:
             )
             return None
 
+        # {"request_id": "...", "commands": [...]}, see request_cache.py
+        data, self.request_id = unwrap_batch(data)
+
         # Make compatible with list processing
         if isinstance(data, dict):
             data = [data]
@@ -943,6 +1943,50 @@ class RxDataReplyProcessor:
         if not self.valid_json:
             raise json.JSONDecodeError
 
+        if self.request_id is None or not request_cache.enabled:
+            self._process()
+            self._send()
+            return
+
+        entry, first = request_cache.claim(self.request_id)
+        if not first:
+            self._send_cached(entry)
+            return
+        try:
+            self._process()
+        except Exception:
+            request_cache.abandon(entry)
+            raise
+        request_cache.finish(entry, self.ordered_reply)
+        self._send()
+
+    def _send_cached(self, entry):
+        if entry.done.is_set():
+            self.ordered_reply = entry.reply
+            self._send()
+            return
+
+        # The first run is still going, reply when it finishes
+        self.deferred = True
+
+        @Wait(0)
+        def _send_when_finished():
+            if (
+                entry.done.wait(config.rpc_request_wait_timeout)
+                and entry.reply is not None
+            ):
+                self.ordered_reply = entry.reply
+                self._send()
+            elif self.client is not None:
+                self.client.Send(
+                    "503 Service Unavailable | Request {} did not finish, retry".format(
+                        self.request_id
+                    ).encode("utf-8")
+                )
+            if self.client is not None:
+                self.client.Disconnect()
+
+    def _process(self):
         for command in self.valid_json:
             command_type = command.get("type", None)
             if not command_type:
@@ -950,6 +1994,15 @@ class RxDataReplyProcessor:
                     False, "400 Bad Request | Missing required key 'type'"
                 )
                 continue
+            if "delay" in command or "at" in command:
+                if command_type in MACROS_MAP and not self.client:
+                    raise Exception("Macro command called without client")
+                result, err = schedule_command(command)
+                if err is not None:
+                    self._cache_result(False, err)
+                else:
+                    self._cache_result(True, result)
+                continue
             if command_type in DOMAIN_CLASS_MAP.keys():
                 result, err = method_call_handler(command)
                 if err is not None:
@@ -970,6 +2023,8 @@ class RxDataReplyProcessor:
                 self.ordered_reply.append(
                     "400 Bad Request | Unknown Action: {}".format(str(command_type))
                 )
+
+    def _send(self):
         response = json.dumps(self.ordered_reply).encode("utf-8")
         if response is not None and self.client is not None:
             self.client.Send(response)
@@ -994,11 +2049,15 @@ def handle_backend_server_timeout():
         ),
         "error",
     )
+    start_fast_probe()
 
 
-def format_user_interaction_data(gui_element_data):
-    if variables.backend_server_available != True:
-        return None
+def format_user_interaction_data(gui_element_data, address=None):
+    """address: a routed server, or None for the paired backend server"""
+    if address is None:
+        if variables.backend_server_available != True:
+            return None
+        address = variables.backend_server_address
 
     domain = gui_element_data[0]
     data = {
@@ -1006,60 +2065,262 @@ def format_user_interaction_data(gui_element_data):
         "action": gui_element_data[2],
         "value": gui_element_data[3],
     }
+    if len(gui_element_data) > 4:
+        data.update(gui_element_data[4])  # Optional extra fields, ex: "count"
 
-    data = json.dumps(data).encode()
     headers = {"Content-Type": "application/json"}
-    url = "{}/api/v1/{}".format(variables.backend_server_address, domain)
+    if uplink_hedger.enabled:
+        # A hedged event reaches two servers, the key lets the backend de-duplicate
+        data["idempotency_key"] = uuid.uuid4().hex
+        headers["Idempotency-Key"] = data["idempotency_key"]
+    data = json.dumps(data).encode()
+    url = "{}/api/v1/{}".format(address, domain)
     user_data_req = urllib.request.Request(
         url, data=data, headers=headers, method="PUT"
     )
     return user_data_req
 
 
-def send_to_backend_server(user_data_req):
+def send_to_backend_server(
+    user_data_req, routed_address=None, blocking=False, gui_element_data=None
+):
+    """gui_element_data: the event, lets a routed event fail over"""
     if not user_data_req:
         log("No backend server set. Cannot send data", "error")
         return
 
-    @Wait(0)
+    if routed_address is not None:
+        send_to_routed_server(user_data_req, routed_address, blocking, gui_element_data)
+        return
+
+    # None unless hedging is enabled and has enough reply times to pick a delay
+    try:
+        hedge = uplink_hedger.start(user_data_req, process_backend_reply)
+    except Exception as e:
+        # The event is still sent to the paired server
+        log("Error starting hedged request: {}".format(str(e)), "error")
+        hedge = None
+
     def _send_to_backend_server():
+        start = monotonic()
+        response_data = None  # Set once the server replied
+        # A slow reply is still waited for, it may carry commands (ex: SendAndWait)
+        slow = uplink_rtt.timeout()
         try:
             with urllib.request.urlopen(
-                user_data_req, timeout=int(config.get("backend_server_timeout", 2))
+                user_data_req, timeout=variables.backend_server_timeout
             ) as response:
                 response_data = response.read().decode()
-                # No commands received, just an acknowledgment
-                if response_data == "ACK":
-                    variables.backend_server_timeout_count = 0
+                # Every reply proves the server is alive, so health probes can be skipped
+                latency = monotonic() - start
+                if latency > slow:
+                    start_fast_probe()  # Confirm the server is healthy
+                uplink_rtt.observe(latency)
+                uplink_hedger.record(latency)
+                traffic_recorder.record(
+                    "up",
+                    user_data_req.data.decode(),
+                    response_data,
+                    latency,
+                    user_data_req.selector,
+                )
+                # The hedged secondary already replied
+                if not uplink_hedger.primary_replied(hedge):
                     return
-                # Server has commands in its response
-                reply_processor = RxDataReplyProcessor(response_data, None)
-                reply_processor.process_and_send()
-                variables.backend_server_timeout_count = 0
+                process_backend_reply(response_data)
                 return
 
-        # Timeout
+        # Timeout or connection failure, confirm with fast health probes
         except urllib.error.URLError as e:
-            if "timed out" in str(e.reason).lower():
-                handle_backend_server_timeout()
-            else:
-                log("URLError: {}".format(str(e)), "error")
+            log("URLError: {}".format(str(e)), "error")
+            record_uplink_error(user_data_req, start, e)
+            start_fast_probe()
 
         except Exception as e:
             log("Bare Exception for send_to_backend_server: {}".format(str(e)), "error")
+            if response_data is None:
+                record_uplink_error(user_data_req, start, e)
+            if "timed out" in str(e).lower():
+                start_fast_probe()
+
+    if blocking:
+        _send_to_backend_server()
+    else:
+        Wait(0, _send_to_backend_server)
+
+
+def record_uplink_error(user_data_req, start, e):
+    """Failed uplinks are recorded too, so a replay sends the same load"""
+    traffic_recorder.record(
+        "up",
+        user_data_req.data.decode(),
+        None,
+        monotonic() - start,
+        user_data_req.selector,
+        str(e),
+    )
+
+
+def process_backend_reply(response_data, source="primary"):
+    """source: "primary", or "secondary" for a hedged reply that won"""
+    # Server has commands in its response, otherwise just an acknowledgment
+    if response_data != "ACK":
+        reply_processor = RxDataReplyProcessor(response_data, None)
+        reply_processor.process_and_send()
+    # A secondary's reply says nothing about the paired server, see utils.py
+    if source == "primary":
+        variables.backend_server_timeout_count = 0
+
+
+def send_to_routed_server(
+    user_data_req, address, blocking=False, gui_element_data=None
+):
+    """Routed servers fail over on their own, without unpairing the backend server"""
+
+    def _send_to_routed_server():
+        try:
+            with urllib.request.urlopen(
+                user_data_req, timeout=variables.backend_server_timeout
+            ) as response:
+                response_data = response.read().decode()
+        except Exception as e:
+            log("Routed server {} error: {}".format(address, str(e)), "error")
+            backend_router.mark(address, False)
+            if gui_element_data is not None:
+                fail_over_routed_event(user_data_req, gui_element_data)
+            return
+        if response_data != "ACK":
+            reply_processor = RxDataReplyProcessor(response_data, None)
+            reply_processor.process_and_send()
+
+    if blocking:
+        _send_to_routed_server()
+    else:
+        Wait(0, _send_to_routed_server)
 
 
-def send_user_interaction(gui_element_data):
-    user_data_req = format_user_interaction_data(gui_element_data)
-    send_to_backend_server(user_data_req)
+def fail_over_routed_event(user_data_req, gui_element_data):
+    """
+    Sends an event its routed server did not take to the next healthy server in
+    the group, or the paired backend server, or saves it to the journal.
+    Runs in the failed send's thread.  Each failure marks a server unhealthy,
+    so an event is tried at most once per server.
+    """
+    domain, name = gui_element_data[0], gui_element_data[1]
+    address = backend_router.address_for(domain, name)
+    if address is None and variables.backend_server_available != True:
+        event_journal.record(gui_element_data)
+        log("No backend server for routed event. Event saved to journal", "warning")
+        return
+    # Same body, so a hedged event keeps its idempotency key
+    url = "{}/api/v1/{}".format(
+        address if address is not None else variables.backend_server_address, domain
+    )
+    retry_req = urllib.request.Request(
+        url,
+        data=user_data_req.data,
+        headers=dict(user_data_req.header_items()),
+        method="PUT",
+    )
+    send_to_backend_server(retry_req, address, True, gui_element_data)
+
+
+def check_backend_routes(timer=None, count=None):
+    """Probes every routed server, pairing with servers that become healthy"""
+    for address in backend_router.servers():
+
+        @Wait(0)
+        def _check_routed_server(addr=address):
+            healthy = backend_server_ok(addr)
+            if backend_router.mark(addr, healthy):
+                if backend_server_ready_to_pair(addr):
+                    log("Routed backend server available: {}".format(addr), "info")
+                else:
+                    backend_router.mark(addr, False)
+
+
+def replay_event_journal(address):
+    """Sends every event journaled while no server was paired, in one batch"""
+    events = event_journal.events()
+    if not events:
+        return
+
+    data = json.dumps(events).encode()
+    headers = {"Content-Type": "application/json"}
+    url = "{}/api/v1/journal".format(address)
+    journal_req = urllib.request.Request(url, data=data, headers=headers, method="PUT")
+
+    @Wait(0)
+    def _replay_event_journal():
+        try:
+            with urllib.request.urlopen(
+                journal_req, timeout=variables.backend_server_timeout
+            ) as response:
+                response_data = response.read().decode()
+        except Exception as e:
+            # Kept for the next server that pairs
+            log(
+                "Event journal replay to {} failed: {}".format(address, str(e)), "error"
+            )
+            return
+
+        # Events journaled while the replay was in flight wait for the next one
+        event_journal.remove(events)
+        log("Replayed {} journaled events to {}".format(len(events), address), "info")
+        if response_data != "ACK":
+            reply_processor = RxDataReplyProcessor(response_data, None)
+            reply_processor.process_and_send()
+
+
+def send_property_changes(changes):
+    """
+    Sends a batch of subscribed property changes to the paired backend server.
+    Runs on the subscriptions' Wait thread, returns True if the server took them.
+    """
+    if variables.backend_server_available != True:
+        return False
+
+    data = json.dumps(changes).encode()
+    headers = {"Content-Type": "application/json"}
+    url = "{}/api/v1/properties".format(variables.backend_server_address)
+    properties_req = urllib.request.Request(
+        url, data=data, headers=headers, method="PUT"
+    )
+    try:
+        with urllib.request.urlopen(
+            properties_req, timeout=variables.backend_server_timeout
+        ) as response:
+            response_data = response.read().decode()
+    except Exception as e:
+        log("Property changes not sent: {}".format(str(e)), "error")
+        return False
+
+    if response_data != "ACK":
+        reply_processor = RxDataReplyProcessor(response_data, None)
+        reply_processor.process_and_send()
+    return True
+
+
+def send_user_interaction(gui_element_data, blocking=False):
+    """blocking: send in the calling thread, returns when the reply is processed"""
+    # None if the element is not routed or its route has no healthy server
+    routed_address = backend_router.address_for(
+        gui_element_data[0], gui_element_data[1]
+    )
+    if routed_address is None and variables.backend_server_available != True:
+        event_journal.record(gui_element_data)
+        log("No backend server set. Event saved to journal", "warning")
+        return
+    user_data_req = format_user_interaction_data(gui_element_data, routed_address)
+    send_to_backend_server(user_data_req, routed_address, blocking, gui_element_data)
 
 
 #### RPC Server (Listening) ####
 
 rpc_serv = EthernetServerInterfaceEx(
-    IPPort=int(config.get("rpc_server_port", 8080)),
+    IPPort=config.rpc_server_port,
     Protocol="TCP",
-    Interface=config.get("rpc_server_interface", "LAN"),
+    Interface=config.rpc_server_interface,
 )
 
 if rpc_serv.StartListen() != "Listening":
@@ -1085,13 +2346,22 @@ def handle_unsolicited_rpc_rx(client, data):
         err = "Bare Exception in RPC Rx: {}".format(str(e))
         log(err, "error")
     finally:
+        deferred = False
         if body:
+            start = monotonic()
             reply_processor = RxDataReplyProcessor(body, client)
             reply_processor.process_and_send()
+            deferred = reply_processor.deferred
+            if not deferred:
+                traffic_recorder.record(
+                    "rpc", body, reply_processor.ordered_reply, monotonic() - start
+                )
         else:
             if err:
                 send_client_error(client, "400", err)
-        client.Disconnect()
+        # A deferred reply disconnects when it is sent
+        if not deferred:
+            client.Disconnect()
 
 
 @event(rpc_serv, "Connected")
@@ -1105,19 +2375,38 @@ def initialize():
     @Wait(0)
     def _set_ntp_async():
         set_ntp(
-            config.get("ntp_primary", "pool.ntp.org"),
-            config.get("ntp_secondary", None),
+            config.ntp_primary,
+            config.ntp_secondary,
         )
         log("NTP Complete (success or failure)", "info")
 
-    if config and config.get("backend_server_addresses"):
+    if config.backend_server_addresses:
         set_backend_server_loop()
+        if server_selector.policy == "latency":
+            Timer(config.backend_server_reselect_interval, reselect_backend_server)
+        # Does nothing until hedging is enabled, which can happen on a config reload
+        variables.hedge_timer = Timer(
+            config.check_backend_server_interval, refresh_hedge_secondary
+        )
     else:
         log(
             "No backend servers specified. They must now be manually set through RPC calls",
             "warning",
         )
 
+    if backend_router.routes:
+        check_backend_routes()
+        variables.route_check_timer = Timer(
+            config.check_backend_server_interval, check_backend_routes
+        )
+
+    variables.config_watcher = ConfigWatcher(
+        "config.json", config, apply_config, config.config_reload_interval
+    )
+    variables.ports_watcher = FileWatcher(
+        "ports.json", reload_ports_, config.config_reload_interval
+    )
+
 
 initialize()
 log("System initialized", "info")
@@ -0,0 +1,222 @@
+from threading import Lock
+from time import time
+
+from extronlib.system import Wait
+
+from utils import log
+
+"""
+Property-change subscriptions pushed from the processor
+
+Instead of the backend polling get_property or GetVolume, it subscribes once:
+{"type": "subscribe", "domain": "UIDevice", "object": "TouchPanel_1",
+ "property": "GetVolume", "arg1": "Master", "interval": "1", "deadband": "2"}
+
+- property: an attribute (ex: "Level", "SerialNumber") or a Get* method
+- arg1: optional, passed to a Get* method (ex: GetVolume("Master"))
+- interval: seconds between samples
+- deadband: optional, numeric values are only pushed when they move this much
+
+Every subscription is sampled on the shared timer wheel.  Changed values are
+collected for push_delay seconds and sent to the paired backend server in one
+PUT to /api/v1/properties.  The first sample is always sent.  If a batch can't
+be sent, its values are sent again on their next sample.
+
+"""
+
+JSON_TYPES = (bool, int, float, str, type(None))
+
+
+def _jsonable(value):
+    if isinstance(value, JSON_TYPES):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    return str(value)
+
+
+def _changed(last, value, deadband):
+    if deadband and isinstance(value, (int, float)) and isinstance(last, (int, float)):
+        return abs(value - last) >= deadband
+    return value != last
+
+
+class Subscription:
+    __slots__ = (
+        "key",
+        "domain",
+        "object_map",
+        "name",
+        "prop",
+        "args",
+        "interval",
+        "deadband",
+        "last_sent",
+        "has_sent",
+        "task_id",
+    )
+
+    def __init__(self, key, domain, object_map, name, prop, args, interval, deadband):
+        self.key = key
+        self.domain = domain
+        self.object_map = object_map
+        self.name = name
+        self.prop = prop
+        self.args = args
+        self.interval = interval
+        self.deadband = deadband
+        self.last_sent = None
+        self.has_sent = False
+        self.task_id = None
+
+
+class PropertySubscriptions:
+    def __init__(self, scheduler, send_batch, push_delay=0.1):
+        """send_batch(changes) returns True if the backend server took the batch"""
+        self.scheduler = scheduler
+        self.send_batch = send_batch
+        self.push_delay = push_delay
+        # Key: (domain, name, property, args), Value: Subscription
+        self.subscriptions = {}
+        self._pending = {}  # Key: subscription key, Value: change
+        self._lock = Lock()
+        self._push_wait = None
+
+        self.samples = 0
+        self.pushed = 0
+        self.failed_pushes = 0
+
+    def _read(self, subscription):
+        obj = subscription.object_map.get(subscription.name, None)
+        if obj is None:
+            raise KeyError(subscription.name)
+        value = getattr(obj, subscription.prop)
+        if callable(value):
+            value = value(*subscription.args)
+        return _jsonable(value)
+
+    def subscribe(
+        self, domain, object_map, name, prop, interval, deadband=None, args=()
+    ):
+        """
+        Replaces any subscription to the same property,
+        returns tuple golang style (key, error)
+        """
+        obj = object_map.get(name, None)
+        if obj is None:
+            return None, "Object not found: {}".format(name)
+        if not hasattr(obj, prop):
+            return None, "{} has no property {}".format(name, prop)
+        if callable(getattr(obj, prop)) and not prop.startswith("Get"):
+            return None, "Only Get* methods can be subscribed to: {}".format(prop)
+        interval = max(float(interval), self.scheduler.tick)
+        deadband = float(deadband) if deadband not in ("", None) else None
+
+        key = (domain, name, prop, tuple(args))
+        subscription = Subscription(
+            key, domain, object_map, name, prop, tuple(args), interval, deadband
+        )
+        self.unsubscribe(lambda existing: existing.key == key)
+        with self._lock:
+            self.subscriptions[key] = subscription
+        self._schedule(subscription, 0)
+        return key, None
+
+    def unsubscribe(self, match):
+        """Removes every subscription match(subscription) is True for, returns the count"""
+        with self._lock:
+            removed = [sub for sub in self.subscriptions.values() if match(sub)]
+            for subscription in removed:
+                del self.subscriptions[subscription.key]
+                self._pending.pop(subscription.key, None)
+        for subscription in removed:
+            if subscription.task_id is not None:
+                self.scheduler.cancel(subscription.task_id)
+        return len(removed)
+
+    def _schedule(self, subscription, delay):
+        subscription.task_id = self.scheduler.schedule(
+            delay,
+            lambda: self._sample(subscription),
+            None,
+            "subscription {} {} {}".format(
+                subscription.domain, subscription.name, subscription.prop
+            ),
+        )
+
+    def _sample(self, subscription):
+        if self.subscriptions.get(subscription.key, None) is not subscription:
+            return  # Unsubscribed or replaced
+        self.samples += 1
+        try:
+            value = self._read(subscription)
+        except Exception as e:
+            log(
+                "Subscription {} {} error: {}".format(
+                    subscription.name, subscription.prop, str(e)
+                ),
+                "error",
+            )
+            value = None
+        if not subscription.has_sent or _changed(
+            subscription.last_sent, value, subscription.deadband
+        ):
+            subscription.last_sent = value
+            subscription.has_sent = True
+            change = {
+                "domain": subscription.domain,
+                "name": subscription.name,
+                "property": subscription.prop,
+                "value": value,
+                "timestamp": str(time()),
+            }
+            if subscription.args:
+                change["args"] = list(subscription.args)
+            with self._lock:
+                self._pending[subscription.key] = change  # Latest value wins
+                if self._push_wait is None:
+                    self._push_wait = Wait(self.push_delay, self.push)
+        self._schedule(subscription, subscription.interval)
+
+    def push(self):
+        with self._lock:
+            self._push_wait = None
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        if self.send_batch(list(pending.values())):
+            self.pushed += len(pending)
+            return
+        # Sent again on their next sample
+        self.failed_pushes += 1
+        with self._lock:
+            for key in pending:
+                subscription = self.subscriptions.get(key, None)
+                if subscription is not None:
+                    subscription.has_sent = False
+
+    def describe(self):
+        with self._lock:
+            subscriptions = list(self.subscriptions.values())
+        return [
+            {
+                "domain": sub.domain,
+                "object": sub.name,
+                "property": sub.prop,
+                "args": list(sub.args),
+                "interval": sub.interval,
+                "deadband": sub.deadband,
+                "value": sub.last_sent,
+            }
+            for sub in subscriptions
+        ]
+
+    def stats(self):
+        return {
+            "subscriptions": len(self.subscriptions),
+            "samples": self.samples,
+            "pushed": self.pushed,
+            "failed_pushes": self.failed_pushes,
+        }
@@ -0,0 +1,112 @@
+from threading import Lock
+from time import monotonic
+
+from extronlib.system import Timer
+
+from utils import log
+
+"""
+Processor-side Level and Slider ramps
+
+The backend sends a target, duration and easing once,
+and the processor interpolates locally instead of the backend
+sending a SetLevel / SetFill for every step.
+
+"""
+
+EASINGS = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: t * (2 - t),
+    "ease_in_out": lambda t: 2 * t * t if t < 0.5 else -1 + (4 - 2 * t) * t,
+}
+
+
+class Ramp:
+    def __init__(self, obj, setter, start, target, duration, easing):
+        self.obj = obj
+        self.setter = setter
+        self.start = start
+        self.target = target
+        self.duration = duration
+        self.easing = easing
+        self.started = monotonic()
+        self.last_value = start
+
+    def value_at(self, now):
+        """Returns (value, finished)"""
+        if self.duration <= 0:
+            return self.target, True
+        progress = (now - self.started) / self.duration
+        if progress >= 1:
+            return self.target, True
+        eased = self.easing(progress)
+        return int(round(self.start + (self.target - self.start) * eased)), False
+
+
+class RampScheduler:
+    """
+    Runs every active ramp from one shared timer.
+
+    Each element has at most one ramp, a newer ramp or
+    any other command for the element cancels it.
+    """
+
+    def __init__(self, frame_rate=20):
+        self.interval = 1.0 / frame_rate
+        self._ramps = {}  # Key: element object, Value: Ramp
+        self._lock = Lock()
+        self._timer = None
+        self.steps_sent = 0
+
+    def start(self, obj, target, duration, easing="linear"):
+        if easing not in EASINGS:
+            raise ValueError("Invalid easing: {}".format(easing))
+        if hasattr(obj, "SetLevel"):
+            setter, start = obj.SetLevel, obj.Level
+        elif hasattr(obj, "SetFill"):
+            setter, start = obj.SetFill, obj.Fill
+        else:
+            raise ValueError("{} can not be ramped".format(str(obj)))
+
+        ramp = Ramp(obj, setter, int(start), target, duration, EASINGS[easing])
+        with self._lock:
+            self._ramps[obj] = ramp
+            if self._timer is None:
+                self._timer = Timer(self.interval, self._tick)
+            elif self._timer.State != "Running":
+                self._timer.Restart()
+
+    def cancel(self, obj):
+        with self._lock:
+            self._ramps.pop(obj, None)
+
+    def active(self):
+        return len(self._ramps)
+
+    def _tick(self, timer, count):
+        now = monotonic()
+        with self._lock:
+            ramps = list(self._ramps.items())
+
+        for obj, ramp in ramps:
+            if self._ramps.get(obj, None) is not ramp:
+                continue  # Cancelled or replaced since this tick started
+            value, finished = ramp.value_at(now)
+            if value != ramp.last_value:
+                # Only visible steps are sent to the panel
+                try:
+                    ramp.setter(value)
+                    self.steps_sent += 1
+                except Exception as e:
+                    log("Ramp error on {}: {}".format(str(obj), str(e)), "error")
+                    finished = True
+                ramp.last_value = value
+            if finished:
+                with self._lock:
+                    if self._ramps.get(obj, None) is ramp:
+                        del self._ramps[obj]
+
+        with self._lock:
+            if not self._ramps:
+                timer.Stop()
@@ -0,0 +1,172 @@
+import re
+from threading import Lock
+
+from extronlib.system import Wait
+
+from utils import log
+
+"""
+Framing and batching for unsolicited data received on serial and ethernet ports
+
+Configured per port in ports.json:
+- ReceiveFraming: "Delimiter", "Regex" or "Length"
+- ReceiveDelimiter: frame terminator, ex: "\\r\\n" (Delimiter mode)
+- ReceiveRegex: pattern matching one frame (Regex mode)
+- ReceiveLength: bytes per frame (Length mode)
+- ReceiveFlushWindow: seconds to collect frames before sending them as one batch
+
+"""
+
+FRAMING_MODES = ("Delimiter", "Regex", "Length")
+
+# Frames are sent to the backend as text.  latin-1 maps every byte to one
+# character, so binary protocols survive the round trip unchanged.
+FRAME_ENCODING = "latin-1"
+
+
+class ReceiveFramer:
+    """
+    Splits a port's ReceiveData stream into complete frames.
+
+    Partial frames stay in a reusable bytearray until the rest arrives.
+    """
+
+    def __init__(
+        self, mode, delimiter=None, pattern=None, length=None, max_buffer=4096
+    ):
+        if mode not in FRAMING_MODES:
+            raise ValueError("Invalid framing mode: {}".format(mode))
+        self.mode = mode
+        self.max_buffer = max_buffer
+        self.buffer = bytearray()
+
+        if mode == "Delimiter":
+            if not delimiter:
+                raise ValueError("Delimiter framing requires a delimiter")
+            self.delimiter = delimiter.encode(FRAME_ENCODING)
+        elif mode == "Regex":
+            if not pattern:
+                raise ValueError("Regex framing requires a pattern")
+            self.pattern = re.compile(pattern.encode(FRAME_ENCODING))
+        elif mode == "Length":
+            self.length = int(length or 0)
+            if self.length <= 0:
+                raise ValueError("Length framing requires a positive length")
+
+    def feed(self, data):
+        """Adds received bytes to the buffer, returns a list of complete frames"""
+        self.buffer.extend(data)
+
+        if self.mode == "Delimiter":
+            frames, consumed = self._split_delimiter()
+        elif self.mode == "Regex":
+            frames, consumed = self._split_regex()
+        else:
+            frames, consumed = self._split_length()
+
+        if consumed:
+            del self.buffer[:consumed]
+
+        if len(self.buffer) > self.max_buffer:
+            log(
+                "Receive buffer overflow, discarding {} bytes".format(len(self.buffer)),
+                "warning",
+            )
+            del self.buffer[:]
+        return frames
+
+    def _split_delimiter(self):
+        frames = []
+        start = 0
+        delimiter_len = len(self.delimiter)
+        while True:
+            index = self.buffer.find(self.delimiter, start)
+            if index == -1:
+                break
+            if index > start:  # Skip empty frames between back to back delimiters
+                frames.append(bytes(self.buffer[start:index]))
+            start = index + delimiter_len
+        return frames, start
+
+    def _split_regex(self):
+        frames = []
+        end = 0
+        for match in self.pattern.finditer(self.buffer):
+            frame = match.group(1) if self.pattern.groups else match.group(0)
+            frames.append(bytes(frame))
+            end = match.end()
+        return frames, end
+
+    def _split_length(self):
+        frames = []
+        end = len(self.buffer) - (len(self.buffer) % self.length)
+        for start in range(0, end, self.length):
+            frames.append(bytes(self.buffer[start : start + self.length]))
+        return frames, end
+
+
+class ReceiveForwarder:
+    """
+    Collects complete frames from one port and hands them to send_func in batches.
+
+    The first frame of a batch opens a flush window,
+    every frame received during that window is sent with it.
+    """
+
+    def __init__(self, alias, framer, send_func, flush_window=0.05):
+        self.alias = alias
+        self.framer = framer
+        self.send_func = send_func
+        self.flush_window = flush_window
+        self._pending = []
+        self._flush_wait = None
+        self._lock = Lock()
+
+    def handle_receive(self, interface, data):
+        """ReceiveData event handler"""
+        try:
+            frames = self.framer.feed(data)
+        except Exception as e:
+            log("Receive framing error on {}: {}".format(self.alias, str(e)), "error")
+            return
+        if not frames:
+            return
+
+        with self._lock:
+            self._pending.extend(frames)
+            if self._flush_wait is None:
+                self._flush_wait = Wait(self.flush_window, self.flush)
+
+    def flush(self):
+        with self._lock:
+            frames = self._pending
+            self._pending = []
+            self._flush_wait = None
+        if frames:
+            self.send_func(
+                self.alias, [frame.decode(FRAME_ENCODING) for frame in frames]
+            )
+
+
+def make_receive_forwarder(port_definition, send_func):
+    """
+    Returns a ReceiveForwarder for the port definition,
+    or None if the port does not have receive framing configured
+    """
+    mode = port_definition.get("ReceiveFraming", None)
+    if not mode:
+        return None
+
+    alias = port_definition["Alias"]
+    try:
+        framer = ReceiveFramer(
+            mode,
+            delimiter=port_definition.get("ReceiveDelimiter", None),
+            pattern=port_definition.get("ReceiveRegex", None),
+            length=port_definition.get("ReceiveLength", None),
+        )
+        flush_window = float(port_definition.get("ReceiveFlushWindow", 0.05))
+    except (ValueError, re.error) as e:
+        log("Invalid receive framing for {}: {}".format(alias, str(e)), "error")
+        return None
+    return ReceiveForwarder(alias, framer, send_func, flush_window)
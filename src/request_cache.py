@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from threading import Event, Lock
+from time import monotonic
+
+"""
+Recent-result cache for RPC batches sent with a request_id
+
+A backend that times out waiting for a reply can't tell if the commands ran.
+Sending the batch again with the same request_id is safe:
+- If the first run finished, its reply is sent again without running anything
+- If the first run is still going, the retry gets its reply when it finishes
+
+Batch format:
+{"request_id": "a1b2c3", "commands": [{"type": "Relay", ...}, ...]}
+
+request_id is required and "type" is not allowed, so a single command with a
+"commands" field (ex: store_sequence) is never taken for a batch.
+
+Finished replies are kept for ttl seconds, up to max_entries.
+
+"""
+
+
+def unwrap_batch(data):
+    """Returns (commands, request_id), request_id is None if data is not a batch"""
+    if (
+        isinstance(data, dict)
+        and "type" not in data
+        and data.get("request_id", None) is not None
+        and "commands" in data
+    ):
+        return data["commands"], str(data["request_id"])
+    return data, None
+
+
+class CachedRequest:
+    __slots__ = ("request_id", "reply", "finished", "done")
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.reply = None
+        self.finished = None  # monotonic() when the first run finished
+        self.done = Event()
+
+
+class RequestCache:
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # Oldest first
+        self._lock = Lock()
+
+        self.runs = 0
+        self.hits = 0
+        self.waits = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _expire(self, now):
+        """Caller holds the lock.  Running requests are never dropped."""
+        for request_id, entry in list(self._entries.items()):
+            expired = entry.finished is not None and now - entry.finished > self.ttl
+            if not expired and len(self._entries) <= self.max_entries:
+                break
+            if entry.finished is not None:
+                del self._entries[request_id]
+
+    def claim(self, request_id):
+        """
+        Returns (entry, first).
+        first is True when the caller must run the batch, then call finish()
+        or abandon().  Otherwise the reply is (or will be) in entry.reply.
+        """
+        with self._lock:
+            self._expire(monotonic())
+            entry = self._entries.get(request_id, None)
+            if entry is None:
+                entry = CachedRequest(request_id)
+                self._entries[request_id] = entry
+                self.runs += 1
+                self._expire(monotonic())
+                return entry, True
+            if entry.done.is_set():
+                self.hits += 1
+            else:
+                self.waits += 1
+            return entry, False
+
+    def finish(self, entry, reply):
+        entry.reply = reply
+        entry.finished = monotonic()
+        entry.done.set()
+
+    def abandon(self, entry):
+        """The first run failed, so a retry will run the batch again"""
+        with self._lock:
+            if self._entries.get(entry.request_id, None) is entry:
+                del self._entries[entry.request_id]
+        entry.done.set()  # Waiting duplicates see reply is None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            running = sum(
+                1 for entry in self._entries.values() if not entry.done.is_set()
+            )
+            return {
+                "entries": len(self._entries),
+                "running": running,
+                "runs": self.runs,
+                "hits": self.hits,
+                "waits": self.waits,
+            }
@@ -0,0 +1,329 @@
+import json
+import re
+from threading import Lock
+
+from extronlib.system import File
+
+from utils import function_error, log
+
+"""
+Stored named command sequences
+
+The backend stores a large batch once, then runs it by name with a tiny payload:
+{"type": "store_sequence", "name": "presentation", "persist": "true", "commands": [
+    {"type": "UIDevice", "object": "{panel}", "function": "ShowPopup", "arg1": "Pop_Presentation"},
+    {"type": "Button", "object": "Btn_Source_{input}", "function": "SetState", "arg1": "1"},
+    {"type": "Label", "object": "Lbl_Source", "function": "SetText", "arg1": "{input}", "delay": "2"}
+]}
+{"type": "run_sequence", "name": "presentation", "params": {"panel": "TouchPanel_1", "input": "HDMI1"}}
+
+Sequences are compiled when stored: each step's domain, function and args are
+checked and looked up once, and the {placeholders} it needs are found ahead of
+time.  Running a sequence only substitutes params and calls each function.
+
+Steps with a "delay" run on the shared timer wheel, tagged with the step's
+"tag" or the sequence name, so {"type": "cancel_scheduled", "tag": "<name>"}
+stops the rest of a running sequence.
+
+Sequences stored with persist are saved to sequences.json and loaded at boot.
+
+"""
+
+PARAM = re.compile(r"\{(\w+)\}")
+
+
+def _params_in(text):
+    return set(PARAM.findall(str(text)))
+
+
+def _substitute(text, params):
+    return PARAM.sub(lambda match: str(params[match.group(1)]), str(text))
+
+
+class Step:
+    __slots__ = ("domain", "object_map", "object_name", "func", "args", "delay", "tag")
+
+    def __init__(self, domain, object_map, object_name, func, args, delay, tag):
+        self.domain = domain
+        self.object_map = object_map
+        self.object_name = object_name
+        self.func = func
+        self.args = args
+        self.delay = delay
+        self.tag = tag
+
+
+class Sequence:
+    __slots__ = ("name", "steps", "params", "commands", "persist")
+
+    def __init__(self, name, steps, params, commands, persist):
+        self.name = name
+        self.steps = steps
+        self.params = params
+        self.commands = commands
+        self.persist = persist
+
+
+class SequenceRun:
+    """One run of a sequence, stopped when any of its steps fails"""
+
+    __slots__ = ("task_ids", "stopped")
+
+    def __init__(self):
+        self.task_ids = []
+        self.stopped = False
+
+
+def _step_error(err, number):
+    """Puts the step number in front of the reason of a status line"""
+    status, _, reason = err.partition(" | ")
+    return "{} | Step {}: {}".format(status, number, reason)
+
+
+class SequenceStore:
+    def __init__(
+        self, domain_class_map, methods_map, scheduler=None, persist_path=None
+    ):
+        self.domain_class_map = domain_class_map
+        self.methods_map = methods_map
+        self.scheduler = scheduler
+        self.persist_path = persist_path
+        self.sequences = {}  # Key: name, Value: Sequence
+        self.unloaded = {}  # Persisted sequences that no longer compile, kept on save
+        self._lock = Lock()
+        self.runs = 0
+
+    def _compile_step(self, command):
+        """Returns (Step, params), raises KeyError or ValueError"""
+        domain = command["type"]
+        object_map = self.domain_class_map[domain]
+        object_name = str(command["object"])
+        func = self.methods_map[command["function"]]
+        args = tuple(
+            str(command[arg])
+            for arg in ("arg1", "arg2", "arg3")
+            if command.get(arg, None) not in ("", None)
+        )
+        params = _params_in(object_name)
+        for arg in args:
+            params |= _params_in(arg)
+        # Objects are looked up when the step runs, reload_ports can replace them
+        if not _params_in(object_name) and object_name not in object_map:
+            raise KeyError(object_name)
+
+        delay = float(command.get("delay", 0) or 0)
+        if delay < 0:
+            raise ValueError("delay can not be negative")
+        tag = command.get("tag", None)
+        step = Step(
+            domain,
+            object_map,
+            object_name,
+            func,
+            args,
+            delay,
+            str(tag) if tag is not None else None,
+        )
+        return step, params
+
+    def compile(self, name, commands, persist=False):
+        """Returns (Sequence, errors), the Sequence is None if any step is invalid"""
+        if not isinstance(commands, list) or not commands:
+            return None, ["commands must be a non-empty list"]
+        steps = []
+        params = set()
+        errors = []
+        for number, command in enumerate(commands):
+            try:
+                step, step_params = self._compile_step(command)
+            except KeyError as e:
+                errors.append("Step {}: not found: {}".format(number, str(e)))
+                continue
+            except (TypeError, ValueError, AttributeError) as e:
+                errors.append("Step {}: malformed: {}".format(number, str(e)))
+                continue
+            steps.append(step)
+            params |= step_params
+        if errors:
+            return None, errors
+        return Sequence(name, steps, frozenset(params), commands, persist), []
+
+    def store(self, name, commands, persist=False):
+        """Replaces any sequence with the same name, returns a list of errors"""
+        sequence, errors = self.compile(name, commands, persist)
+        if sequence is None:
+            return errors
+        with self._lock:
+            previous = self.sequences.get(name, None)
+            self.sequences[name] = sequence
+            self.unloaded.pop(name, None)
+        if persist or (previous is not None and previous.persist):
+            self._save()
+        return []
+
+    def delete(self, name):
+        with self._lock:
+            sequence = self.sequences.pop(name, None)
+            unloaded = self.unloaded.pop(name, None)
+        if unloaded is not None or (sequence is not None and sequence.persist):
+            self._save()
+        return sequence is not None or unloaded is not None
+
+    def _resolve(self, step, params):
+        """Returns (obj, args, err)"""
+        object_name = _substitute(step.object_name, params)
+        obj = step.object_map.get(object_name, None)
+        if obj is None:
+            return (
+                None,
+                None,
+                "400 Bad Request | Object not found: {}".format(object_name),
+            )
+        return obj, [_substitute(arg, params) for arg in step.args], None
+
+    def _run_step(self, step, params):
+        """Returns tuple golang style (data, error)"""
+        obj, args, err = self._resolve(step, params)
+        if err is not None:
+            return None, err
+        try:
+            result = step.func(obj, *args)
+        except Exception as e:
+            return None, function_error(e)
+        if result is None:
+            return "200 OK", None
+        return "200 OK | {}".format(str(result)), None
+
+    def run(self, name, params=None):
+        """
+        Runs the steps without a delay now, and schedules the rest.
+        Every step's object is checked before anything runs.  If a step fails,
+        now or when its delay is up, the rest of the sequence is stopped,
+        including steps already scheduled.
+        Returns tuple golang style (data, error).
+        """
+        sequence = self.sequences.get(name, None)
+        if sequence is None:
+            return None, "404 Not Found | No sequence named {}".format(name)
+        params = params or {}
+        if not isinstance(params, dict):
+            return None, "400 Bad Request | params must be an object"
+        missing = sequence.params - set(params)
+        if missing:
+            return None, "400 Bad Request | Missing params: {}".format(
+                ", ".join(sorted(missing))
+            )
+        for number, step in enumerate(sequence.steps):
+            _, _, err = self._resolve(step, params)
+            if err is not None:
+                return None, _step_error(err, number)
+
+        self.runs += 1
+        ran = 0
+        sequence_run = SequenceRun()
+        for number, step in enumerate(sequence.steps):
+            if sequence_run.stopped:
+                return (
+                    None,
+                    "409 Conflict | A delayed step failed, ran {} of {} steps".format(
+                        ran, len(sequence.steps)
+                    ),
+                )
+            if step.delay > 0 and self.scheduler is not None:
+                sequence_run.task_ids.append(
+                    self.scheduler.schedule(
+                        step.delay,
+                        lambda step=step, number=number: self._run_delayed(
+                            name, number, step, params, sequence_run
+                        ),
+                        step.tag or name,
+                        "{} step {}".format(name, number),
+                    )
+                )
+                continue
+            _, err = self._run_step(step, params)
+            if err is not None:
+                self._stop(sequence_run)
+                err = _step_error(err, number)
+                log("Sequence {}: {}".format(name, err), "error")
+                return None, "{}, ran {} of {} steps".format(
+                    err, ran, len(sequence.steps)
+                )
+            ran += 1
+
+        if sequence_run.task_ids:
+            return (
+                "200 OK | Ran {} steps, scheduled {}".format(
+                    ran, len(sequence_run.task_ids)
+                ),
+                None,
+            )
+        return "200 OK | Ran {} steps".format(ran), None
+
+    def _stop(self, sequence_run):
+        """Cancels the run's scheduled steps, returns how many had not run yet"""
+        sequence_run.stopped = True
+        return sum(
+            1 for task_id in sequence_run.task_ids if self.scheduler.cancel(task_id)
+        )
+
+    def _run_delayed(self, name, number, step, params, sequence_run):
+        if sequence_run.stopped:
+            return
+        _, err = self._run_step(step, params)
+        if err is not None:
+            cancelled = self._stop(sequence_run)
+            log(
+                "Sequence {}: {}, {} scheduled steps cancelled".format(
+                    name, _step_error(err, number), cancelled
+                ),
+                "error",
+            )
+
+    def describe(self):
+        return {
+            name: {
+                "steps": len(sequence.steps),
+                "params": sorted(sequence.params),
+                "persist": sequence.persist,
+            }
+            for name, sequence in sorted(self.sequences.items())
+        }
+
+    def _save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            saved = dict(self.unloaded)
+            saved.update(
+                (name, sequence.commands)
+                for name, sequence in self.sequences.items()
+                if sequence.persist
+            )
+        try:
+            with File(self.persist_path, "w") as f:
+                json.dump(saved, f)
+        except Exception as e:
+            log("Error saving sequences: {}".format(str(e)), "error")
+
+    def load(self):
+        """Compiles the persisted sequences, returns a list of errors"""
+        if not self.persist_path or not File.Exists(self.persist_path):
+            return []
+        try:
+            with File(self.persist_path, "r") as f:
+                saved = json.load(f)
+        except Exception as e:
+            log("Error loading sequences: {}".format(str(e)), "error")
+            return [str(e)]
+        errors = []
+        for name, commands in saved.items():
+            sequence, sequence_errors = self.compile(name, commands, persist=True)
+            if sequence is None:
+                errors.extend("{}: {}".format(name, err) for err in sequence_errors)
+                self.unloaded[name] = commands
+                continue
+            self.sequences[name] = sequence
+        for err in errors:
+            log("Sequences: {}".format(err), "error")
+        return errors
@@ -0,0 +1,197 @@
+from threading import RLock
+from time import monotonic
+
+from extronlib import event
+from extronlib.system import Timer
+
+from utils import log
+
+"""
+SSH session reuse for EthernetClientInterfaceEx ports
+
+SSH handshakes are slow on the processor, so instead of connecting and
+disconnecting for every command, the session is kept warm and shared by
+every RPC call until it has been idle for SessionIdleTimeout seconds.
+
+Configured per SSH port in ports.json:
+- SessionReuse: true to enable
+- SessionIdleTimeout: seconds without use before the session is closed
+- SessionHealthCheck: optional data to send as a health check, ex: "Q\\n"
+- SessionHealthInterval: seconds without use before a health check is sent
+
+"""
+
+POOL_CHECK_INTERVAL = 5
+
+
+class SshSession:
+    """One warm SSH session, shared by every RPC call to the port"""
+
+    def __init__(
+        self,
+        interface,
+        alias,
+        idle_timeout=300.0,
+        health_check=None,
+        health_interval=30.0,
+        connect_timeout=5.0,
+    ):
+        self.interface = interface
+        self.alias = alias
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.health_interval = health_interval
+        self.connect_timeout = connect_timeout
+
+        self.connected = False
+        self.last_used = monotonic()
+        self._last_health_check = self.last_used
+        # Held during Connect so concurrent callers share one handshake
+        self._lock = RLock()
+
+        self.handshakes = 0
+        self.failed_handshakes = 0
+        self.reused = 0
+        self.idle_closes = 0
+        self.health_failures = 0
+
+        event(interface, ["Connected", "Disconnected"])(self.handle_state)
+
+    def handle_state(self, interface, state):
+        """Connected / Disconnected event handler"""
+        self.connected = state == "Connected"
+
+    def acquire(self, timeout=None):
+        """
+        Returns "ConnectedAlready" if a warm session is available,
+        otherwise connects and returns the result of Connect
+        """
+        with self._lock:
+            self.last_used = monotonic()
+            if self.connected:
+                self.reused += 1
+                return "ConnectedAlready"
+
+            result = self.interface.Connect(
+                self.connect_timeout if timeout is None else timeout
+            )
+            if "Connected" in result:
+                self.connected = True
+                self.handshakes += 1
+            else:
+                self.failed_handshakes += 1
+            return result
+
+    def release(self):
+        """Called instead of Disconnect, the session stays warm until idle"""
+        self.last_used = monotonic()
+
+    def close(self):
+        with self._lock:
+            if self.connected:
+                self.interface.Disconnect()
+            self.connected = False
+
+    def check(self, now):
+        """Closes idle sessions and health checks quiet ones"""
+        if not self.connected:
+            return
+        idle = now - self.last_used
+        if idle >= self.idle_timeout:
+            log("Closing idle SSH session: {}".format(self.alias), "info")
+            self.idle_closes += 1
+            self.close()
+            return
+
+        if (
+            not self.health_check
+            or now - self._last_health_check < self.health_interval
+        ):
+            return
+        if idle < self.health_interval:
+            return  # Recent traffic already proves the session is alive
+        self._last_health_check = now
+        try:
+            self.interface.Send(self.health_check)
+        except Exception as e:
+            log(
+                "SSH session health check failed on {}: {}".format(self.alias, str(e)),
+                "warning",
+            )
+            self.health_failures += 1
+            self.connected = False
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "handshakes": self.handshakes,
+            "failed_handshakes": self.failed_handshakes,
+            "reused": self.reused,
+            "idle_closes": self.idle_closes,
+            "health_failures": self.health_failures,
+            "idle_seconds": round(monotonic() - self.last_used, 1),
+        }
+
+
+class SshSessionPool:
+    """Checks every warm session from a single timer"""
+
+    def __init__(self):
+        self.sessions = {}
+        self._timer = None
+
+    def add(self, session):
+        self.sessions[session.alias] = session
+        if self._timer is None:
+            self._timer = Timer(POOL_CHECK_INTERVAL, self._check_all)
+
+    def get(self, alias, default=None):
+        return self.sessions.get(alias, default)
+
+    def remove(self, alias):
+        """Closes and forgets the session, ex: when its port is removed"""
+        session = self.sessions.pop(alias, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def items(self):
+        return self.sessions.items()
+
+    def _check_all(self, timer, count):
+        now = monotonic()
+        for session in list(self.sessions.values()):
+            try:
+                session.check(now)
+            except Exception as e:
+                log("SSH session check error: {}".format(str(e)), "error")
+
+
+def is_session_reuse(port_definition):
+    if port_definition.get("Protocol", None) != "SSH":
+        return False
+    reuse = port_definition.get("SessionReuse", "")
+    return str(reuse).lower() in ["true", "1", "yes"]
+
+
+def make_ssh_session(interface, port_definition):
+    """
+    Returns an SshSession for the port definition,
+    or None if session reuse is not configured
+    """
+    if not is_session_reuse(port_definition):
+        return None
+
+    alias = port_definition["Alias"]
+    try:
+        return SshSession(
+            interface,
+            alias,
+            idle_timeout=float(port_definition.get("SessionIdleTimeout", 300)),
+            health_check=port_definition.get("SessionHealthCheck", None),
+            health_interval=float(port_definition.get("SessionHealthInterval", 30)),
+            connect_timeout=float(port_definition.get("ConnectTimeout", 5)),
+        )
+    except ValueError as e:
+        log("Invalid SSH session reuse for {}: {}".format(alias, str(e)), "error")
+        return None
@@ -0,0 +1,209 @@
+import time
+from threading import Lock
+from time import monotonic
+
+from extronlib.system import Timer
+
+from utils import log
+
+"""
+Delayed and scheduled commands on one hashed timer wheel
+
+The backend sends a whole sequence at once and the processor runs each step
+on time, instead of the backend keeping its own timers per room:
+[
+    {"type": "Relay", "object": "ProjPower", "function": "Pulse", "arg1": "1"},
+    {"type": "Button", "object": "Btn_HDMI", "function": "SetState", "arg1": "1",
+     "delay": "20", "tag": "room_on"},
+    {"type": "Button", "object": "Btn_Mute", "function": "SetState", "arg1": "0",
+     "delay": "22", "tag": "room_on"}
+]
+
+- delay: seconds from now
+- at: a Unix timestamp, or a local time "HH:MM" / "HH:MM:SS" (the next one)
+- tag: optional, for cancel_scheduled and get_scheduled
+
+Tasks are hashed into slots by the tick they are due on.  One Timer steps
+through one slot per tick, so each tick only looks at the tasks in its slot,
+however many are pending.  The Timer is stopped while nothing is pending.
+
+"""
+
+
+class ScheduledTask:
+    __slots__ = ("task_id", "due_tick", "due_time", "tag", "label", "callback")
+
+    def __init__(self, task_id, due_tick, due_time, tag, label, callback):
+        self.task_id = task_id
+        self.due_tick = due_tick
+        self.due_time = due_time  # time() the task is due, for listing
+        self.tag = tag
+        self.label = label
+        self.callback = callback
+
+
+def parse_at(at, now=None):
+    """Returns (seconds from now, err) for a Unix timestamp or a local "HH:MM[:SS]" """
+    now = time.time() if now is None else now
+    text = str(at).strip()
+    if ":" not in text:
+        try:
+            return float(text) - now, None
+        except ValueError:
+            return None, "Invalid at: {}".format(text)
+
+    parts = text.split(":")
+    try:
+        hours, minutes = int(parts[0]), int(parts[1])
+        seconds = int(parts[2]) if len(parts) > 2 else 0
+    except (ValueError, IndexError):
+        return None, "Invalid at: {}".format(text)
+    if len(parts) > 3 or not (
+        0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60
+    ):
+        return None, "Invalid at: {}".format(text)
+
+    local = time.localtime(now)
+    for day in (local.tm_mday, local.tm_mday + 1):  # mktime rolls over the month
+        target = time.mktime(
+            (local.tm_year, local.tm_mon, day, hours, minutes, seconds, 0, 0, -1)
+        )
+        if target > now:
+            break
+    return target - now, None
+
+
+class TimerWheel:
+    def __init__(self, tick=0.1, slots=512):
+        self.tick = tick
+        self._slots = [dict() for _ in range(slots)]  # Key: task id, Value: task
+        self._tasks = {}  # Key: task id, Value: task
+        self._tags = {}  # Key: tag, Value: set of task ids
+        self._lock = Lock()
+        self._timer = None
+        self._origin = monotonic()
+        self._current_tick = 0  # Last tick processed
+        self._next_id = 1
+
+        self.scheduled = 0
+        self.fired = 0
+        self.cancelled = 0
+
+    def _tick_now(self, now):
+        return int((now - self._origin) / self.tick)
+
+    def schedule(self, delay, callback, tag=None, label=None):
+        """Runs callback() after delay seconds, returns the task id"""
+        now = monotonic()
+        with self._lock:
+            if not self._tasks:
+                # Idle, realign so the first tick is one interval from now
+                self._origin = now - self._current_tick * self.tick
+            due_tick = max(
+                self._current_tick + 1,
+                int(-(-(now + max(delay, 0) - self._origin) // self.tick)),
+            )
+            task = ScheduledTask(
+                self._next_id, due_tick, time.time() + delay, tag, label, callback
+            )
+            self._next_id += 1
+            self._slots[due_tick % len(self._slots)][task.task_id] = task
+            self._tasks[task.task_id] = task
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(task.task_id)
+            self.scheduled += 1
+
+            if self._timer is None:
+                self._timer = Timer(self.tick, self._tick)
+            elif self._timer.State != "Running":
+                self._timer.Restart()
+        return task.task_id
+
+    def _remove(self, task):
+        """Caller holds the lock"""
+        self._tasks.pop(task.task_id, None)
+        self._slots[task.due_tick % len(self._slots)].pop(task.task_id, None)
+        if task.tag is not None:
+            ids = self._tags.get(task.tag, None)
+            if ids is not None:
+                ids.discard(task.task_id)
+                if not ids:
+                    del self._tags[task.tag]
+
+    def cancel(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id, None)
+            if task is None:
+                return False
+            self._remove(task)
+            self.cancelled += 1
+            return True
+
+    def cancel_tag(self, tag):
+        """Returns the number of tasks cancelled"""
+        with self._lock:
+            ids = list(self._tags.get(tag, ()))
+            for task_id in ids:
+                self._remove(self._tasks[task_id])
+            self.cancelled += len(ids)
+            return len(ids)
+
+    def pending(self, tag=None):
+        """Returns pending tasks, soonest first"""
+        now = time.time()
+        with self._lock:
+            if tag is None:
+                tasks = list(self._tasks.values())
+            else:
+                tasks = [self._tasks[task_id] for task_id in self._tags.get(tag, ())]
+        tasks.sort(key=lambda task: task.due_time)
+        return [
+            {
+                "id": task.task_id,
+                "tag": task.tag,
+                "due_in": round(max(task.due_time - now, 0), 1),
+                "command": task.label,
+            }
+            for task in tasks
+        ]
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def _tick(self, timer, count):
+        # Late ticks catch up on every slot they skipped
+        target = self._tick_now(monotonic())
+        due = []
+        with self._lock:
+            while self._current_tick < target:
+                self._current_tick += 1
+                slot = self._slots[self._current_tick % len(self._slots)]
+                for task in list(slot.values()):
+                    if task.due_tick <= self._current_tick:
+                        self._remove(task)
+                        due.append(task)
+            if not self._tasks:
+                timer.Stop()
+
+        # Outside the lock, so callbacks can schedule or cancel
+        due.sort(key=lambda task: (task.due_tick, task.task_id))
+        for task in due:
+            self.fired += 1
+            try:
+                task.callback()
+            except Exception as e:
+                log(
+                    "Scheduled task {} ({}) failed: {}".format(
+                        task.task_id, task.label, str(e)
+                    ),
+                    "error",
+                )
+
+    def stats(self):
+        return {
+            "pending": len(self._tasks),
+            "tags": len(self._tags),
+            "scheduled": self.scheduled,
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+        }
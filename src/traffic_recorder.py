@@ -0,0 +1,120 @@
+import json
+from threading import Lock
+from time import time
+
+from extronlib.system import File, Wait
+
+from utils import log
+
+"""
+Optional recorder of RPC and uplink traffic, for replay with traffic_replay.py
+
+One JSON object per line, with short keys to keep the file small:
+- t: timestamp
+- k: "rpc" for RPC bodies received, "up" for events sent to a backend server
+- p: uplink path, ex: "/api/v1/button"
+- b: body
+- r: reply
+- d: seconds to process (rpc) or to get a reply (up)
+- e: error, for uplinks that timed out or could not connect
+
+Lines are buffered and written every FLUSH_DELAY seconds to limit flash writes.
+When the file reaches max_bytes it is rotated to .1, .2 ... up to backups files.
+
+"""
+
+FLUSH_DELAY = 1
+
+
+class TrafficRecorder:
+    def __init__(self, path="traffic.jsonl", max_bytes=1000000, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = False
+        self.recorded = 0
+        self._buffer = []
+        self._size = 0
+        self._lock = Lock()
+        self._flush_wait = None
+
+    def start(self):
+        """Starts a new file, the previous recording is rotated"""
+        with self._lock:
+            if self.enabled:
+                return
+            self._rotate()
+            self.enabled = True
+        log("Traffic recording started: {}".format(self.path), "info")
+
+    def stop(self):
+        with self._lock:
+            self.enabled = False
+        self.flush()
+        log("Traffic recording stopped", "info")
+
+    def record(self, kind, body, reply=None, duration=None, path=None, error=None):
+        if not self.enabled:
+            return
+        entry = {"t": round(time(), 4), "k": kind, "b": body, "r": reply}
+        if duration is not None:
+            entry["d"] = round(duration, 4)
+        if path is not None:
+            entry["p"] = path
+        if error is not None:
+            entry["e"] = error
+        try:
+            line = json.dumps(entry, separators=(",", ":")) + "\n"
+        except (TypeError, ValueError):
+            return  # Unserializable reply, skip rather than break the caller
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+            if self._flush_wait is None:
+                self._flush_wait = Wait(FLUSH_DELAY, self.flush)
+
+    def flush(self):
+        with self._lock:
+            self._flush_wait = None
+            lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            data = "".join(lines)
+            try:
+                if self._size + len(data) > self.max_bytes:
+                    self._rotate()
+                with File(self.path, "a") as f:
+                    f.write(data)
+                self._size += len(data)
+            except Exception as e:
+                log("Error writing traffic recording: {}".format(str(e)), "error")
+
+    def _rotate(self):
+        """Caller holds the lock.  Returns True if the file was rotated."""
+        try:
+            oldest = "{}.{}".format(self.path, self.backups)
+            if File.Exists(oldest):
+                File.DeleteFile(oldest)
+            for number in range(self.backups - 1, 0, -1):
+                older = "{}.{}".format(self.path, number)
+                if File.Exists(older):
+                    File.RenameFile(older, "{}.{}".format(self.path, number + 1))
+            if File.Exists(self.path):
+                if self.backups > 0:
+                    File.RenameFile(self.path, "{}.1".format(self.path))
+                else:
+                    File.DeleteFile(self.path)
+        except Exception as e:
+            # Still appended to, and rotated again on the next flush
+            log("Error rotating traffic recording: {}".format(str(e)), "error")
+            return False
+        self._size = 0
+        return True
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "recorded": self.recorded,
+            "file_bytes": self._size,
+        }
@@ -0,0 +1,160 @@
+import urllib.request
+from collections import deque
+from threading import Lock
+
+from extronlib.system import Wait
+
+from utils import log
+
+"""
+Hedged uplink requests
+
+If the paired backend server hasn't replied to an event within a percentile
+of its recent reply times, the same event is also sent to a warm secondary
+server.  Both requests carry the same idempotency key so the backend can
+tell they are one event.  The first reply wins and the other is ignored.
+
+"""
+
+MIN_SAMPLES = 20  # Replies needed before the percentile is trusted
+WINDOW = 200  # Recent replies used for the percentile
+
+
+class LatencyTracker:
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self._sorted = None
+        self._lock = Lock()
+
+    def add(self, latency):
+        with self._lock:
+            self.samples.append(latency)
+            self._sorted = None
+
+    def percentile(self, percent):
+        """Returns the latency at the percentile, or None without enough samples"""
+        with self._lock:
+            if len(self.samples) < MIN_SAMPLES:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self.samples)
+            index = int(round(percent / 100.0 * (len(self._sorted) - 1)))
+            return self._sorted[index]
+
+
+class HedgedRequest:
+    """Tracks which of the primary or secondary replies first"""
+
+    def __init__(self):
+        self.winner = None
+        self._lock = Lock()
+        self._wait = None
+
+    def claim(self, source):
+        """Returns True if this reply is the first, and should be applied"""
+        with self._lock:
+            if self.winner is not None:
+                return False
+            self.winner = source
+        if self._wait is not None and source == "primary":
+            self._wait.Cancel()
+        return True
+
+    @property
+    def done(self):
+        return self.winner is not None
+
+
+class UplinkHedger:
+    def __init__(self, percentile=None, min_delay=0.02, timeout=2):
+        self.enabled = percentile is not None
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.timeout = timeout
+        self.secondary = None
+        self.latencies = LatencyTracker()
+
+        self.requests = 0
+        self.hedges = 0
+        self.primary_wins = 0
+        self.secondary_wins = 0
+        self.secondary_errors = 0
+
+    def record(self, latency):
+        """Records a primary reply time"""
+        self.latencies.add(latency)
+
+    def delay(self):
+        latency = self.latencies.percentile(self.percentile)
+        if latency is None:
+            return None
+        return max(self.min_delay, latency)
+
+    def start(self, user_data_req, on_reply):
+        """
+        Returns a HedgedRequest, or None if hedging is disabled or not ready.
+
+        on_reply(response_data, "secondary") is called with the secondary's reply
+        if it wins.
+        """
+        if not self.enabled:
+            return None
+        self.requests += 1
+        delay = self.delay()
+        if delay is None or self.secondary is None:
+            return None
+
+        hedge = HedgedRequest()
+        secondary = self.secondary
+
+        def _send_hedge():
+            if hedge.done:
+                return
+            self.hedges += 1
+            hedge_req = urllib.request.Request(
+                secondary + user_data_req.selector,
+                data=user_data_req.data,
+                headers=dict(user_data_req.header_items()),
+                method=user_data_req.get_method(),
+            )
+            try:
+                with urllib.request.urlopen(
+                    hedge_req, timeout=self.timeout
+                ) as response:
+                    response_data = response.read().decode()
+            except Exception as e:
+                self.secondary_errors += 1
+                log(
+                    "Hedged request to {} failed: {}".format(secondary, str(e)),
+                    "warning",
+                )
+                return
+            if hedge.claim("secondary"):
+                self.secondary_wins += 1
+                on_reply(response_data, "secondary")
+
+        hedge._wait = Wait(delay, _send_hedge)
+        return hedge
+
+    def primary_replied(self, hedge):
+        """Returns True if the primary's reply should be applied"""
+        if hedge is None:
+            return True
+        if hedge.claim("primary"):
+            self.primary_wins += 1
+            return True
+        return False
+
+    def stats(self):
+        delay = self.delay() if self.enabled else None
+        return {
+            "enabled": self.enabled,
+            "secondary": self.secondary,
+            "hedge_delay": None if delay is None else round(delay, 4),
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0,
+            "primary_wins": self.primary_wins,
+            "secondary_wins": self.secondary_wins,
+            "secondary_errors": self.secondary_errors,
+        }
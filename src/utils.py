@@ -1,6 +1,7 @@
 import urllib.error
 import urllib.request
 from datetime import datetime
+from time import monotonic
 
 from extronlib.system import Ping, ProgramLog, SetAutomaticTime
 
@@ -29,6 +30,19 @@ def log(message, level="info"):
     ProgramLog(str(message), level)
 
 
+def function_error(e):
+    """Returns the RPC reply for an exception raised by an object's function"""
+    if isinstance(e, KeyError):
+        return "400 Bad Request | Key Error: {}".format(str(e))
+    if isinstance(e, ValueError):
+        return "400 Bad Request | Value Error: {}".format(str(e))
+    if isinstance(e, ConnectionError):
+        return "503 Service Unavailable | Connection Error: {}".format(str(e))
+    if isinstance(e, PermissionError):
+        return "403 Forbidden | Permission Error: {}".format(str(e))
+    return "400 Bad Request | Function Error: {}".format(str(e))
+
+
 def set_ntp(ntp_primary, ntp_secondary=None):
     try:
         success_count, fail_count, rtt = Ping(ntp_primary, count=1)
@@ -47,19 +61,30 @@ def set_ntp(ntp_primary, ntp_secondary=None):
         log("Error setting NTP: {}".format(str(e)), "error")
 
 
-def backend_server_ok(address):
+def backend_server_ok(address, timeout=None):
+    return backend_server_probe(address, timeout) is not None
+
+
+def backend_server_probe(address, timeout=None):
+    """
+    Returns the round trip time in seconds if the server responds "OK",
+    otherwise returns None
+    """
     headers = {"Content-Type": "application/json"}
     url = "{}/api/v1/{}".format(address, "test")
+    if timeout is None:
+        timeout = variables.backend_server_timeout
 
     req = urllib.request.Request(url, headers=headers, method="GET")
     try:
-        with urllib.request.urlopen(
-            req, timeout=variables.backend_server_timeout
-        ) as response:
+        start = monotonic()
+        with urllib.request.urlopen(req, timeout=timeout) as response:
             response_data = response.read().decode()
             if "OK" in response_data:
-                variables.backend_server_timeout_count = 0
-                return True
+                # Probes of other servers say nothing about the paired one
+                if address == variables.backend_server_address:
+                    variables.backend_server_timeout_count = 0
+                return monotonic() - start
             else:
                 log(
                     "Backend server unknown response: {}".format(str(response_data)),
@@ -76,7 +101,7 @@ def backend_server_ok(address):
     except Exception as e:
         log(str(e), "error")
 
-    return False
+    return None
 
 
 def backend_server_ready_to_pair(address):
@@ -6,3 +6,8 @@ backend_server_timeout = 2
 program_log_saver = "Disabled"
 checked_servers = 0
 server_check_timer = None
+hedge_timer = None
+route_check_timer = None
+fast_probe_active = False
+config_watcher = None
+ports_watcher = None
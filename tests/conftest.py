@@ -0,0 +1,101 @@
+import os
+import sys
+import types
+
+# src/ runs on the processor as top-level modules, the tools run from the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def _install_extronlib():
+    """
+    extronlib only exists on the processor.  Unit tests get a stand-in with the
+    parts src/ modules import.  Wait and Timer never fire on their own, tests
+    call fire() or the module's callback directly.
+    """
+
+    class File:
+        def __init__(self, path, mode="r"):
+            self._file = open(path, mode)
+
+        def __enter__(self):
+            return self._file
+
+        def __exit__(self, *exc):
+            self._file.close()
+
+        def __getattr__(self, name):
+            return getattr(self._file, name)
+
+        Exists = staticmethod(os.path.exists)
+        DeleteFile = staticmethod(os.remove)
+        RenameFile = staticmethod(os.replace)
+
+    class Wait:
+        def __init__(self, time, function=None):
+            self.Time = time
+            self.Function = function
+            self.cancelled = False
+
+        def __call__(self, function):
+            self.Function = function
+            return self
+
+        def Cancel(self):
+            self.cancelled = True
+
+        def Restart(self):
+            self.cancelled = False
+
+        def Change(self, time):
+            self.Time = time
+
+        def fire(self):
+            if not self.cancelled:
+                self.Function()
+
+    class Timer:
+        def __init__(self, interval, function):
+            self.Interval = interval
+            self.Function = function
+            self.Count = 0
+            self.State = "Running"
+
+        def Stop(self):
+            self.State = "Stopped"
+
+        def Restart(self):
+            self.Count = 0
+            self.State = "Running"
+
+        def Change(self, interval):
+            self.Interval = interval
+
+        def fire(self):
+            self.Count += 1
+            self.Function(self, self.Count)
+
+    logs = []
+    system = types.ModuleType("extronlib.system")
+    system.File = File
+    system.Wait = Wait
+    system.Timer = Timer
+    system.ProgramLog = lambda message, level="info": logs.append((level, message))
+    system.SaveProgramLog = lambda f: None
+    system.Ping = lambda host, count=1: (0, count, 0)
+    system.SetAutomaticTime = lambda server: None
+    system.logs = logs
+
+    extronlib = types.ModuleType("extronlib")
+    extronlib.event = lambda objects, events: (lambda function: function)
+    extronlib.system = system
+    sys.modules["extronlib"] = extronlib
+    sys.modules["extronlib.system"] = system
+
+
+try:
+    import extronlib  # noqa: F401
+except ImportError:
+    _install_extronlib()
@@ -0,0 +1,68 @@
+from extronlib import system
+
+from app_config import FIELDS, ConfigWatcher, compile_config, load_config
+
+
+def _default(key):
+    return FIELDS[key][1]
+
+
+def test_zero_rates_and_ticks_keep_their_defaults():
+    config, errors = compile_config(
+        {"ramp_frame_rate": 0, "scheduler_tick": "0", "repeat_send_interval": 0}
+    )
+    assert config.ramp_frame_rate == _default("ramp_frame_rate")
+    assert config.scheduler_tick == _default("scheduler_tick")
+    assert config.repeat_send_interval == 0  # 0 sends every repeat
+    assert len(errors) == 2
+
+
+def test_negative_numbers_are_rejected():
+    config, errors = compile_config({"event_journal_size": -1})
+    assert config.event_journal_size == _default("event_journal_size")
+    assert errors == ["'event_journal_size' can not be negative"]
+
+
+def test_hedge_percentile_range():
+    for bad in (0, 100, 150, -5):
+        config, errors = compile_config({"backend_hedge_percentile": bad})
+        assert config.backend_hedge_percentile is None, bad
+        assert len(errors) == 1
+
+    config, errors = compile_config({"backend_hedge_percentile": "95"})
+    assert config.backend_hedge_percentile == 95.0
+    assert errors == []
+
+
+def test_wrong_type_and_unknown_key():
+    config, errors = compile_config({"log_to_disk": "yes", "backend_server_timout": 3})
+    assert config.log_to_disk is False
+    assert errors == [
+        "'log_to_disk' must be a boolean, got \"yes\"",
+        "Unknown key 'backend_server_timout', did you mean 'backend_server_timeout'?",
+    ]
+
+
+def test_rejected_config_is_logged_once(tmp_path):
+    path = str(tmp_path / "config.json")
+    with open(path, "w") as f:
+        f.write("{}")
+    reloaded = []
+    config, _ = load_config(path)
+    watcher = ConfigWatcher(path, config, reloaded.append)
+
+    with open(path, "w") as f:
+        f.write("{")
+    del system.logs[:]
+    watcher.timer.fire()
+    watcher.reload()  # reload_config over RPC reads the same file
+    watcher.timer.fire()
+    assert sum("not valid JSON" in message for _, message in system.logs) == 2
+    watcher.timer.fire()
+    assert sum("not valid JSON" in message for _, message in system.logs) == 2
+    assert reloaded == []
+
+    with open(path, "w") as f:
+        f.write('{"check_backend_server_interval": 10}')
+    watcher.timer.fire()
+    assert reloaded[0].check_backend_server_interval == 10
@@ -0,0 +1,36 @@
+import json
+import os
+import re
+
+from request_cache import unwrap_batch
+
+README = os.path.join(os.path.dirname(os.path.dirname(__file__)), "README.md")
+
+
+def _readme_example(command_type):
+    with open(README, "r") as f:
+        readme = f.read()
+    for block in re.findall(r"```JSON\n(.*?)```", readme, re.DOTALL):
+        if block.lstrip().startswith('{"type": "' + command_type + '"'):
+            # Blocks can hold several commands, one per line
+            return json.loads(block.strip().split("\n{")[0])
+    raise AssertionError("No {} example in README.md".format(command_type))
+
+
+def test_store_sequence_example_is_not_a_batch():
+    command = _readme_example("store_sequence")
+    data, request_id = unwrap_batch(command)
+    assert request_id is None
+    assert data is command
+
+
+def test_batch_envelope():
+    commands = [{"type": "Relay", "object": "Relay1", "function": "Pulse"}]
+    data, request_id = unwrap_batch({"request_id": 7, "commands": commands})
+    assert request_id == "7"
+    assert data is commands
+
+
+def test_commands_without_request_id_is_not_a_batch():
+    command = {"commands": []}
+    assert unwrap_batch(command) == (command, None)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from frontend_api_client import ProcessorClient, commands
+
+
+class Processor:
+    """Replies with each command's arg1, records the size of each request"""
+
+    def __init__(self):
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, reader, writer):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.decode().split("\r\n"):
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        body = await reader.readexactly(length)
+        self.requests.append(len(head) + len(body))
+        await asyncio.sleep(0.01)
+        replies = ["200 OK | " + command["arg1"] for command in json.loads(body)]
+        writer.write(json.dumps(replies).encode())
+        await writer.drain()
+        writer.close()
+        self.active -= 1
+
+
+def call_many(command_list, concurrent=False, **options):
+    """Returns (replies, Processor)"""
+
+    async def run():
+        processor = Processor()
+        server = await asyncio.start_server(processor.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = ProcessorClient("127.0.0.1", port, **options)
+        try:
+            replies = await client.call_many(command_list, concurrent)
+        finally:
+            server.close()
+            await server.wait_closed()
+        return replies, processor
+
+    return asyncio.run(run())
+
+
+def set_texts(count, text="x"):
+    return [
+        commands.set_text(commands.LABEL, "Lbl_1", "{} {}".format(text, number))
+        for number in range(count)
+    ]
+
+
+def test_batches_are_sent_one_at_a_time_in_order():
+    command_list = set_texts(25)
+    replies, processor = call_many(command_list, max_batch=10, max_concurrency=4)
+    assert [reply.data for reply in replies] == [c["arg1"] for c in command_list]
+    assert len(processor.requests) == 3
+    assert processor.max_active == 1
+
+
+def test_concurrent_batches_are_opt_in():
+    command_list = set_texts(25)
+    replies, processor = call_many(
+        command_list, concurrent=True, max_batch=10, max_concurrency=4
+    )
+    assert [reply.data for reply in replies] == [c["arg1"] for c in command_list]
+    assert processor.max_active == 3
+
+
+def test_batches_fit_in_max_request_bytes():
+    command_list = set_texts(100, "x" * 50)
+    replies, processor = call_many(command_list, max_request_bytes=1024)
+    assert len(replies) == 100
+    assert len(processor.requests) > 1
+    assert max(processor.requests) <= 1024
+
+
+def test_command_too_large_for_one_request():
+    with pytest.raises(ValueError):
+        call_many(set_texts(1, "x" * 2000), max_request_bytes=1024)
@@ -0,0 +1,43 @@
+from command_queue import OutboundCommandQueue
+
+
+class Port:
+    def __init__(self):
+        self.sent = []
+
+    def Send(self, data):
+        self.sent.append(data)
+
+
+def drain(queue):
+    while queue.depth():
+        queue._drain()
+    return queue.interface.sent
+
+
+def make_queue():
+    queue = OutboundCommandQueue(Port(), "Dsp", 0.1, r"^(\w+)=")
+    queue.pause()
+    return queue
+
+
+def test_collapse_keeps_its_place():
+    queue = make_queue()
+    queue.put("VOL=10")
+    queue.put("MUTE=1")
+    queue.put("VOL=12")
+    queue.put("MUTE=1")
+    queue.resume()
+    assert drain(queue) == ["VOL=12", "MUTE=1"]
+    assert queue.collapsed == 2
+
+
+def test_collapse_takes_the_higher_priority():
+    queue = make_queue()
+    queue.put("VOL=10", "low")
+    queue.put("MUTE=1")
+    queue.put("INPUT=2", "high")
+    queue.put("VOL=12", "high")  # Moves up, behind INPUT=2
+    queue.put("INPUT=3", "low")  # Keeps the higher priority it already had
+    queue.resume()
+    assert drain(queue) == ["INPUT=3", "VOL=12", "MUTE=1"]
@@ -0,0 +1,26 @@
+from event_journal import EventJournal
+
+
+def test_remove_keeps_events_recorded_after_the_snapshot():
+    journal = EventJournal()
+    journal.record(("button", "Btn_1", "Pressed", "1"))
+    journal.record(("slider", "Sld_1", "Changed", "10"))
+    journal.record(("knob", "Knb_1", "Turned", "3"))
+    sent = journal.events()
+
+    # Recorded while the replay is in flight
+    journal.record(("button", "Btn_2", "Pressed", "1"))
+    journal.record(("slider", "Sld_1", "Changed", "20"))
+    journal.record(("knob", "Knb_1", "Turned", "2"))
+
+    journal.remove(sent)
+    left = {(entry["name"], entry["value"]) for entry in journal.events()}
+    assert left == {("Btn_2", "1"), ("Sld_1", "20"), ("Knb_1", "2")}
+
+
+def test_remove_everything_sent():
+    journal = EventJournal()
+    journal.record(("button", "Btn_1", "Pressed", "1"))
+    journal.record(("knob", "Knb_1", "Turned", "3"))
+    journal.remove(journal.events())
+    assert len(journal) == 0
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import fleet_deploy
+from fleet_deploy import LocalDirectoryClient, deploy, load_inventory
+
+
+def write_inventory(directory, ports=b'{"ports": []}'):
+    with open(os.path.join(str(directory), "ports.json"), "wb") as f:
+        f.write(ports)
+    with open(os.path.join(str(directory), "config.json"), "wb") as f:
+        f.write(b"{}")
+    inventory = {
+        "defaults": {
+            "files": {"ports.json": "/ports.json", "config.json": "/config.json"}
+        },
+        "hosts": [{"host": "room101"}, {"host": "room102"}],
+    }
+    path = os.path.join(str(directory), "inventory.json")
+    with open(path, "w") as f:
+        json.dump(inventory, f)
+    return path
+
+
+def run(inventory_path, root, dry_run=False):
+    def client_factory(host, port, username, password):
+        return LocalDirectoryClient(str(root), host)
+
+    results = deploy(
+        load_inventory(inventory_path), client_factory, retries=0, dry_run=dry_run
+    )
+    return {result.host: result for result in results}
+
+
+def test_deploy_uploads_only_changed_files(tmp_path):
+    root = tmp_path / "processors"
+    inventory_path = write_inventory(tmp_path)
+
+    results = run(inventory_path, root)
+    assert {result.status for result in results.values()} == {"updated"}
+    assert sorted(results["room101"].uploaded) == ["/config.json", "/ports.json"]
+    assert (root / "room102" / "ports.json").read_bytes() == b'{"ports": []}'
+
+    results = run(inventory_path, root)
+    assert {result.status for result in results.values()} == {"unchanged"}
+    assert results["room101"].uploaded == []
+
+    write_inventory(tmp_path, ports=b'{"ports": [{"Alias": "Proj"}]}')
+    results = run(inventory_path, root)
+    assert results["room101"].status == "updated"
+    assert results["room101"].uploaded == ["/ports.json"]
+    assert results["room101"].unchanged == ["/config.json"]
+    assert (root / "room101" / "ports.json").read_bytes().startswith(b'{"ports": [{')
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    root = tmp_path / "processors"
+    results = run(write_inventory(tmp_path), root, dry_run=True)
+    assert {result.status for result in results.values()} == {"would update"}
+    assert not root.exists()
+
+
+def test_unreachable_host_fails_fast(monkeypatch):
+    pytest.importorskip("paramiko")
+
+    def create_connection(address, timeout):
+        assert timeout == 3
+        raise OSError("timed out")
+
+    monkeypatch.setattr(fleet_deploy.socket, "create_connection", create_connection)
+    client_factory = lambda host, port, username, password: fleet_deploy.ParamikoClient(
+        host, port, username, password, 3
+    )
+    host = {
+        "host": "offline",
+        "port": 22022,
+        "username": "admin",
+        "files": [("/ports.json", b"{}", fleet_deploy.sha256(b"{}"))],
+    }
+    result = fleet_deploy.deploy_host(host, client_factory, retries=0)
+    assert result.status == "failed"
+    assert "timed out" in result.error
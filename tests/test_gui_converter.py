@@ -0,0 +1,31 @@
+from gui_element_instantiation_converter import extract_instantiations
+
+SOURCE = """
+import tkinter as tk
+from extronlib import ui
+from extronlib.ui import Button as ExButton
+from extronlib.ui import Label
+
+Btn_Power = ExButton(TLP1, 101, holdTime=1)
+Btn_Mute = ui.Button(TLP1, "Btn_Mute")
+Lbl_Title = Label(TLP1, 200)
+Lvl_Volume = Level(TLP1, 300)
+
+window_button = tk.Button(root, text="Start")
+other_label = Label(text="no host or id")
+"""
+
+
+def test_only_extronlib_ui_calls():
+    found = extract_instantiations(SOURCE)
+    assert found["Button"] == [
+        "Button(TLP1, 101, holdTime=1)",
+        "Button(TLP1, 'Btn_Mute')",
+    ]
+    assert found["Label"] == ["Label(TLP1, 200)"]
+    assert found["Level"] == ["Level(TLP1, 300)"]
+
+
+def test_names_imported_from_other_modules_are_ignored():
+    found = extract_instantiations("from tkinter import Button\nb = Button(root, 1)\n")
+    assert found["Button"] == []
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+import shutil
+
+from layout_manifest import build_layout_indexes
+from layout_manifest_builder import build_manifest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "layout")
+
+
+class UIDevice:
+    def __init__(self, alias):
+        self.DeviceAlias = alias
+
+
+def test_build_manifest_from_gdl():
+    skipped = []
+    manifest, errors = build_manifest(FIXTURES, skipped=skipped)
+    assert errors == []
+    layout = manifest["layouts"]["Test_Page.gdl"]
+    assert layout["pages"] == {"1": "Main", "2": "Settings"}
+    assert layout["popups"] == {"10": "Pop_Volume"}
+    assert [(c["id"], c["name"], c["type"], c["page"]) for c in layout["controls"]] == [
+        (101, "Btn_Power", "Button", "Main"),
+        (102, "Btn_Mute", "Button", "Main"),
+        (200, "Lbl_Title", "Label", "Main"),
+        (300, "Lvl_Volume", "Level", "Main"),
+        (301, "Sld_Volume", "Slider", "Main"),
+        (400, "Knb_Volume", "Knob", "Pop_Volume"),
+    ]
+    with open(os.path.join(FIXTURES, "Test_Page.gdl"), "rb") as f:
+        assert layout["sha256"] == hashlib.sha256(f.read()).hexdigest()
+    assert len(skipped) == 1 and "Btn_Bad" in skipped[0]
+
+
+def test_manifest_is_only_used_while_the_gdl_matches(tmp_path):
+    manifest, _ = build_manifest(FIXTURES)
+    manifest = json.loads(json.dumps(manifest))  # As read from layout_manifest.json
+    shutil.copy(os.path.join(FIXTURES, "Test_Page.gdl"), str(tmp_path))
+    panel = UIDevice("TouchPanel_1")
+
+    indexes = build_layout_indexes(manifest, [panel], str(tmp_path))
+    assert indexes["TouchPanel_1"].popups == {10: "Pop_Volume"}
+    assert indexes["TouchPanel_1"].page_names == {"Main", "Settings"}
+
+    # Edited in GUI Designer after the manifest was built
+    with open(str(tmp_path / "Test_Page.gdl"), "a") as f:
+        f.write("\n")
+    assert build_layout_indexes(manifest, [panel], str(tmp_path)) == {}
+
+    # .gdl not on the processor
+    assert build_layout_indexes(manifest, [panel], str(tmp_path / "missing")) == {}
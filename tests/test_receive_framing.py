@@ -0,0 +1,42 @@
+from receive_framing import ReceiveFramer, make_receive_forwarder
+
+
+def feed_all(framer, chunks):
+    frames = []
+    for chunk in chunks:
+        frames.extend(framer.feed(chunk))
+    return frames
+
+
+def test_delimiter_split_across_chunks():
+    framer = ReceiveFramer("Delimiter", delimiter="\r\n")
+    chunks = [b"VOL=1", b"0\r", b"\nMUTE=1\r\n\r\nPWR", b"=ON\r\n"]
+    assert feed_all(framer, chunks) == [b"VOL=10", b"MUTE=1", b"PWR=ON"]
+    assert framer.buffer == bytearray()
+
+
+def test_regex_frame_waits_for_the_rest():
+    framer = ReceiveFramer("Regex", pattern=r"<(\d+)>")
+    assert framer.feed(b"<12") == []
+    assert framer.feed(b"3><4") == [b"123"]
+    assert framer.feed(b"5>") == [b"45"]
+
+
+def test_length_frames_keep_the_remainder():
+    framer = ReceiveFramer("Length", length=4)
+    assert feed_all(framer, [b"\x01\x02", b"\x03\x04\x05", b"\x06\x07\x08"]) == [
+        b"\x01\x02\x03\x04",
+        b"\x05\x06\x07\x08",
+    ]
+
+
+def test_forwarder_batches_frames_from_several_chunks():
+    sent = []
+    forwarder = make_receive_forwarder(
+        {"Alias": "Dsp", "ReceiveFraming": "Delimiter", "ReceiveDelimiter": "\n"},
+        lambda alias, frames: sent.append((alias, frames)),
+    )
+    forwarder.handle_receive(None, b"A=1\nB")
+    forwarder.handle_receive(None, b"=\xff\n")
+    forwarder._flush_wait.fire()
+    assert sent == [("Dsp", ["A=1", "B=\xff"])]
@@ -0,0 +1,29 @@
+import json
+
+from frontend_api_client import parse_batch, parse_reply
+
+
+def test_status_line():
+    reply = parse_reply("200 OK | 42")
+    assert reply.ok
+    assert (reply.status, reply.reason, reply.data) == (200, "OK", "42")
+
+
+def test_macro_object_is_ok():
+    reply = parse_reply({"added": ["Relay_1"]})
+    assert reply.ok
+    assert reply.data == {"added": ["Relay_1"]}
+
+
+def test_failed_macro_is_an_error():
+    # A macro that raises on the processor is sent back as null
+    body = json.dumps(["200 OK", None]).encode()
+    ok, failed = parse_batch(body, 2)
+    assert ok.ok
+    assert not failed.ok
+    assert failed.status == 500
+
+
+def test_unexpected_type_is_an_error():
+    assert not parse_reply(True).ok
+    assert not parse_reply(3).ok
@@ -0,0 +1,44 @@
+from request_cache import RequestCache
+
+
+def test_duplicate_waits_for_the_first_run():
+    cache = RequestCache()
+    entry, first = cache.claim("a1")
+    assert first
+
+    duplicate, first = cache.claim("a1")
+    assert not first
+    assert duplicate is entry
+    assert not duplicate.done.is_set()  # Deferred until the first run finishes
+
+    cache.finish(entry, '["200 OK"]')
+    assert duplicate.done.is_set()
+    assert duplicate.reply == '["200 OK"]'
+
+    retry, first = cache.claim("a1")
+    assert not first
+    assert retry.reply == '["200 OK"]'
+    assert (cache.runs, cache.waits, cache.hits) == (1, 1, 1)
+
+
+def test_abandoned_run_is_claimed_again():
+    cache = RequestCache()
+    entry, _ = cache.claim("a1")
+    duplicate, _ = cache.claim("a1")
+    cache.abandon(entry)
+    assert duplicate.done.is_set()
+    assert duplicate.reply is None
+
+    _, first = cache.claim("a1")
+    assert first
+
+
+def test_running_requests_are_never_evicted():
+    cache = RequestCache(max_entries=1)
+    running, _ = cache.claim("a1")
+    finished, _ = cache.claim("b2")
+    cache.finish(finished, "200 OK")
+    cache.claim("c3")
+
+    assert cache.claim("a1")[0] is running
+    assert cache.claim("b2")[1]  # Evicted, runs again
@@ -0,0 +1,92 @@
+from sequences import SequenceStore
+
+
+class Scheduler:
+    """Runs nothing on its own, tests call run() for a task id"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.next_id = 1
+
+    def schedule(self, delay, callback, tag=None, label=None):
+        task_id = self.next_id
+        self.next_id += 1
+        self.tasks[task_id] = callback
+        return task_id
+
+    def cancel(self, task_id):
+        return self.tasks.pop(task_id, None) is not None
+
+    def run(self, task_id):
+        self.tasks.pop(task_id)()
+
+
+class Label:
+    def __init__(self):
+        self.text = []
+
+
+def set_text(label, text):
+    if text == "offline":
+        raise ConnectionError("device offline")
+    if text == "locked":
+        raise PermissionError("locked")
+    label.text.append(text)
+
+
+def make_store():
+    labels = {"Lbl_1": Label(), "Lbl_2": Label()}
+    scheduler = Scheduler()
+    store = SequenceStore({"Label": labels}, {"SetText": set_text}, scheduler)
+    return store, scheduler, labels
+
+
+def step(text, delay=0):
+    return {
+        "type": "Label",
+        "object": "Lbl_1",
+        "function": "SetText",
+        "arg1": text,
+        "delay": str(delay),
+    }
+
+
+def test_failed_delayed_step_cancels_the_rest_of_its_run():
+    store, scheduler, labels = make_store()
+    store.store("boot", [step("a"), step("{b}", 1), step("c", 2)])
+    data, err = store.run("boot", {"b": "offline"})
+    assert err is None
+    assert data == "200 OK | Ran 1 steps, scheduled 2"
+
+    scheduler.run(1)
+    assert scheduler.tasks == {}
+    assert labels["Lbl_1"].text == ["a"]
+
+
+def test_failed_delayed_step_leaves_other_runs_alone():
+    store, scheduler, labels = make_store()
+    store.store("boot", [step("{b}", 1), step("c", 2)])
+    store.run("boot", {"b": "offline"})
+    store.run("boot", {"b": "ok"})
+
+    scheduler.run(1)
+    assert sorted(scheduler.tasks) == [3, 4]
+    scheduler.run(3)
+    scheduler.run(4)
+    assert labels["Lbl_1"].text == ["ok", "c"]
+
+
+def test_step_errors_keep_the_function_error_status():
+    store, scheduler, labels = make_store()
+    store.store("boot", [step("a"), step("{b}"), step("c", 1)])
+
+    data, err = store.run("boot", {"b": "offline"})
+    assert data is None
+    assert err == (
+        "503 Service Unavailable | Step 1: Connection Error: device offline, "
+        "ran 1 of 3 steps"
+    )
+    assert scheduler.tasks == {}
+
+    _, err = store.run("boot", {"b": "locked"})
+    assert err.startswith("403 Forbidden | Step 1: Permission Error: locked")
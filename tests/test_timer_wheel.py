@@ -0,0 +1,70 @@
+import pytest
+
+import timer_wheel
+from timer_wheel import TimerWheel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(timer_wheel, "monotonic", clock)
+    return clock
+
+
+def advance(wheel, clock, seconds):
+    clock.now += seconds
+    wheel._timer.fire()
+
+
+def test_task_past_one_turn_waits_for_its_own_turn(clock):
+    wheel = TimerWheel(tick=1, slots=4)
+    fired = []
+    wheel.schedule(2, lambda: fired.append("soon"))
+    wheel.schedule(6, lambda: fired.append("late"))  # Same slot, next turn
+
+    advance(wheel, clock, 2)
+    assert fired == ["soon"]
+    assert len(wheel) == 1
+
+    advance(wheel, clock, 3)
+    assert fired == ["soon"]
+
+    advance(wheel, clock, 1)
+    assert fired == ["soon", "late"]
+    assert wheel._timer.State == "Stopped"
+
+
+def test_late_tick_catches_up_in_order(clock):
+    wheel = TimerWheel(tick=1, slots=4)
+    fired = []
+    for delay in (5, 1, 3):
+        wheel.schedule(delay, lambda delay=delay: fired.append(delay))
+
+    advance(wheel, clock, 9)  # More than one turn of the wheel
+    assert fired == [1, 3, 5]
+
+
+def test_cancel_by_id_and_tag(clock):
+    wheel = TimerWheel(tick=1, slots=4)
+    fired = []
+    first = wheel.schedule(1, lambda: fired.append("first"), tag="room")
+    wheel.schedule(2, lambda: fired.append("second"), tag="room")
+    wheel.schedule(2, lambda: fired.append("other"), tag="other")
+
+    assert wheel.cancel(first)
+    assert not wheel.cancel(first)
+    assert wheel.cancel_tag("room") == 1
+    assert wheel.cancel_tag("room") == 0
+    assert [task["tag"] for task in wheel.pending()] == ["other"]
+
+    advance(wheel, clock, 2)
+    assert fired == ["other"]
+    assert wheel.stats()["cancelled"] == 2
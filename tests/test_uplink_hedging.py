@@ -0,0 +1,27 @@
+import io
+import urllib.request
+
+import uplink_hedging
+from uplink_hedging import MIN_SAMPLES, UplinkHedger
+
+
+def test_secondary_reply_is_passed_with_its_source(monkeypatch):
+    monkeypatch.setattr(
+        uplink_hedging.urllib.request,
+        "urlopen",
+        lambda request, timeout: io.BytesIO(b"ACK"),
+    )
+    hedger = UplinkHedger(percentile=95)
+    hedger.secondary = "http://secondary:8080"
+    for _ in range(MIN_SAMPLES):
+        hedger.record(0.1)
+    replies = []
+    request = urllib.request.Request(
+        "http://primary:8080/api/v1/button", data=b"{}", method="PUT"
+    )
+
+    hedge = hedger.start(request, lambda data, source: replies.append((data, source)))
+    hedge._wait.fire()  # The primary hasn't replied within the hedge delay
+
+    assert replies == [("ACK", "secondary")]
+    assert not hedger.primary_replied(hedge)  # A late primary reply is ignored
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import glob
+import json
+import sys
+import time
+import urllib.request
+
+info = """
+Replays a traffic recording against a processor or a local simulator
+
+Run this on a workstation, not on the processor
+
+Record on the processor with {"type": "traffic_record", "enabled": "true"}
+(or "traffic_record": true in config.json), then download traffic.jsonl and
+its rotated files (traffic.jsonl.1, .2 ...) over SFTP.
+
+- "rpc" entries are sent to the processor's RPC server, and the replies are
+  compared with the recorded replies.
+- "up" entries (events the processor sent to its backend server) are sent to
+  --backend if given, to benchmark a backend server with real traffic.
+  Uplinks that failed when recorded are sent, but have no reply to compare.
+
+Timing: recorded RPC times are measured on the processor, replayed RPC times
+are round trips from this workstation, so they include the network.
+
+Example:
+python traffic_replay.py traffic.jsonl* --host 10.0.0.10 --speed 1
+python traffic_replay.py traffic.jsonl* --host 10.0.0.10 --speed max --concurrency 4
+python traffic_replay.py traffic.jsonl* --backend http://localhost:8080 --speed 10
+
+"""
+
+__version__ = "1.0.0"
+
+
+def load_recording(paths):
+    """Returns every entry in the files, oldest first"""
+    entries = []
+    for path in paths:
+        with open(path, "r") as f:
+            for number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print("Skipping unreadable line {} in {}".format(number, path))
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(round(percent / 100.0 * (len(values) - 1)))]
+
+
+class ReplayStats:
+    def __init__(self, kind):
+        self.kind = kind
+        self.sent = 0
+        self.matched = 0
+        self.mismatched = 0
+        self.errors = 0
+        self.failed_originals = 0
+        self.original_times = []
+        self.replay_times = []
+        self.diffs = []
+
+    def report(self, show_diffs):
+        def _ms(value):
+            return "-" if value is None else "{:.1f}".format(value * 1000)
+
+        print("\n{} ({} sent)".format(self.kind, self.sent))
+        print(
+            "  replies: {} matched, {} different, {} errors".format(
+                self.matched, self.mismatched, self.errors
+            )
+        )
+        if self.failed_originals:
+            print(
+                "  {} failed when recorded, not compared".format(self.failed_originals)
+            )
+        print("  {:<10} {:>9} {:>9} {:>9}".format("ms", "p50", "p95", "max"))
+        for label, times in (
+            ("original", self.original_times),
+            ("replay", self.replay_times),
+        ):
+            print(
+                "  {:<10} {:>9} {:>9} {:>9}".format(
+                    label,
+                    _ms(percentile(times, 50)),
+                    _ms(percentile(times, 95)),
+                    _ms(max(times) if times else None),
+                )
+            )
+        original_p50 = percentile(self.original_times, 50)
+        replay_p50 = percentile(self.replay_times, 50)
+        if original_p50 and replay_p50:
+            print("  p50 replay / original: {:.2f}x".format(replay_p50 / original_p50))
+        for body, expected, actual in self.diffs[:show_diffs]:
+            print("  - body:     {}".format(body[:200]))
+            print("    recorded: {}".format(json.dumps(expected)[:200]))
+            print("    replayed: {}".format(json.dumps(actual)[:200]))
+
+
+async def send_rpc(host, port, body, timeout):
+    """Sends one RPC body, returns the reply text.  The processor disconnects when done."""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port), timeout
+    )
+    try:
+        data = body.encode("utf-8")
+        writer.write(
+            "POST / HTTP/1.0\r\nContent-Type: application/json\r\n"
+            "Content-Length: {}\r\n\r\n".format(len(data)).encode("ascii") + data
+        )
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return reply.decode("utf-8", errors="replace")
+
+
+def send_uplink(backend, path, body, timeout):
+    request = urllib.request.Request(
+        backend.rstrip("/") + path,
+        data=body.encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="PUT",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read().decode()
+
+
+async def replay(entries, args):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {"rpc": ReplayStats("rpc"), "up": ReplayStats("up")}
+
+    async def _replay_entry(entry):
+        kind = entry["k"]
+        entry_stats = stats[kind]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if kind == "rpc":
+                    reply_text = await send_rpc(
+                        args.host, args.port, entry["b"], args.timeout
+                    )
+                    try:
+                        reply = json.loads(reply_text)
+                    except ValueError:
+                        reply = reply_text
+                else:
+                    reply = await loop.run_in_executor(
+                        None,
+                        send_uplink,
+                        args.backend,
+                        entry.get("p", "/"),
+                        entry["b"],
+                        args.timeout,
+                    )
+            except Exception as e:
+                entry_stats.errors += 1
+                entry_stats.diffs.append((entry["b"], entry.get("r"), str(e)))
+                return
+            entry_stats.replay_times.append(time.perf_counter() - start)
+        if entry.get("e") is not None:
+            entry_stats.failed_originals += 1
+            return
+        if entry.get("d") is not None:
+            entry_stats.original_times.append(entry["d"])
+        if reply == entry.get("r"):
+            entry_stats.matched += 1
+        else:
+            entry_stats.mismatched += 1
+            entry_stats.diffs.append((entry["b"], entry.get("r"), reply))
+
+    kinds = set()
+    if args.host:
+        kinds.add("rpc")
+    if args.backend:
+        kinds.add("up")
+    entries = [entry for entry in entries if entry["k"] in kinds]
+    if not entries:
+        print("Nothing to replay")
+        return stats
+
+    first = entries[0]["t"]
+    start = time.perf_counter()
+    tasks = []
+    for entry in entries:
+        if args.speed > 0:
+            due = (entry["t"] - first) / args.speed
+            delay = due - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        stats[entry["k"]].sent += 1
+        tasks.append(asyncio.ensure_future(_replay_entry(entry)))
+    await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - start
+    recorded = entries[-1]["t"] - first
+    print(
+        "Replayed {} messages in {:.1f}s (recorded over {:.1f}s)".format(
+            len(entries), elapsed, recorded
+        )
+    )
+    for kind in sorted(kinds):
+        stats[kind].report(args.show_diffs)
+    return stats
+
+
+def _speed(value):
+    if value.lower() in ("max", "0"):
+        return 0.0
+    speed = float(value.rstrip("xX"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive, or max")
+    return speed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay recorded traffic and compare replies and timings",
+        epilog=info,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("recordings", nargs="+", help="traffic.jsonl files")
+    parser.add_argument("--host", help="processor (or simulator) to send RPC bodies to")
+    parser.add_argument("--port", type=int, default=8080, help="RPC server port")
+    parser.add_argument("--backend", help="backend server URL to send uplink events to")
+    parser.add_argument(
+        "--speed",
+        type=_speed,
+        default=1.0,
+        help="1 for real time, ex: 10 for ten times faster, or max (default: 1)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="messages in flight at once"
+    )
+    parser.add_argument("--timeout", type=float, default=5)
+    parser.add_argument(
+        "--show-diffs", type=int, default=5, help="different replies to print"
+    )
+    args = parser.parse_args(argv)
+    if not args.host and not args.backend:
+        parser.error("give --host and/or --backend")
+
+    paths = []
+    for pattern in args.recordings:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    stats = asyncio.run(replay(load_recording(paths), args))
+    failed = any(s.errors or s.mismatched for s in stats.values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())